@@ -1,9 +1,11 @@
 from __future__ import absolute_import, annotations
 from __future__ import unicode_literals
 
+import atexit
+import collections
+import contextvars
 import copy
 import functools
-import inspect
 import json
 import logging
 import os
@@ -11,7 +13,6 @@ import socket
 import sys
 import threading
 import time
-import traceback
 import types
 import uuid
 import wsgiref.util
@@ -21,7 +22,11 @@ from urllib.parse import parse_qs, urljoin
 
 import requests
 
-from rollbar.lib import events, filters, dict_merge, transport, defaultJSONEncode
+from rollbar.lib import (
+    aggregate, deferred, events, filters, frame_cache, dict_merge, json_encoder, rate_limit,
+    storm, transport, truncation, defaultJSONEncode)
+from rollbar.lib.compression import compress
+from rollbar.lib.locals_policy import LocalsPolicy
 from rollbar.lib.payload import Attribute
 from rollbar.lib.session import get_current_session, set_current_session, parse_session_request_baggage_headers
 
@@ -272,12 +277,26 @@ SETTINGS = {
     'host': None,  # custom hostname of the current host
     'branch': None,  # git branch name
     'code_version': None,
-    # 'blocking', 'thread' (default), 'async', 'agent', 'tornado', 'gae', 'twisted', 'httpx' or 'thread_pool'
+    # 'blocking', 'thread' (default), 'async', 'agent', 'tornado', 'gae', 'twisted', 'httpx',
+    # 'thread_pool', 'queue', 'batched' or 'spool'
     # 'async' requires Python 3.4 or higher.
     # 'httpx' requires Python 3.7 or higher.
     # 'thread_pool' requires Python 3.2 or higher.
     'handler': 'default',
     'thread_pool_workers': None,
+    'queue_workers': 2,  # number of long-lived sender threads used by the 'queue' handler
+    'queue_maxsize': 1000,  # capacity of the 'queue' handler's delivery queue
+    'queue_overflow': 'drop_newest',  # 'drop_newest', 'drop_oldest' or 'block'
+    # With 'block', seconds the reporting thread waits for room before dropping the item.
+    'queue_block_timeout': 1.0,
+    'batch_max_items': 25,  # the 'batched' handler sends a batch once it holds this many items...
+    'batch_max_wait_ms': 100,  # ...or once its oldest item has waited this long
+    'batch_maxsize': 1000,  # maximum number of items waiting to be batched
+    # Directory used by the 'spool' handler, '{pid}' is replaced by the process id.
+    'spool_dir': None,
+    'spool_max_bytes': 64 * 1024 * 1024,  # oldest items are evicted past this size
+    'spool_segment_bytes': 4 * 1024 * 1024,
+    'spool_fsync': False,  # fsync() every appended item; survives power loss, at a much higher cost
     'endpoint': DEFAULT_ENDPOINT,
     'timeout': DEFAULT_TIMEOUT,
     'agent.log_file': 'log.rollbar',
@@ -297,6 +316,8 @@ SETTINGS = {
         'authorization',
     ],
     'url_fields': ['url', 'link', 'href'],
+    # Maximum number of exceptions of a trace chain, the reported one first.
+    'max_chain_length': None,
     'notifier': {
         'name': 'pyrollbar',
         'version': VERSION
@@ -307,6 +328,17 @@ SETTINGS = {
         'safe_repr': True,
         'scrub_varargs': True,
         'sizes': DEFAULT_LOCALS_SIZES,
+        'max_frame_bytes': None,  # locals of a frame past this many bytes, serialized, are left out
+        'max_payload_bytes': None,  # same for the locals of all the frames of an item
+        'max_frames': None,  # maximum number of frames of a trace with locals, nearest ones first
+        'max_locals': None,  # maximum number of variables captured per frame, arguments first
+        # Number of exceptions of a trace chain with locals, the reported one first.
+        'max_chain_links': None,
+        # No locals for frames already captured for a previous exception of the chain.
+        'skip_shared_frames': False,
+        # Globs; if any, only frames of matching files have locals, besides the innermost one.
+        'include_paths': [],
+        'exclude_paths': [],  # globs; frames of matching files never have locals
         'safelisted_types': [],
         'whitelisted_types': []
     },
@@ -325,7 +357,37 @@ SETTINGS = {
     'request_pool_connections': None,
     'request_pool_maxsize': None,
     'request_max_retries': None,
+    # Payloads over this many bytes are truncated before sending. None for no limit; the
+    # Rollbar API rejects payloads over 512 KiB.
+    'max_payload_size': None,
+    # 'auto' (orjson or ujson if installed, else 'json'), 'orjson', 'ujson' or 'json'
+    'json_encoder': 'auto',
+    'compression': None,  # None, 'gzip' or 'zstd' (falls back to 'gzip' if zstd is not available)
+    'compression_level': None,
+    'compression_threshold': 1024,  # payloads smaller than this many bytes are sent uncompressed
+    # Maximum average number of items sent per second by this process, None for no limit.
+    'rate_limit': None,
+    'rate_limit_burst': None,  # number of items that can be sent at once, defaults to 'rate_limit'
+    # Seconds during which repeats of a reported exception are counted, not sent.
+    'aggregation_window': None,
+    'aggregation_max_signatures': 1000,  # maximum number of distinct exceptions aggregated at once
+    # Occurrences per second of the same exception reported before the rest are suppressed.
+    'storm_rate': None,
+    # Occurrences of the same exception reported at once before 'storm_rate' applies.
+    'storm_burst': 10,
+    'storm_summary_interval': 60,  # seconds between the reports counting the suppressed occurrences
+    'storm_max_signatures': 1000,  # maximum number of distinct exceptions tracked at once
+    # If set, flush() is called at interpreter exit with this timeout, in seconds.
+    'flush_at_exit': None,
+    'deferred_build': False,  # build payloads on a background thread, see rollbar.lib.deferred
+    'deferred_build_maxsize': 1000,  # maximum number of payloads waiting to be built
+    # 'thread' or a thread-based Executor: the async API builds payloads there, see
+    # rollbar.lib._async.
+    'async_build': None,
+    'async_build_workers': None,  # number of threads of the 'thread' executor
     'batch_transforms': False,
+    # Apply the transforms in a single walk of the payload, see rollbar.lib.transforms.fused.
+    'fuse_transforms': True,
     'custom_transforms': [],
 }
 
@@ -336,6 +398,9 @@ _LAST_RESPONSE_STATUS = None
 _transforms = []
 _serialize_transform = None
 _scrub_redact_transform = None
+_capture_shortener_transform = None
+_locals_policy = None
+_payload_skeleton = None  # (config, sections)
 
 _initialized = False
 
@@ -347,7 +412,7 @@ from rollbar.lib.transforms.scrub import ScrubTransform
 from rollbar.lib.transforms.scruburl import ScrubUrlTransform
 from rollbar.lib.transforms.scrub_redact import ScrubRedactTransform
 from rollbar.lib.transforms.serializable import SerializableTransform
-from rollbar.lib.transforms.shortener import ShortenerTransform
+from rollbar.lib.transforms.shortener import CaptureShortenerTransform, ShortenerTransform
 from rollbar.lib.transforms.batched import BatchedTransform
 
 
@@ -366,6 +431,7 @@ def init(access_token, environment='production', scrub_fields=None, url_fields=N
     **kw: provided keyword arguments will override keys in SETTINGS.
     """
     global SETTINGS, agent_log, _initialized, _transforms, _serialize_transform, _scrub_redact_transform, _threads
+    global _capture_shortener_transform
 
     if scrub_fields is not None:
        SETTINGS['scrub_fields'] = list(scrub_fields)
@@ -385,6 +451,30 @@ def init(access_token, environment='production', scrub_fields=None, url_fields=N
     SETTINGS['access_token'] = access_token
     SETTINGS['environment'] = environment
     _configure_transport(**SETTINGS)
+    rate_limit.init_rate_limiter(SETTINGS.get('rate_limit'), SETTINGS.get('rate_limit_burst'))
+    if SETTINGS.get('aggregation_window'):
+        aggregate.init_aggregator(_send_aggregated_occurrences,
+                                  SETTINGS['aggregation_window'],
+                                  max_signatures=SETTINGS.get('aggregation_max_signatures'))
+    else:
+        aggregate.disable()
+    if SETTINGS.get('storm_rate'):
+        storm.init_breaker(_send_suppressed_occurrences,
+                           SETTINGS['storm_rate'],
+                           burst=SETTINGS.get('storm_burst'),
+                           interval=SETTINGS.get('storm_summary_interval'),
+                           max_signatures=SETTINGS.get('storm_max_signatures'))
+    else:
+        storm.disable()
+
+    if SETTINGS.get('deferred_build'):
+        deferred.init_builder(maxsize=SETTINGS.get('deferred_build_maxsize'))
+    else:
+        deferred.disable()
+
+    atexit.unregister(flush)
+    if SETTINGS.get('flush_at_exit') is not None:
+        atexit.register(flush, SETTINGS['flush_at_exit'])
 
     if SETTINGS.get('allow_logging_basic_config'):
         logging.basicConfig()
@@ -394,6 +484,30 @@ def init(access_token, environment='production', scrub_fields=None, url_fields=N
     elif SETTINGS.get('handler') == 'thread_pool':
         from rollbar.lib.thread_pool import init_pool
         init_pool(SETTINGS.get('thread_pool_workers', None))
+    elif SETTINGS.get('handler') == 'queue':
+        from rollbar.lib.dispatcher import init_dispatcher
+        init_dispatcher(workers=SETTINGS.get('queue_workers'),
+                        maxsize=SETTINGS.get('queue_maxsize'),
+                        overflow=SETTINGS.get('queue_overflow'),
+                        block_timeout=SETTINGS.get('queue_block_timeout'),
+                        shutdown_timeout=SETTINGS.get('timeout', DEFAULT_TIMEOUT))
+    elif SETTINGS.get('handler') == 'batched':
+        from rollbar.lib.batcher import init_batcher
+        init_batcher(_send_payload_batch,
+                     max_items=SETTINGS.get('batch_max_items'),
+                     max_wait=SETTINGS.get('batch_max_wait_ms', 0) / 1000.0,
+                     maxsize=SETTINGS.get('batch_maxsize'),
+                     shutdown_timeout=SETTINGS.get('timeout', DEFAULT_TIMEOUT))
+    elif SETTINGS.get('handler') == 'spool':
+        if SETTINGS.get('spool_dir'):
+            from rollbar.lib.spool import init_spool
+            init_spool(SETTINGS['spool_dir'],
+                       _send_spooled_payload,
+                       max_bytes=SETTINGS.get('spool_max_bytes'),
+                       segment_bytes=SETTINGS.get('spool_segment_bytes'),
+                       fsync=SETTINGS.get('spool_fsync'))
+        else:
+            log.error("pyrollbar: The 'spool' handler requires the 'spool_dir' setting.")
 
     if not SETTINGS['locals']['safelisted_types'] and SETTINGS['locals']['whitelisted_types']:
         warnings.warn('whitelisted_types deprecated use safelisted_types instead', DeprecationWarning)
@@ -432,6 +546,11 @@ def init(access_token, environment='production', scrub_fields=None, url_fields=N
     shortener = ShortenerTransform(safe_repr=SETTINGS['locals']['safe_repr'],
                                    keys=shortener_keys,
                                    **SETTINGS['locals']['sizes'])
+
+    # Locals are shortened with the same sizes as they are captured, before being
+    # serialized, so that large ones are not walked in full.
+    _capture_shortener_transform = CaptureShortenerTransform(
+        safe_repr=SETTINGS['locals']['safe_repr'], **SETTINGS['locals']['sizes'])
     _transforms = [
         shortener,  # priority: 10
         _scrub_redact_transform,  # priority: 20
@@ -546,6 +665,19 @@ def send_payload(payload, access_token):
     - 'twisted': calls _send_payload_twisted() (which makes an async HTTP request using Twisted and Treq)
     - 'httpx': calls _send_payload_httpx() (which makes an async HTTP request using HTTPX)
     - 'thread_pool': uses a pool of worker threads to make HTTP requests off the main thread. Returns immediately.
+    - 'queue': puts the item on a bounded queue drained by a fixed set of sender threads.
+      Returns immediately.
+    - 'batched': collects items and sends them in bursts over one kept-alive connection.
+      Returns immediately.
+    - 'spool': appends the item to an on-disk spool that a background thread forwards to
+      Rollbar. Returns immediately.
+
+    Items over the 'rate_limit' setting, or reported while sends are paused after a 429
+    response, are dropped here before any work is done. The 'spool' handler keeps them
+    on disk instead and its forwarder waits for the limit to allow them.
+
+    Payloads over the 'max_payload_size' setting are shrunk before being handed to the
+    handler (see rollbar.lib.truncation), or replaced by a failsafe if they cannot be.
     """
     payload = events.on_payload(payload)
     if payload is False:
@@ -557,13 +689,15 @@ def send_payload(payload, access_token):
     else:
         handler = SETTINGS.get('handler')
 
-    if handler == 'twisted':
-        payload['data']['framework'] = 'twisted'
+    payload_str = _prepare_payload(payload, handler)
+    if payload_str is None:
+        return
 
-    payload_str = _serialize_payload(payload)
     if handler == 'blocking':
         _send_payload(payload_str, access_token)
     elif handler == 'agent':
+        if isinstance(payload_str, bytes):
+            payload_str = payload_str.decode('utf8')
         agent_log.error(payload_str)
     elif handler == 'tornado':
         if TornadoAsyncHTTPClient is None:
@@ -594,11 +728,28 @@ def send_payload(payload, access_token):
         _send_payload_thread(payload_str, access_token)
     elif handler == 'thread_pool':
         _send_payload_thread_pool(payload_str, access_token)
+    elif handler == 'queue':
+        _send_payload_queue(payload_str, access_token)
+    elif handler == 'batched':
+        _send_payload_batched(payload_str, access_token)
+    elif handler == 'spool':
+        _send_payload_spool(payload_str, access_token)
     else:
         # default to 'thread'
         _send_payload_thread(payload_str, access_token)
 
 
+def _prepare_payload(payload, handler):
+    # The serialized payload to send with `handler`, None if it is not to be sent.
+    if handler != 'spool' and not rate_limit.acquire():
+        return None
+
+    if handler == 'twisted':
+        payload['data']['framework'] = 'twisted'
+
+    return _serialize_payload(payload)
+
+
 def search_items(title, return_fields=None, access_token=None, endpoint=None, **search_fields):
     """
     Searches a project for items that match the input criteria.
@@ -627,11 +778,95 @@ def search_items(title, return_fields=None, access_token=None, endpoint=None, **
 
 
 def wait(f=None):
+    from rollbar.lib.dispatcher import join as join_dispatcher
+    from rollbar.lib.batcher import flush as flush_batcher
+
+    aggregate.flush()
+    storm.flush()
+    deferred.join()
     _threads.join()
+    join_dispatcher()
+    flush_batcher()
     if f is not None:
         return f()
 
 
+FlushResult = collections.namedtuple('FlushResult', ['sent', 'dropped'])
+
+# Maximum number of seconds flush() waits for the 'spool' handler to forward its items,
+# which stay on disk when it cannot, e.g. while the API is unreachable.
+SPOOL_FLUSH_TIMEOUT = 5
+
+
+def _join_threads(timeout):
+    # queue.Queue.join() without a timeout.
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _threads.all_tasks_done:
+        while _threads.unfinished_tasks:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            _threads.all_tasks_done.wait(remaining)
+    return True
+
+
+def _pending_items():
+    from rollbar.lib import _async, batcher, dispatcher, thread_pool
+
+    count = (_threads.unfinished_tasks + thread_pool.pending() + _async.pending()
+             + deferred.pending())
+    if dispatcher._dispatcher is not None:
+        count += dispatcher._dispatcher.pending()
+    if batcher._batcher is not None:
+        count += batcher._batcher.pending()
+    return count
+
+
+def flush(timeout=None):
+    """
+    Sends every queued and in-flight item, whatever the handler, and blocks until they
+    have been sent or `timeout` seconds have elapsed.
+
+    Returns a FlushResult(sent, dropped): the number of items whose sending completed
+    during the flush and the number still pending at the deadline, which are lost if
+    the process exits. Items held by the 'spool' handler stay on disk and are not
+    counted as dropped, and flush() waits at most SPOOL_FLUSH_TIMEOUT seconds for them
+    to be forwarded, whatever `timeout`.
+
+    Can be registered as an exit or worker shutdown hook, e.g.
+    atexit.register(rollbar.flush, 5), or with the 'flush_at_exit' setting.
+    See rollbar.lib._async.flush() for use in a running event loop.
+    """
+    from rollbar.lib import _async, batcher, dispatcher, spool, thread_pool
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def remaining():
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    # Summaries of the open aggregation windows and of suppressed occurrences are sent too.
+    aggregate.flush()
+    storm.flush()
+    before = _pending_items()
+
+    # Payloads still to be built are handed over to the handlers first.
+    deferred.join(remaining())
+    batcher.flush(remaining())
+    dispatcher.join(remaining())
+    thread_pool.join(remaining())
+    _join_threads(remaining())
+    _async.join(remaining())
+    spool_timeout = remaining()
+    if spool_timeout is None or spool_timeout > SPOOL_FLUSH_TIMEOUT:
+        spool_timeout = SPOOL_FLUSH_TIMEOUT
+    spool.join(spool_timeout)
+
+    dropped = _pending_items()
+    if dropped:
+        log.warning('pyrollbar: flush() timed out, %d item(s) were not sent.', dropped)
+    return FlushResult(max(0, before - dropped), dropped)
+
+
 class ApiException(Exception):
     """
     This exception will be raised if there was a problem decoding the
@@ -768,12 +1003,28 @@ def _report_exc_info(exc_info, request, extra_data, payload_data, level=None):
 
     cls, exc, trace = filtered_exc_info
 
+    # Occurrences of an exception fired in a loop are dropped before anything else
+    # is done with them, once over 'storm_rate'.
+    if not storm.allow(cls, trace, level):
+        return
+
+    # Repeats of an exception reported less than 'aggregation_window' seconds ago
+    # are only counted, before any of the payload is built.
+    occurrences = aggregate.record(cls, exc, trace, level)
+    if occurrences is False:
+        return
+
     data = _build_base_data(request)
     if level is not None:
         data['level'] = level
+    if occurrences is not None:
+        occurrences.first_uuid = data['uuid']
+
+    # The work left for the payload builder, if the payload is built in the background.
+    steps = [] if _defer_build() else None
 
     # walk the trace chain to collect cause and context exceptions
-    trace_chain = _walk_trace_chain(cls, exc, trace)
+    trace_chain = _walk_trace_chain(cls, exc, trace, steps)
 
     extra_trace_data = None
     if len(trace_chain) > 1:
@@ -803,27 +1054,160 @@ def _report_exc_info(exc_info, request, extra_data, payload_data, level=None):
     _add_person_data(data, request)
     _add_lambda_context_data(data)
     _add_session_data(data)
-    data['server'] = _build_server_data()
+    data['server'] = _copy_section(_get_payload_skeleton()['server'])
 
     if payload_data:
         data = dict_merge(data, payload_data, silence_errors=True)
 
+    if steps is not None:
+        return _submit_build(data, steps)
+
     payload = _build_payload(data)
     send_payload(payload, payload.get('access_token'))
 
     return data['uuid']
 
 
-def _walk_trace_chain(cls, exc, trace):
-    trace_chain = [_trace_data(cls, exc, trace)]
+# Handlers that send from the event loop or reactor of the reporting thread.
+_LOOP_HANDLERS = ('async', 'httpx', 'tornado', 'twisted')
+
+# Set by the async report functions to collect the items to build in an executor.
+_build_target = contextvars.ContextVar('rollbar-build-target', default=None)
+
+
+def _defer_build():
+    """
+    Returns True if the payload being reported is to be built by the background builder.
+    """
+    if _build_target.get() is not None:
+        return True
+
+    if not deferred.enabled():
+        return False
+
+    from rollbar.lib._async import get_current_handler
+    return get_current_handler() not in _LOOP_HANDLERS
+
+
+def _submit_build(data, steps):
+    target = _build_target.get()
+    if target is not None:
+        target(data, steps)
+        return data['uuid']
+
+    # The builder runs in a copy of the reporting context, for the handler selected by
+    # the async report functions and for the payload handlers.
+    context = contextvars.copy_context()
+    if not deferred.submit(context.run, _build_deferred_payload, data, steps):
+        return None
+    return data['uuid']
+
+
+def _build_deferred_payload(data, steps):
+    for step in steps:
+        step()
+
+    payload = _build_payload(data)
+    send_payload(payload, payload.get('access_token'))
+
+
+def _build_deferred_payload_str(data, steps, handler):
+    """
+    Builds, serializes and encodes the payload of an item collected through _build_target.
+    Returns (payload_str, access_token, body, headers), or None if the item is not to be sent.
+    """
+    for step in steps:
+        step()
+
+    payload = events.on_payload(_build_payload(data))
+    if payload is False:
+        return None
+
+    payload_str = _prepare_payload(payload, handler)
+    if payload_str is None:
+        return None
+
+    headers = {'Content-Type': 'application/json'}
+    body = _encode_body(payload_str, headers)
+    return payload_str, payload.get('access_token'), body, headers
+
+
+def _send_aggregated_occurrences(occurrences):
+    """
+    Reports the repeats of an exception counted during its aggregation window.
+    """
+    if not _check_config():
+        return
+
+    data = _build_base_data(None, level=occurrences.level or 'error')
+    data['body'] = {
+        'message': {
+            'body': '%s: %s (repeated %d more times)' % (
+                occurrences.exception_class, occurrences.message, occurrences.count)
+        }
+    }
+    data['custom'] = {
+        'aggregated_occurrences': {
+            'count': occurrences.count,
+            'first_timestamp': int(occurrences.first_timestamp),
+            'last_timestamp': int(occurrences.last_timestamp),
+            'first_uuid': occurrences.first_uuid,
+            'signature': occurrences.signature,
+        }
+    }
+    data['server'] = _copy_section(_get_payload_skeleton()['server'])
+
+    payload = _build_payload(data)
+    send_payload(payload, payload.get('access_token'))
+
+
+def _send_suppressed_occurrences(suppressed):
+    """
+    Reports the occurrences of an exception suppressed by the storm circuit breaker.
+    """
+    if not _check_config():
+        return
+
+    data = _build_base_data(None, level=suppressed.level or 'error')
+    data['body'] = {
+        'message': {
+            'body': '%s: %d occurrences suppressed (exception storm)' % (
+                suppressed.exception_class, suppressed.count)
+        }
+    }
+    data['custom'] = {
+        'suppressed_occurrences': {
+            'count': suppressed.count,
+            'first_timestamp': int(suppressed.first_timestamp),
+            'last_timestamp': int(suppressed.last_timestamp),
+            'location': suppressed.location,
+        }
+    }
+    data['server'] = _copy_section(_get_payload_skeleton()['server'])
+
+    payload = _build_payload(data)
+    send_payload(payload, payload.get('access_token'))
+
+
+def _walk_trace_chain(cls, exc, trace, steps=None):
+    max_length = SETTINGS.get('max_chain_length')
+    max_links = SETTINGS['locals'].get('max_chain_links')
+    # The frames whose locals are captured, by id, when they are captured only once per chain.
+    shared_frames = {} if SETTINGS['locals'].get('skip_shared_frames') else None
+
+    budget = truncation.ByteBudget(SETTINGS['locals'].get('max_payload_bytes'))
+    trace_chain = [_trace_data(cls, exc, trace, steps, budget, max_links != 0, shared_frames)]
 
     seen_exceptions = {exc}
 
-    while True:
+    while max_length is None or len(trace_chain) < max_length:
         exc = getattr(exc, '__cause__', None) or getattr(exc, '__context__', None)
         if not exc:
             break
-        trace_chain.append(_trace_data(type(exc), exc, getattr(exc, '__traceback__', None)))
+        add_locals = max_links is None or len(trace_chain) < max_links
+        trace = getattr(exc, '__traceback__', None)
+        trace_chain.append(_trace_data(type(exc), exc, trace, steps, budget, add_locals,
+                                       shared_frames))
         if exc in seen_exceptions:
             break
         seen_exceptions.add(exc)
@@ -831,11 +1215,19 @@ def _walk_trace_chain(cls, exc, trace):
     return trace_chain
 
 
-def _trace_data(cls, exc, trace):
+def _trace_data(cls, exc, trace, steps=None, budget=None, add_locals=True, shared_frames=None):
     # exception info
     # most recent call last
-    raw_frames = traceback.extract_tb(trace)
-    frames = [{'filename': f[0], 'lineno': f[1], 'method': f[2], 'code': f[3]} for f in raw_frames]
+    if steps is None:
+        raw_frames = frame_cache.extract(trace)
+        frames = [{'filename': f.filename, 'lineno': f.lineno, 'method': f.name, 'code': f.line}
+                  for f in raw_frames]
+    else:
+        # The source lines are read by the payload builder.
+        locations = frame_cache.locations(trace)
+        frames = [{'filename': f.f_code.co_filename, 'lineno': lineno, 'method': f.f_code.co_name}
+                  for f, lineno in locations]
+        steps.append(functools.partial(_add_frames_code, frames, locations))
 
     trace_data = {
         'frames': frames,
@@ -845,11 +1237,17 @@ def _trace_data(cls, exc, trace):
         }
     }
 
-    _add_locals_data(trace_data, (cls, exc, trace))
+    if add_locals:
+        _add_locals_data(trace_data, (cls, exc, trace), steps, budget, shared_frames)
 
     return trace_data
 
 
+def _add_frames_code(frames, locations):
+    for frame, raw_frame in zip(frames, frame_cache.frame_infos(locations)):
+        frame['code'] = raw_frame.line
+
+
 def _report_message(message, level, request, extra_data, payload_data):
     """
     Called by report_message() wrapper
@@ -866,6 +1264,7 @@ def _report_message(message, level, request, extra_data, payload_data):
     if filtered_message is False:
         return
 
+    steps = [] if _defer_build() else None
     data = _build_base_data(request, level=level)
 
     # message
@@ -885,11 +1284,14 @@ def _report_message(message, level, request, extra_data, payload_data):
     _add_person_data(data, request)
     _add_lambda_context_data(data)
     _add_session_data(data)
-    data['server'] = _build_server_data()
+    data['server'] = _copy_section(_get_payload_skeleton()['server'])
 
     if payload_data:
         data = dict_merge(data, payload_data, silence_errors=True)
 
+    if steps is not None:
+        return _submit_build(data, steps)
+
     payload = _build_payload(data)
     send_payload(payload, payload.get('access_token'))
 
@@ -958,17 +1360,18 @@ def _check_config():
 
 
 def _build_base_data(request, level='error'):
+    sections = _get_payload_skeleton()
     data = {
         'timestamp': int(time.time()),
-        'environment': SETTINGS['environment'],
+        'environment': sections['environment'],
         'level': level,
-        'language': 'python %s' % '.'.join(str(x) for x in sys.version_info[:3]),
-        'notifier': SETTINGS['notifier'],
+        'language': sections['language'],
+        'notifier': _copy_section(sections['notifier']),
         'uuid': str(uuid.uuid4()),
     }
 
-    if SETTINGS.get('code_version'):
-        data['code_version'] = SETTINGS['code_version']
+    if 'code_version' in sections:
+        data['code_version'] = sections['code_version']
 
     if BASE_DATA_HOOK:
         BASE_DATA_HOOK(request, data)
@@ -1042,7 +1445,7 @@ def _build_person_data(request):
 
 
 def _get_func_from_frame(frame):
-    func_name = inspect.getframeinfo(frame).function
+    func_name = frame.f_code.co_name
     caller = frame.f_back
     if caller:
         func = caller.f_locals.get(func_name,
@@ -1053,17 +1456,15 @@ def _get_func_from_frame(frame):
     return func
 
 
-def _add_locals_data(trace_data, exc_info):
+def _add_locals_data(trace_data, exc_info, steps=None, budget=None, shared_frames=None):
     if not SETTINGS['locals']['enabled']:
         return
 
     frames = trace_data['frames']
 
+    tb_frames = []
     cur_tb = exc_info[2]
-    frame_num = 0
-    num_frames = len(frames)
     while cur_tb:
-        cur_frame = frames[frame_num]
         tb_frame = cur_tb.tb_frame
         cur_tb = cur_tb.tb_next
 
@@ -1072,8 +1473,25 @@ def _add_locals_data(trace_data, exc_info):
             # for example by `ExceptionInfo` in
             # https://github.com/celery/billiard/blob/master/billiard/einfo.py
             log.warning('Traceback frame not a types.FrameType. Ignoring.')
-            frame_num += 1
+            tb_frame = None
+        tb_frames.append(tb_frame)
+
+    policy = _get_locals_policy()
+    num_frames = len(tb_frames)
+    captured = 0
+    # Nearest frames first, so that they are the ones within the limits.
+    for frame_num in range(num_frames - 1, -1, -1):
+        if policy.limit_reached(captured):
+            break
+
+        tb_frame = tb_frames[frame_num]
+        innermost = frame_num == num_frames - 1
+        if tb_frame is None or not policy.allows(tb_frame.f_code, innermost=innermost):
+            continue
+        if shared_frames is not None and id(tb_frame) in shared_frames:
+            # The locals of this frame are those of a previous exception of the chain.
             continue
+        cur_frame = frames[frame_num]
 
         # Create placeholders for argspec/varargspec/keywordspec/locals
         argspec = None
@@ -1082,28 +1500,25 @@ def _add_locals_data(trace_data, exc_info):
         _locals = {}
 
         try:
-            arginfo = inspect.getargvalues(tb_frame)
+            spec = frame_cache.argspec(tb_frame.f_code)
+            _locals = frame_cache.frame_locals(tb_frame, spec, SETTINGS['locals'].get('max_locals'))
 
             # Optionally fill in locals for this frame
-            if arginfo.locals and _check_add_locals(cur_frame, frame_num, num_frames):
+            if _locals:
                 # Get all of the named args
-                argspec = arginfo.args
-
-                if arginfo.varargs is not None:
-                    varargspec = arginfo.varargs
-                    if SETTINGS['locals']['scrub_varargs']:
-                        temp_varargs = list(arginfo.locals[varargspec])
-                        for i, arg in enumerate(temp_varargs):
-                            temp_varargs[i] = REDACT_REF
+                argspec = list(spec.args)
 
-                        arginfo.locals[varargspec] = tuple(temp_varargs)
+                if spec.varargs is not None:
+                    varargspec = spec.varargs
+                    if SETTINGS['locals']['scrub_varargs'] and varargspec in _locals:
+                        # Only the number of extra positional arguments is reported.
+                        _locals[varargspec] = (REDACT_REF,) * len(_locals[varargspec])
 
-                if arginfo.keywords is not None:
-                    keywordspec = arginfo.keywords
-
-                _locals.update(arginfo.locals.items())
+                if spec.varkw is not None:
+                    keywordspec = spec.varkw
 
         except Exception:
+            _locals = {}
             log.exception('Error while extracting arguments from frame. Ignoring.')
 
         # Finally, serialize each arg/kwarg/local separately so that we only report
@@ -1116,19 +1531,44 @@ def _add_locals_data(trace_data, exc_info):
         if keywordspec:
             cur_frame['keywordspec'] = keywordspec
         if _locals:
-            try:
-                cur_frame['locals'] = {k: _serialize_frame_data(v) for k, v in _locals.items()}
-            except Exception:
-                log.exception('Error while serializing frame data.')
+            captured += 1
+            if shared_frames is not None:
+                # Keeps the frame alive for its id not to be reused.
+                shared_frames[id(tb_frame)] = tb_frame
+            if steps is None:
+                _add_frame_locals(cur_frame, _locals, budget)
+            else:
+                steps.append(functools.partial(_add_frame_locals, cur_frame, _locals, budget))
 
-        frame_num += 1
+
+def _add_frame_locals(frame, _locals, budget=None):
+    try:
+        frame_locals = {}
+        frame_budget = truncation.ByteBudget(SETTINGS['locals'].get('max_frame_bytes'))
+        budgets = [b for b in (frame_budget, budget) if b is not None and b.max_size]
+        for k, v in _locals.items():
+            value = _serialize_frame_data(v)
+            if budgets:
+                # Locals over a byte budget are replaced with a marker, like the items
+                # left out by the shortener.
+                size = len(k) + len(_dumps_payload(value))
+                if not all(b.fits(size) for b in budgets):
+                    value = '...'
+                    size = len(k)
+                for b in budgets:
+                    b.spend(size)
+            frame_locals[k] = value
+        frame['locals'] = frame_locals
+    except Exception:
+        log.exception('Error while serializing frame data.')
 
 
 def _serialize_frame_data(data):
     return transforms.transform(
         data,
-        [_scrub_redact_transform, _serialize_transform],
-        batch_transforms=SETTINGS['batch_transforms']
+        [_capture_shortener_transform, _scrub_redact_transform, _serialize_transform],
+        batch_transforms=SETTINGS['batch_transforms'],
+        fuse_transforms=SETTINGS.get('fuse_transforms', False)
     )
 
 
@@ -1174,20 +1614,20 @@ def _add_request_data(data, request):
             data['request'] = request_data
 
 
-def _check_add_locals(frame, frame_num, total_frames):
+def _get_locals_policy():
     """
-    Returns True if we should record local variables for the given frame.
+    Returns the policy deciding which frames have their locals captured, compiled
+    again whenever the settings it depends on change.
     """
-    # Include the last frames locals
-    # Include any frame locals that came from a file in the project's root
-    root = SETTINGS.get('root')
-    if root:
-        # coerce to string, in case root is a Path object
-        root = str(root)
-    else:
-        root = ''
-    return any(((frame_num == total_frames - 1),
-                ('root' in SETTINGS and (frame.get('filename') or '').lower().startswith(root.lower()))))
+    global _locals_policy
+    config = (SETTINGS.get('root'),
+              list(SETTINGS['locals'].get('include_paths') or []),
+              list(SETTINGS['locals'].get('exclude_paths') or []),
+              SETTINGS['locals'].get('max_frames'))
+    policy = _locals_policy
+    if policy is None or policy.config != config:
+        policy = _locals_policy = LocalsPolicy(*config)
+    return policy
 
 
 def _get_actual_request(request):
@@ -1529,12 +1969,47 @@ def _build_server_data():
     return server_data
 
 
+def _get_payload_skeleton():
+    """
+    Returns the sections of a payload that are the same for every item, already
+    transformed, built again whenever the process or the settings they depend on change.
+    """
+    global _payload_skeleton
+    config = (os.getpid(), _transforms, SETTINGS['environment'], SETTINGS['notifier'],
+              SETTINGS.get('code_version'), SETTINGS.get('host'), SETTINGS.get('branch'),
+              SETTINGS.get('root'), getattr(sys, 'argv', None))
+    skeleton = _payload_skeleton
+    if skeleton is not None and skeleton[0] == config:
+        return skeleton[1]
+
+    sections = {
+        'environment': _transform(SETTINGS['environment'], key=('environment',)),
+        'language': 'python %s' % '.'.join(str(x) for x in sys.version_info[:3]),
+        'notifier': _transform(SETTINGS['notifier'], key=('notifier',)),
+        'server': _transform(_build_server_data(), key=('server',)),
+    }
+    if SETTINGS.get('code_version'):
+        sections['code_version'] = _transform(SETTINGS['code_version'], key=('code_version',))
+
+    # The settings may be changed in place, so they are compared with a copy of them.
+    _payload_skeleton = (config[:2] + copy.deepcopy(config[2:]), sections)
+    return sections
+
+
+def _copy_section(section):
+    # Items are merged with payload_data in place, so they get their own dicts.
+    if isinstance(section, dict):
+        return {k: _copy_section(v) for k, v in section.items()}
+    return section
+
+
 def _transform(obj, key=None):
     return transforms.transform(
         obj,
         _transforms,
         key=key,
-        batch_transforms=SETTINGS['batch_transforms']
+        batch_transforms=SETTINGS['batch_transforms'],
+        fuse_transforms=SETTINGS.get('fuse_transforms', False)
     )
 
 
@@ -1543,7 +2018,11 @@ def _build_payload(data):
     Returns the full payload as a string.
     """
 
+    sections = _get_payload_skeleton()
     for k, v in data.items():
+        # The sections left as they are in the skeleton are already transformed.
+        if k in sections and v == sections[k]:
+            continue
         data[k] = _transform(v, key=(k,))
 
     payload = {
@@ -1555,7 +2034,33 @@ def _build_payload(data):
 
 
 def _serialize_payload(payload):
-    return json.dumps(payload, default=defaultJSONEncode)
+    # A str or, with orjson, UTF-8 encoded bytes. None if the payload is over
+    # 'max_payload_size' even once truncated, in which case a failsafe is sent instead.
+    payload_str = _dumps_payload(payload)
+    max_size = SETTINGS.get('max_payload_size')
+    if not max_size or len(payload_str) <= max_size:
+        return payload_str
+
+    payload_str = truncation.truncate(payload, max_size, _dumps_payload, payload_str)
+    if len(payload_str) <= max_size:
+        log.warning('Rollbar: payload for UUID %r was truncated to fit in max_payload_size: %s',
+                    payload['data'].get('uuid'),
+                    ', '.join(payload['data']['notifier']['diagnostic']['truncation']['applied']))
+        return payload_str
+
+    data = payload.get('data') or {}
+    log.error('Rollbar: payload for UUID %r is %d bytes even truncated, over max_payload_size.',
+              data.get('uuid'), len(payload_str))
+    if SETTINGS['log_payload_on_error']:
+        log.error('Payload:\n%r', payload_str)
+    if not data.get('failsafe'):
+        host = (data.get('server') or {}).get('host')
+        _send_failsafe('payload too large', data.get('uuid'), host)
+    return None
+
+
+def _dumps_payload(payload):
+    return json_encoder.dumps(payload, SETTINGS.get('json_encoder'))
 
 
 def _send_payload(payload_str, access_token):
@@ -1588,6 +2093,54 @@ def _send_payload_thread_pool(payload_str, access_token):
     submit(_send_payload_pool, payload_str, access_token)
 
 
+def _send_payload_queue(payload_str, access_token):
+    from rollbar.lib.dispatcher import submit
+    submit(_send_payload_pool, payload_str, access_token)
+
+
+def _send_payload_batched(payload_str, access_token):
+    from rollbar.lib.batcher import submit
+    submit(payload_str, access_token)
+
+
+def _send_payload_spool(payload_str, access_token):
+    from rollbar.lib.spool import submit
+    try:
+        submit(payload_str, access_token)
+    except Exception as e:
+        log.exception('Exception while spooling item %r', e)
+
+
+def _send_spooled_payload(payload_str, access_token):
+    # Exceptions raised while posting (connection errors, timeouts, unreadable
+    # responses) keep the item in the spool so it is retried later. An error
+    # returned by the API is final.
+    retry_after = rate_limit.reserve()
+    if retry_after:
+        raise rate_limit.RateLimited(retry_after)
+
+    try:
+        result = _post_api('item/', payload_str, access_token=access_token)
+    except ApiError as e:
+        log.error('Rollbar API rejected spooled item: %r', e)
+        return
+
+    if result is None:
+        # 429 or 502, the item was not accepted.
+        raise rate_limit.RateLimited(rate_limit.pause_remaining() or rate_limit.DEFAULT_PAUSE)
+
+
+def _send_payload_batch(items):
+    # The item endpoint accepts a single item per request, so a batch is sent as
+    # a burst of requests over one kept-alive connection from the shared pool.
+    # Each response is still parsed (429, 413...) for its own item.
+    for i, (payload_str, access_token) in enumerate(items):
+        if rate_limit.pause_remaining():
+            log.warning('Rollbar: over rate limit, dropped %d batched item(s).', len(items) - i)
+            return
+        _send_payload_pool(payload_str, access_token)
+
+
 def _send_payload_appengine(payload_str, access_token):
     try:
         _post_api_appengine('item/', payload_str, access_token=access_token)
@@ -1602,9 +2155,10 @@ def _post_api_appengine(path, payload_str, access_token=None):
         headers['X-Rollbar-Access-Token'] = access_token
 
     url = urljoin(SETTINGS['endpoint'], path)
+    body = _encode_body(payload_str, headers)
     resp = AppEngineFetch(url,
                           method="POST",
-                          payload=payload_str,
+                          payload=body,
                           headers=headers,
                           allow_truncated=False,
                           deadline=SETTINGS.get('timeout', DEFAULT_TIMEOUT),
@@ -1613,6 +2167,20 @@ def _post_api_appengine(path, payload_str, access_token=None):
     return _parse_response(path, SETTINGS['access_token'], payload_str, resp)
 
 
+def _encode_body(payload_str, headers):
+    """
+    Returns the request body for `payload_str`, compressed according to SETTINGS['compression'].
+    Adds the matching Content-Encoding to `headers` when the body was compressed.
+    """
+    body, encoding = compress(payload_str,
+                              method=SETTINGS.get('compression'),
+                              level=SETTINGS.get('compression_level'),
+                              threshold=SETTINGS.get('compression_threshold'))
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return body
+
+
 def _post_api(path, payload_str, access_token=None):
     headers = {'Content-Type': 'application/json'}
 
@@ -1620,8 +2188,9 @@ def _post_api(path, payload_str, access_token=None):
         headers['X-Rollbar-Access-Token'] = access_token
 
     url = urljoin(SETTINGS['endpoint'], path)
+    body = _encode_body(payload_str, headers)
     resp = transport.post(url,
-                          data=payload_str,
+                          data=body,
                           headers=headers,
                           timeout=SETTINGS.get('timeout', DEFAULT_TIMEOUT),
                           verify=SETTINGS.get('verify_https', True),
@@ -1672,10 +2241,12 @@ def _post_api_tornado(path, payload_str, access_token=None):
         except Exception as e:
             log.exception('Exception while posting item %r', e)
 
+    body = _encode_body(payload_str, headers)
     TornadoAsyncHTTPClient().fetch(url,
                                    callback=post_tornado_cb,
                                    raise_error=False,
-                                   body=payload_str,
+                                   headers=headers,
+                                   body=body,
                                    method='POST',
                                    connect_timeout=SETTINGS.get('timeout', DEFAULT_TIMEOUT),
                                    request_timeout=SETTINGS.get('timeout', DEFAULT_TIMEOUT))
@@ -1703,10 +2274,18 @@ def _post_api_twisted(path, payload_str, access_token=None):
         headers['X-Rollbar-Access-Token'] = [access_token]
 
     url = urljoin(SETTINGS['endpoint'], path)
-    try:
-        encoded_payload = payload_str.encode('utf8')
-    except (UnicodeDecodeError, UnicodeEncodeError):
+    if isinstance(payload_str, bytes):
         encoded_payload = payload_str
+    else:
+        try:
+            encoded_payload = payload_str.encode('utf8')
+        except (UnicodeDecodeError, UnicodeEncodeError):
+            encoded_payload = payload_str
+
+    content_headers = {}
+    encoded_payload = _encode_body(encoded_payload, content_headers)
+    for name, value in content_headers.items():
+        headers[name] = [value]
 
     treq_client = treq.client.HTTPClient(Agent(reactor, contextFactory=VerifyHTTPS()))
     d = treq_client.post(url, encoded_payload, headers=headers,
@@ -1774,6 +2353,7 @@ def _parse_response(path, access_token, params, resp, endpoint=None):
     _LAST_RESPONSE_STATUS = resp.status_code
 
     if resp.status_code == 429:
+        rate_limit.on_rate_limited(getattr(resp, 'headers', None))
         if SETTINGS['log_all_rate_limited_items'] or not last_response_was_429:
             log.warning("Rollbar: over rate limit, data was dropped.")
             if SETTINGS['log_payload_on_error']:
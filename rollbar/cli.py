@@ -1,5 +1,6 @@
 import optparse
 import sys
+import time
 
 import rollbar
 
@@ -24,6 +25,43 @@ CMDS = {
     'critical': _gen_report_message('critical'),
 }
 
+
+def _replay(spool_dir, endpoint, rate):
+    from rollbar.lib import rate_limit
+    from rollbar.lib.spool import Spool, replay
+
+    rollbar.init(None, endpoint=endpoint, handler='blocking')
+
+    sent = 0
+
+    def _send(payload, access_token):
+        nonlocal sent
+        if rollbar._post_api('item/', payload, access_token=access_token) is None:
+            # 429 or 5xx, the item was not accepted and stays in the spool.
+            raise rate_limit.RateLimited(rate_limit.pause_remaining() or rate_limit.DEFAULT_PAUSE)
+        sent += 1
+        if verbose:
+            print('Rollbar: replayed item')
+
+    spool = Spool(spool_dir, max_bytes=0)
+    while True:
+        try:
+            replay(spool, _send, rate=rate)
+            break
+        except rate_limit.RateLimited as e:
+            if verbose:
+                print('Rollbar: item not accepted, retrying in %.1fs' % e.retry_after)
+            time.sleep(e.retry_after)
+        except rollbar.ApiError as e:
+            print('Rollbar: replay stopped, an item was rejected by the API: %s' % e,
+                  file=sys.stderr)
+            return False
+
+    if verbose:
+        print('Rollbar: replayed %d item(s) from %s' % (sent, spool_dir))
+    return True
+
+
 def main():
     global verbose
     parser = optparse.OptionParser(version='%prog version ' + VERSION)
@@ -47,6 +85,16 @@ def main():
                       metavar='HANDLER',
                       choices=["thread", "blocking", "agent"],
                       default="blocking")
+    parser.add_option('-s', '--spool_dir',
+                      dest='spool_dir',
+                      help="The spool directory to send with the 'replay' command.",
+                      metavar='SPOOL_DIR')
+    parser.add_option('-r', '--rate',
+                      dest='rate',
+                      help="Maximum number of items per second sent by the 'replay' command.",
+                      metavar='RATE',
+                      type='float',
+                      default=None)
     parser.add_option('-v', '--verbose',
                       dest='verbose',
                       help="Print verbose output.",
@@ -61,6 +109,12 @@ def main():
     handler = options.handler
     verbose = options.verbose
 
+    if args and args[0] == 'replay':
+        # Spooled items carry their own access token.
+        if not options.spool_dir:
+            parser.error('missing spool_dir')
+        sys.exit(0 if _replay(options.spool_dir, endpoint, options.rate) else 1)
+
     if not access_token:
         parser.error('missing access_token')
     if not env:
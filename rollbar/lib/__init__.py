@@ -75,35 +75,13 @@ def reverse_list_of_lists(l, apply_each_fn=None):
 
 
 def build_key_matcher(prefixes_or_suffixes, type='prefix', case_sensitive=False):
-    _prefixes = []
+    from rollbar.lib.key_matcher import PrefixMatcher
 
-    if type == 'prefix':
-        _iter = iter
-    elif type == 'suffix':
-        _iter = reversed
-    else:
+    if type not in ('prefix', 'suffix'):
         raise ValueError('type must be either "prefix" or "suffix"')
 
-    prefixes_or_suffixes = prefixes_or_suffixes or []
-    for prefix in prefixes_or_suffixes:
-        if case_sensitive:
-            # Copy the list of lists
-            _prefix = list(_iter(prefix))
-        else:
-            # Lowercase all of the elements
-            _prefix = [force_lower(x) for x in _iter(prefix)]
-
-        _prefixes.append(_prefix)
-
-    def matcher(prefix_or_suffix):
-        if case_sensitive:
-            prefix = list(_iter(prefix_or_suffix))
-        else:
-            prefix = [force_lower(x) for x in _iter(prefix_or_suffix)]
-
-        return prefix_match(prefix, _prefixes)
-
-    return matcher
+    return PrefixMatcher(prefixes_or_suffixes, suffix=(type == 'suffix'),
+                         case_sensitive=case_sensitive)
 
 
 def is_builtin_type(obj):
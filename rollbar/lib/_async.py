@@ -1,8 +1,15 @@
 import asyncio
+import concurrent.futures
 import contextlib
+import contextvars
+import functools
 import inspect
 import logging
+import os
 import sys
+import threading
+import time
+import weakref
 from unittest import mock
 from urllib.parse import urljoin
 
@@ -49,6 +56,113 @@ class RollbarAsyncError(Exception):
     ...
 
 
+# The executor of the 'thread' value of the 'async_build' setting, created on first use.
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    'reports': 0,
+    'built_in_executor': 0,
+    'loop_blocked_seconds': 0.0,
+    'max_loop_blocked_seconds': 0.0,
+}
+
+
+def _get_executor():
+    build = rollbar.SETTINGS.get('async_build')
+    if not build:
+        return None
+    if isinstance(build, concurrent.futures.ProcessPoolExecutor):
+        # The data of a report holds frames and the rest of its context, which
+        # cannot be pickled.
+        log.warning('pyrollbar: async_build cannot be a ProcessPoolExecutor. '
+                    'Building payloads on the event loop.')
+        return None
+    if isinstance(build, concurrent.futures.Executor):
+        return build
+    if build != 'thread':
+        log.warning('pyrollbar: Unknown async_build %r. '
+                    'Building payloads on the event loop.', build)
+        return None
+
+    global _executor, _executor_pid
+    with _executor_lock:
+        # The threads of an executor do not survive a fork.
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=rollbar.SETTINGS.get('async_build_workers'),
+                thread_name_prefix='rollbar-async-build',
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _record_blocked(seconds, in_executor):
+    with _stats_lock:
+        _stats['reports'] += 1
+        if in_executor:
+            _stats['built_in_executor'] += 1
+        _stats['loop_blocked_seconds'] += seconds
+        _stats['max_loop_blocked_seconds'] = max(_stats['max_loop_blocked_seconds'], seconds)
+
+
+def stats():
+    """
+    Returns metrics about the items reported with the async API.
+
+    - reports: number of calls to report_exc_info() and report_message().
+    - built_in_executor: number of them whose payloads were built in the 'async_build' executor.
+    - loop_blocked_seconds: total time spent reporting on the event loop, without yielding to it.
+    - max_loop_blocked_seconds: longest time spent by a single report on the event loop.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+async def _report(report, *args):
+    # Calls the synchronous `report` on the event loop. With the 'async_build' setting,
+    # it only takes a snapshot of the items it reports: their payloads are built in the
+    # executor and sent by a task of their own, so the uuid is returned right away.
+    executor = _get_executor()
+    if executor is None:
+        started = time.perf_counter()
+        try:
+            return report(*args)
+        finally:
+            _record_blocked(time.perf_counter() - started, False)
+
+    items = []
+    started = time.perf_counter()
+    token = rollbar._build_target.set(lambda data, steps: items.append((data, steps)))
+    try:
+        uuid = report(*args)
+    finally:
+        rollbar._build_target.reset(token)
+        _record_blocked(time.perf_counter() - started, True)
+
+    if items:
+        call_later(_build_and_send(executor, items, get_current_handler()))
+    return uuid
+
+
+async def _build_and_send(executor, items, handler):
+    loop = asyncio.get_running_loop()
+    for data, steps in items:
+        try:
+            # The builder runs in a copy of the reporting context, like the deferred builder.
+            build = functools.partial(contextvars.copy_context().run,
+                                      rollbar._build_deferred_payload_str, data, steps, handler)
+            built = await loop.run_in_executor(executor, build)
+            if built is not None:
+                payload_str, access_token, body, headers = built
+                await _post_api_httpx('item/', payload_str, access_token=access_token,
+                                      body=body, headers=headers)
+        except Exception as e:
+            log.exception('Exception while posting item %r', e)
+
+
 async def report_exc_info(
     exc_info=None, request=None, extra_data=None, payload_data=None, level=None, **kw
 ):
@@ -108,47 +222,120 @@ async def report_message(
 async def _report_exc_info(
     exc_info=None, request=None, extra_data=None, payload_data=None, level=None, **kw
 ):
-    return rollbar.report_exc_info(
-        exc_info, request, extra_data, payload_data, level, **kw
+    return await _report(
+        functools.partial(rollbar.report_exc_info, **kw),
+        exc_info, request, extra_data, payload_data, level,
     )
 
 
 async def _report_message(
     message, level='error', request=None, extra_data=None, payload_data=None, **kw
 ):
-    return rollbar.report_message(message, level, request, extra_data, payload_data)
+    return await _report(rollbar.report_message, message, level, request, extra_data, payload_data)
 
 
-async def _post_api_httpx(path, payload_str, access_token=None):
-    headers = {'Content-Type': 'application/json'}
-    if access_token is not None:
-        headers['X-Rollbar-Access-Token'] = access_token
-    else:
-        headers['X-Rollbar-Access-Token'] = rollbar.SETTINGS.get('access_token')
+# One long-lived client per event loop. An AsyncClient's connections are bound to
+# the loop that opened them, so clients cannot be shared between loops.
+_clients = weakref.WeakKeyDictionary()
+
+
+class _LoopClient:
+    def __init__(self, client, config, closer):
+        self.client = client
+        self.config = config
+        self.closer = closer
+
+
+def _client_config():
+    return (
+        rollbar.SETTINGS.get('http_proxy'),
+        rollbar.SETTINGS.get('http_proxy_user'),
+        rollbar.SETTINGS.get('http_proxy_password'),
+        rollbar.SETTINGS.get('verify_https', True),
+    )
+
 
-    proxy_cfg = {
-        'proxy': rollbar.SETTINGS.get('http_proxy'),
-        'proxy_user': rollbar.SETTINGS.get('http_proxy_user'),
-        'proxy_password': rollbar.SETTINGS.get('http_proxy_password'),
-    }
-    proxies = transport._get_proxy_cfg(proxy_cfg)
+def _build_client(config):
+    proxy, proxy_user, proxy_password, verify = config
+    proxies = transport._get_proxy_cfg({
+        'proxy': proxy,
+        'proxy_user': proxy_user,
+        'proxy_password': proxy_password,
+    })
     mounts = None
     if proxies:
         mounts = {
-            'http://': httpx.HTTPTransport(proxy=proxies['http']),
-            'https://': httpx.HTTPTransport(proxy=proxies['https']),
+            'http://': httpx.AsyncHTTPTransport(proxy=proxies['http'], verify=verify),
+            'https://': httpx.AsyncHTTPTransport(proxy=proxies['https'], verify=verify),
         }
 
+    return httpx.AsyncClient(mounts=mounts, verify=verify)
+
+
+async def _close_on_loop_shutdown(client):
+    # Async generators are finalized by loop.shutdown_asyncgens(), which
+    # asyncio.run() calls before closing the loop. Keeping this generator
+    # suspended at its `yield` ties the client's lifetime to the loop.
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def get_client():
+    """
+    Returns the httpx.AsyncClient for the running event loop, creating it on first use.
+
+    The client keeps its connections alive between items and is closed when the loop
+    shuts down, or when the proxy/TLS settings it was created with change.
+    """
+    loop = asyncio.get_running_loop()
+    config = _client_config()
+
+    entry = _clients.get(loop)
+    if entry is not None and entry.config == config and not entry.client.is_closed:
+        return entry.client
+
+    client = _build_client(config)
+    closer = _close_on_loop_shutdown(client)
+    await closer.__anext__()
+    _clients[loop] = _LoopClient(client, config, closer)
+
+    if entry is not None:
+        await entry.closer.aclose()
+
+    return client
+
+
+async def close_client():
+    """
+    Closes the httpx.AsyncClient of the running event loop, if any.
+    """
+    entry = _clients.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry.closer.aclose()
+
+
+async def _post_api_httpx(path, payload_str, access_token=None, body=None, headers=None):
+    # `body` and `headers` are given when the payload was already encoded off the loop.
+    if body is None:
+        headers = {'Content-Type': 'application/json'}
+        body = rollbar._encode_body(payload_str, headers)
+    else:
+        headers = dict(headers)
+    if access_token is not None:
+        headers['X-Rollbar-Access-Token'] = access_token
+    else:
+        headers['X-Rollbar-Access-Token'] = rollbar.SETTINGS.get('access_token')
+
     url = urljoin(rollbar.SETTINGS['endpoint'], path)
-    async with httpx.AsyncClient(
-        mounts=mounts, verify=rollbar.SETTINGS.get('verify_https', True)
-    ) as client:
-        resp = await client.post(
-            url,
-            content=payload_str,
-            headers=headers,
-            timeout=rollbar.SETTINGS.get('timeout', DEFAULT_TIMEOUT),
-        )
+    client = await get_client()
+    resp = await client.post(
+        url,
+        content=body,
+        headers=headers,
+        timeout=rollbar.SETTINGS.get('timeout', DEFAULT_TIMEOUT),
+    )
 
     try:
         return rollbar._parse_response(path, access_token, payload_str, resp)
@@ -215,11 +402,88 @@ def get_current_handler():
     return handler
 
 
+# Tasks started by call_later() that have not completed yet, so that flush() can
+# wait for the fire-and-forget ones.
+_tasks = set()
+
+
 def call_later(coro):
     if sys.version_info < (3, 7):
-        return asyncio.ensure_future(coro)
+        task = asyncio.ensure_future(coro)
+    else:
+        task = asyncio.create_task(coro)
+
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+
+def pending():
+    """
+    Returns the number of tasks started by call_later() that have not completed yet.
+    """
+    return sum(1 for task in list(_tasks) if not task.done())
+
 
-    return asyncio.create_task(coro)
+def join(timeout=None):
+    """
+    Blocks until the pending tasks of every event loop have completed. Returns False on
+    timeout, or if some tasks belong to the event loop running in the current thread,
+    since they cannot make progress while it is blocked.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+
+    by_loop = {}
+    for task in list(_tasks):
+        if not task.done():
+            by_loop.setdefault(task.get_loop(), []).append(task)
+
+    drained = True
+    for loop, tasks in by_loop.items():
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if loop is running_loop or loop.is_closed():
+            drained = False
+        elif loop.is_running():
+            # The loop runs in another thread.
+            future = asyncio.run_coroutine_threadsafe(asyncio.wait(tasks, timeout=remaining), loop)
+            try:
+                future.result(remaining)
+            except Exception:
+                drained = False
+        else:
+            # e.g. at interpreter exit, after the loop was stopped.
+            loop.run_until_complete(asyncio.wait(tasks, timeout=remaining))
+
+        drained = drained and all(task.done() for task in tasks)
+
+    return drained
+
+
+async def flush(timeout=None):
+    """
+    Asynchronous variant of rollbar.flush().
+
+    Waits for the pending tasks of the running event loop, then drains the other
+    handlers in an executor so that the loop is not blocked. Returns a
+    rollbar.FlushResult.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    loop = asyncio.get_running_loop()
+
+    tasks = [task for task in list(_tasks) if not task.done() and task.get_loop() is loop
+             and task is not asyncio.current_task()]
+    sent = 0
+    if tasks:
+        done, _ = await asyncio.wait(tasks, timeout=timeout)
+        sent = len(done)
+
+    remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+    result = await loop.run_in_executor(None, rollbar.flush, remaining)
+    return rollbar.FlushResult(result.sent + sent, result.dropped)
 
 
 # test helpers
@@ -0,0 +1,185 @@
+"""
+Client-side aggregation of repeated exceptions.
+
+Every exception gets a signature made of its class, its message with the variable
+parts (numbers, hex ids, quoted values...) normalized away and the
+(filename, lineno, method) of each frame. The first occurrence of a signature is
+reported as usual; repeats within the following `window` seconds are only counted,
+and once the window is over a single summary carrying the count and the first and
+last timestamps is handed to `emit`.
+"""
+import hashlib
+import re
+import time
+
+from rollbar.lib.summaries import Slot, Summarizer, trace_locations
+
+_NORMALIZERS = [
+    (re.compile(r'[0-9a-fA-F]{8}(-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}'), '<uuid>'),
+    (re.compile(r'0x[0-9a-fA-F]+'), '<hex>'),
+    (re.compile(r"'[^']*'|\"[^\"]*\""), '<str>'),
+    (re.compile(r'\d+(\.\d+)?'), '<num>'),
+]
+
+_aggregator = Slot()
+
+
+def normalize_message(message):
+    """
+    Replaces the parts of an exception message that usually vary between occurrences
+    of the same error.
+    """
+    for pattern, replacement in _NORMALIZERS:
+        message = pattern.sub(replacement, message)
+    return message
+
+
+def signature(cls, exc, trace, level=None):
+    """
+    Returns a stable signature for an exception, without building its payload.
+    """
+    parts = [
+        getattr(cls, '__module__', ''),
+        getattr(cls, '__qualname__', getattr(cls, '__name__', repr(cls))),
+        normalize_message(str(exc)),
+        str(level),
+    ]
+    for filename, name, lineno in trace_locations(trace):
+        parts.append('%s:%d:%s' % (filename, lineno, name))
+
+    return hashlib.sha1('\n'.join(parts).encode('utf8', 'replace')).hexdigest()
+
+
+class Occurrences(object):
+    """
+    Repeats of one signature seen during its aggregation window.
+    """
+
+    def __init__(self, signature, cls, exc, level, timestamp, deadline):
+        self.signature = signature
+        self.exception_class = getattr(cls, '__name__', repr(cls))
+        self.message = str(exc)
+        self.level = level
+        self.first_uuid = None
+        self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+        self.count = 0
+        self.deadline = deadline
+
+
+class Aggregator(Summarizer):
+    """
+    Tracks the aggregation windows of the signatures seen recently.
+
+    `emit` is called with an Occurrences object, on a background thread, for every
+    window that ended with at least one repeat. At most `max_signatures` windows are
+    tracked; when full, the window closest to its end is closed early.
+    """
+
+    emit_error = 'pyrollbar: Exception while reporting aggregated occurrences.'
+
+    def __init__(self, emit, window=60.0, max_signatures=1000, name='rollbar-aggregator',
+                 clock=time.monotonic):
+        super(Aggregator, self).__init__(emit, name, clock=clock)
+        self.window = window
+        self.max_signatures = max(1, max_signatures or 1)
+
+        self._entries = {}
+        # Windows closed by record(), left for the background thread to emit.
+        self._closed = []
+
+    def _reset(self):
+        # Repeats counted by the parent process are reported by the parent.
+        self._entries = {}
+        self._closed = []
+
+    def _wait_time(self):
+        if self._closed:
+            return 0
+        if not self._entries:
+            return None
+        return min(e.deadline for e in self._entries.values()) - self._clock()
+
+    def _take(self, now, force):
+        expired = [e for e in self._entries.values() if force or e.deadline <= now]
+        for entry in expired:
+            del self._entries[entry.signature]
+        closed, self._closed = self._closed, []
+        return [e for e in closed + expired if e.count]
+
+    def record(self, signature, cls, exc, level=None):
+        """
+        Records an occurrence of `signature`.
+
+        Returns the new Occurrences object if this is the first occurrence in its
+        window and should be reported, or None if it was counted as a repeat.
+        """
+        now = self._clock()
+        with self._cond:
+            self._check_pid()
+            self._start()
+
+            entry = self._entries.get(signature)
+            if entry is not None and now < entry.deadline:
+                entry.count += 1
+                entry.last_timestamp = time.time()
+                return None
+
+            closed = entry
+            if closed is None and len(self._entries) >= self.max_signatures:
+                closed = min(self._entries.values(), key=lambda e: e.deadline)
+
+            if closed is not None:
+                # Emitted by the background thread, not by the reporting one.
+                del self._entries[closed.signature]
+                if closed.count:
+                    self._closed.append(closed)
+
+            entry = Occurrences(signature, cls, exc, level, time.time(), now + self.window)
+            self._entries[signature] = entry
+            if len(self._entries) == 1 or self._closed:
+                self._cond.notify_all()
+
+        return entry
+
+
+def init_aggregator(emit, window, max_signatures=None):
+    """
+    Creates the aggregator used when the 'aggregation_window' setting is set.
+
+    :type emit: function
+    :param emit: Called with an Occurrences object at the end of each window that had repeats.
+    :type window: float
+    :param window: Number of seconds during which repeats of a reported exception are only counted.
+    :type max_signatures: int|None
+    :param max_signatures: Maximum number of signatures tracked at once.
+    """
+    _aggregator.set(Aggregator(emit, window=window, max_signatures=max_signatures))
+
+
+def disable():
+    """
+    Stops aggregating, after emitting the summaries of the open windows.
+    """
+    _aggregator.clear()
+
+
+def record(cls, exc, trace, level=None):
+    """
+    Records an exception occurrence.
+
+    Returns False if it is a repeat that should not be reported, otherwise the
+    Occurrences object tracking its window, or None if aggregation is disabled.
+    """
+    aggregator = _aggregator.summarizer
+    if aggregator is None:
+        return None
+    entry = aggregator.record(signature(cls, exc, trace, level), cls, exc, level)
+    return False if entry is None else entry
+
+
+def flush():
+    """
+    Emits the summaries of every open window right away.
+    """
+    _aggregator.flush()
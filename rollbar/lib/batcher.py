@@ -0,0 +1,203 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+_batcher = None  # type: Batcher|None
+
+
+class Batcher(object):
+    """
+    Collects serialized payloads and hands them to `sender` in batches.
+
+    A batch is flushed when it holds `max_items` items, when its oldest item has waited
+    `max_wait` seconds, or when flush()/shutdown() is called. `sender` is called with a
+    list of (payload_str, access_token) tuples on a single background thread.
+    """
+
+    def __init__(self, sender, max_items=25, max_wait=0.1, maxsize=1000, name='rollbar-batcher'):
+        self.sender = sender
+        self.max_items = max(1, max_items or 1)
+        self.max_wait = max(0.0, max_wait or 0.0)
+        self.maxsize = maxsize or 0
+        self.name = name
+        self.dropped = 0
+
+        self._cond = threading.Condition()
+        self._items = []
+        self._in_flight = 0
+        self._flush_requested = False
+        self._stopped = False
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+
+        with self._cond:
+            if self._pid == pid:
+                return
+
+            # Items queued by the parent process are not ours to send after a fork.
+            self._items = []
+            self._in_flight = 0
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name=self.name)
+            self._thread.daemon = True
+            self._thread.start()
+            self._pid = pid
+
+    def add(self, payload_str, access_token):
+        """
+        Adds an item to the current batch. Returns False if the item was dropped
+        because `maxsize` items are already waiting.
+        """
+        self._ensure_started()
+
+        with self._cond:
+            if self.maxsize and len(self._items) >= self.maxsize:
+                self.dropped += 1
+                log.warning('pyrollbar: Batch queue is full (maxsize=%s), dropping item.',
+                            self.maxsize)
+                return False
+
+            self._items.append((time.monotonic(), payload_str, access_token))
+            if len(self._items) == 1 or len(self._items) >= self.max_items:
+                self._cond.notify_all()
+
+        return True
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                if self._items:
+                    age = time.monotonic() - self._items[0][0]
+                    if (len(self._items) >= self.max_items or age >= self.max_wait
+                            or self._flush_requested or self._stopped):
+                        break
+                    self._cond.wait(self.max_wait - age)
+                elif self._stopped:
+                    return None
+                else:
+                    self._cond.wait()
+
+            batch = [(payload_str, access_token)
+                     for _, payload_str, access_token in self._items[:self.max_items]]
+            del self._items[:self.max_items]
+            self._in_flight += len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            try:
+                self.sender(batch)
+            except Exception:
+                log.exception('pyrollbar: Exception while sending batch.')
+            finally:
+                with self._cond:
+                    self._in_flight -= len(batch)
+                    if not self._items and not self._in_flight:
+                        self._flush_requested = False
+                    self._cond.notify_all()
+
+    def pending(self):
+        """
+        Returns the number of items waiting in the batch or currently being sent.
+        """
+        with self._cond:
+            return len(self._items) + self._in_flight
+
+    def flush(self, timeout=None):
+        """
+        Sends the pending items right away and blocks until they have been sent.
+
+        Returns False if `timeout` seconds elapsed first.
+        """
+        if self._pid != os.getpid():
+            return True
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._items or self._in_flight:
+                if deadline is None:
+                    self._cond.wait()
+                    continue
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+
+            # With nothing sent, the worker did not clear the request, which would
+            # send the next item on its own.
+            self._flush_requested = False
+
+        return True
+
+    def shutdown(self, timeout=None):
+        """
+        Flushes the pending items and stops the background thread.
+        """
+        drained = self.flush(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        return drained
+
+
+def init_batcher(sender, max_items=None, max_wait=None, maxsize=None, shutdown_timeout=None):
+    """
+    Creates the batcher used by the 'batched' handler.
+
+    :type sender: function
+    :param sender: Called with a list of (payload_str, access_token) tuples.
+    :type max_items: int|None
+    :param max_items: Maximum number of items in a batch.
+    :type max_wait: float|None
+    :param max_wait: Maximum number of seconds an item waits before its batch is sent.
+    :type maxsize: int|None
+    :param maxsize: Maximum number of items waiting to be sent. 0 or None means unbounded.
+    :type shutdown_timeout: float|None
+    :param shutdown_timeout: Maximum number of seconds spent flushing at interpreter exit.
+    """
+    global _batcher
+    if _batcher is not None:
+        _batcher.shutdown(timeout=0)
+        atexit.unregister(_batcher.shutdown)
+
+    _batcher = Batcher(sender, max_items=max_items, max_wait=max_wait, maxsize=maxsize)
+    atexit.register(_batcher.shutdown, shutdown_timeout)
+
+
+def submit(payload_str, access_token):
+    """
+    Add an item to the current batch.
+
+    :type payload_str: str
+    :type access_token: str
+    """
+    if _batcher is None:
+        log.warning('pyrollbar: Batcher not initialized. '
+                    'Please ensure init_batcher() is called prior to submit().')
+        return False
+    return _batcher.add(payload_str, access_token)
+
+
+def flush(timeout=None):
+    """
+    Sends the pending batch and blocks until it has been sent. Returns False on timeout.
+    """
+    if _batcher is None:
+        return True
+    return _batcher.flush(timeout)
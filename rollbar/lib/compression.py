@@ -0,0 +1,82 @@
+import gzip
+import logging
+
+try:
+    # Python 3.14+
+    from compression import zstd as _zstd
+except ImportError:
+    _zstd = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+log = logging.getLogger(__name__)
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+
+DEFAULT_LEVELS = {
+    GZIP: 6,
+    ZSTD: 3,
+}
+
+
+def zstd_available():
+    return _zstd is not None or zstandard is not None
+
+
+def _gzip(data, level):
+    # mtime=0 keeps the output deterministic for identical payloads.
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _zstd_compress(data, level):
+    if _zstd is not None:
+        return _zstd.compress(data, level=level)
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def compress(payload, method=None, level=None, threshold=0):
+    """
+    Compresses a serialized payload for use as an HTTP request body.
+
+    Returns a tuple of (body, content_encoding). `content_encoding` is None when the
+    payload was left uncompressed, either because `method` is None or because the
+    payload is smaller than `threshold` bytes.
+
+    method: None, 'gzip' or 'zstd'. 'zstd' falls back to 'gzip' when neither the
+            `compression.zstd` module (Python 3.14+) nor `zstandard` is installed.
+    level: compression level, defaults to 6 for gzip and 3 for zstd.
+    threshold: minimum payload size, in bytes, worth compressing.
+    """
+    if not method:
+        return payload, None
+
+    if isinstance(payload, str):
+        data = payload.encode('utf8')
+    else:
+        data = payload
+
+    if len(data) < (threshold or 0):
+        return payload, None
+
+    if method == ZSTD and not zstd_available():
+        log.debug('pyrollbar: zstd is not available, falling back to gzip.')
+        method = GZIP
+
+    if method not in DEFAULT_LEVELS:
+        log.warning('pyrollbar: Unknown compression %r, sending payload uncompressed.', method)
+        return payload, None
+
+    if level is None:
+        level = DEFAULT_LEVELS[method]
+
+    if method == ZSTD:
+        return _zstd_compress(data, level), ZSTD
+
+    return _gzip(data, level), GZIP
+
+
+__all__ = ['compress', 'zstd_available', 'GZIP', 'ZSTD']
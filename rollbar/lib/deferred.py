@@ -0,0 +1,76 @@
+"""
+Builds payloads on a background thread.
+
+With the 'deferred_build' setting, report_exc_info() and report_message() only take a
+snapshot of what could change once they return (the traceback, shallow copies of the
+frame locals, the request, person and session data) and hand the rest of the work to
+a worker thread: source lines lookup, serialization of the locals, transforms, JSON
+encoding and the handing over to the configured handler.
+"""
+import logging
+
+from rollbar.lib.dispatcher import Dispatcher, DROP_NEWEST
+
+log = logging.getLogger(__name__)
+
+_builder = None  # type: Dispatcher|None
+
+
+def init_builder(maxsize=None):
+    """
+    Creates the worker building payloads when the 'deferred_build' setting is set.
+
+    :type maxsize: int|None
+    :param maxsize: Maximum number of payloads waiting to be built. 0 or None means unbounded.
+    """
+    disable()
+
+    global _builder
+    _builder = Dispatcher(workers=1, maxsize=maxsize, overflow=DROP_NEWEST, name='rollbar-builder')
+
+
+def disable():
+    """
+    Builds payloads on the reporting thread again, after building the queued ones.
+    """
+    global _builder
+    if _builder is not None:
+        _builder.shutdown()
+    _builder = None
+
+
+def enabled():
+    return _builder is not None
+
+
+def submit(build, *args):
+    """
+    Queues `build(*args)`. Returns False if the queue was full and the payload dropped.
+    """
+    if _builder is None:
+        log.warning('pyrollbar: Payload builder not initialized. '
+                    'Please ensure init_builder() is called prior to submit().')
+        return False
+    return _builder.submit(build, *args)
+
+
+def pending():
+    """
+    Returns the number of payloads waiting to be built or being built.
+    """
+    if _builder is None:
+        return 0
+    return _builder.pending()
+
+
+def join(timeout=None):
+    """
+    Blocks until every queued payload has been built and handed over to the handler.
+    Returns False on timeout.
+    """
+    if _builder is None:
+        return True
+    return _builder.join(timeout)
+
+
+__all__ = ['init_builder', 'disable', 'enabled', 'submit', 'pending', 'join']
@@ -0,0 +1,237 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+BLOCK = 'block'
+
+OVERFLOW_POLICIES = (DROP_NEWEST, DROP_OLDEST, BLOCK)
+
+_STOP = object()
+
+_dispatcher = None  # type: Dispatcher|None
+
+
+class Dispatcher(object):
+    """
+    A bounded in-memory queue drained by a fixed set of long-lived worker threads.
+
+    The number of threads and the amount of memory used stay flat regardless of how many
+    items are submitted. When the queue is full, the overflow policy decides what happens:
+
+    - 'drop_newest': the submitted item is discarded.
+    - 'drop_oldest': the oldest queued item is discarded to make room for the new one.
+    - 'block': the caller waits up to `block_timeout` seconds for room in the queue.
+    """
+
+    def __init__(self, workers=1, maxsize=1000, overflow=DROP_NEWEST, block_timeout=None,
+                 name='rollbar-dispatcher'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('overflow must be one of %s' % (OVERFLOW_POLICIES,))
+
+        self.workers = max(1, workers or 1)
+        self.maxsize = maxsize or 0
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.name = name
+        self.dropped = 0
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._threads = []
+        self._pid = None
+        self._full = False
+
+    def _ensure_started(self):
+        # Threads do not survive os.fork(), so the workers (and the queue, whose
+        # locks may have been held by a thread at fork time) are recreated in the child.
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+
+        with self._lock:
+            if self._pid == pid:
+                return
+
+            self._queue = queue.Queue(self.maxsize)
+            self._threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name='%s-%d' % (self.name, i))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+            self._pid = pid
+
+    def _run(self):
+        q = self._queue
+        while True:
+            item = q.get()
+            try:
+                if item is _STOP:
+                    return
+                worker, args = item
+                worker(*args)
+            except Exception:
+                log.exception('pyrollbar: Exception in dispatcher worker.')
+            finally:
+                q.task_done()
+
+    def submit(self, worker, *args):
+        """
+        Queues `worker(*args)` to be called on one of the dispatcher threads.
+
+        Returns True if the item was queued, False if it was dropped.
+        """
+        self._ensure_started()
+        item = (worker, args)
+
+        try:
+            if self.overflow == BLOCK:
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            if self.overflow == DROP_OLDEST and self._evict_oldest():
+                try:
+                    self._queue.put_nowait(item)
+                except queue.Full:
+                    pass
+                else:
+                    return True
+
+            self._on_drop()
+            return False
+
+        self._full = False
+        return True
+
+    def _evict_oldest(self):
+        try:
+            self._queue.get_nowait()
+        except queue.Empty:
+            return False
+
+        self._queue.task_done()
+        self._on_drop()
+        return True
+
+    def _on_drop(self):
+        with self._lock:
+            self.dropped += 1
+            warn = not self._full
+            self._full = True
+        if warn:
+            log.warning('pyrollbar: Queue of %s is full (maxsize=%s), dropping items.',
+                        self.name, self.maxsize)
+
+    def pending(self):
+        """
+        Returns the number of items that are queued or currently being sent.
+        """
+        # After a fork, the queue holds the items of the parent, which no thread of
+        # this process will process.
+        if self._queue is None or self._pid != os.getpid():
+            return 0
+        return self._queue.unfinished_tasks
+
+    def join(self, timeout=None):
+        """
+        Blocks until every queued item has been processed.
+
+        Returns False if `timeout` seconds elapsed before the queue was drained.
+        """
+        q = self._queue
+        if q is None or self._pid != os.getpid():
+            return True
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with q.all_tasks_done:
+            while q.unfinished_tasks:
+                if deadline is None:
+                    q.all_tasks_done.wait()
+                    continue
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                q.all_tasks_done.wait(remaining)
+
+        return True
+
+    def shutdown(self, timeout=None):
+        """
+        Drains the queue and stops the worker threads.
+        """
+        if self._queue is None or self._pid != os.getpid():
+            return True
+
+        drained = self.join(timeout)
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(_STOP)
+            except queue.Full:
+                break
+        return drained
+
+
+def init_dispatcher(workers=None, maxsize=None, overflow=None, block_timeout=None,
+                    shutdown_timeout=None):
+    """
+    Creates the dispatcher used by the 'queue' handler.
+
+    The items queued on the previous dispatcher, if any, are sent first. The worker
+    threads being daemon threads, the queue is also drained at interpreter exit.
+
+    :type workers: int|None
+    :param workers: Number of long-lived sender threads. Defaults to 1.
+    :type maxsize: int|None
+    :param maxsize: Capacity of the queue. 0 or None means unbounded.
+    :type overflow: str|None
+    :param overflow: One of 'drop_newest' (default), 'drop_oldest' or 'block'.
+    :type block_timeout: float|None
+    :param block_timeout: With 'block', seconds to wait for room before dropping the item.
+        None waits forever.
+    :type shutdown_timeout: float|None
+    :param shutdown_timeout: Maximum number of seconds spent draining the queue of the
+        previous dispatcher, and at interpreter exit. None waits until it is drained.
+    """
+    global _dispatcher
+    if _dispatcher is not None:
+        atexit.unregister(_dispatcher.shutdown)
+        _dispatcher.shutdown(timeout=shutdown_timeout)
+
+    _dispatcher = Dispatcher(workers=workers,
+                             maxsize=maxsize,
+                             overflow=overflow or DROP_NEWEST,
+                             block_timeout=block_timeout)
+    atexit.register(_dispatcher.shutdown, shutdown_timeout)
+
+
+def submit(worker, payload_str, access_token):
+    """
+    Submit a new item to the dispatcher queue.
+
+    :type worker: function
+    :type payload_str: str
+    :type access_token: str
+    """
+    if _dispatcher is None:
+        log.warning('pyrollbar: Dispatcher not initialized. '
+                    'Please ensure init_dispatcher() is called prior to submit().')
+        return False
+    return _dispatcher.submit(worker, payload_str, access_token)
+
+
+def join(timeout=None):
+    """
+    Blocks until the dispatcher queue is drained. Returns False on timeout.
+    """
+    if _dispatcher is None:
+        return True
+    return _dispatcher.join(timeout)
@@ -0,0 +1,180 @@
+"""
+Cached metadata of the frames of tracebacks.
+
+traceback.extract_tb() looks up the source line of every frame of every traceback it
+is given, and inspect.getargvalues() works out the arguments of a frame from its code
+object every time, then copies all of its locals. Apart from the locals, all of it
+only depends on the code object and line of a frame, which are the same from one
+occurrence of an error to the next, so it is computed once and reused. A source line
+is looked up again once the mtime of its file changes, the mtime of each file being
+checked once per traceback.
+"""
+import inspect
+import itertools
+import linecache
+import os
+
+# Maximum number of (code object, line) pairs and code objects remembered.
+FRAME_CACHE_SIZE = 4096
+
+_frame_infos = {}
+_argspecs = {}
+
+
+class FrameInfo(object):
+    """
+    What a traceback says about one of its frames, like traceback.FrameSummary.
+    """
+    __slots__ = ('filename', 'lineno', 'name', 'line', 'mtime')
+
+    def __init__(self, filename, lineno, name, line, mtime):
+        self.filename = filename
+        self.lineno = lineno
+        self.name = name
+        self.line = line
+        self.mtime = mtime
+
+
+def _mtime(filename):
+    try:
+        return os.stat(filename).st_mtime
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def _lookup_line(frame, lineno):
+    # What traceback.FrameSummary.line is, once the cache of linecache is checked.
+    filename = frame.f_code.co_filename
+    linecache.checkcache(filename)
+    linecache.lazycache(filename, frame.f_globals)
+    if lineno is None:
+        return None
+    return linecache.getline(filename, lineno).strip()
+
+
+def locations(tb):
+    """
+    Returns the (frame, line number) pairs of traceback `tb`, most recent call last.
+    """
+    result = []
+    while tb is not None:
+        result.append((tb.tb_frame, tb.tb_lineno))
+        tb = tb.tb_next
+    return result
+
+
+def frame_infos(frame_locations):
+    """
+    Returns the FrameInfo of each of the (frame, line number) pairs of `frame_locations`.
+    """
+    mtimes = {}
+    result = []
+    for frame, lineno in frame_locations:
+        code = frame.f_code
+        filename = code.co_filename
+        try:
+            mtime = mtimes[filename]
+        except KeyError:
+            mtime = mtimes[filename] = _mtime(filename)
+
+        # Code objects of different files can be equal, they are told apart by identity
+        # and kept alive for their id not to be reused.
+        key = (id(code), lineno)
+        cached = _frame_infos.get(key)
+        if (cached is not None and cached[0] is code
+                and mtime is not None and cached[1].mtime == mtime):
+            info = cached[1]
+        else:
+            info = FrameInfo(filename, lineno, code.co_name, _lookup_line(frame, lineno), mtime)
+            if mtime is not None:
+                # Files that are not on disk have no mtime telling when to look again.
+                if len(_frame_infos) >= FRAME_CACHE_SIZE:
+                    _frame_infos.clear()
+                _frame_infos[key] = (code, info)
+        result.append(info)
+    return result
+
+
+def extract(tb):
+    """
+    Returns the FrameInfo of each frame of traceback `tb`, like traceback.extract_tb().
+    """
+    return frame_infos(locations(tb))
+
+
+class ArgSpec(object):
+    """
+    The arguments of a code object, as given by inspect.getargs(), and the names of all
+    of its local variables, arguments first. `names` is None for code whose locals are
+    not known ahead of time, like module and class bodies.
+    """
+    __slots__ = ('args', 'varargs', 'varkw', 'names')
+
+    def __init__(self, args, varargs, varkw, names):
+        self.args = args
+        self.varargs = varargs
+        self.varkw = varkw
+        self.names = names
+
+
+def argspec(code):
+    """
+    Returns the ArgSpec of code object `code`.
+    """
+    try:
+        return _argspecs[code]
+    except KeyError:
+        pass
+
+    args, varargs, varkw = inspect.getargs(code)
+    names = None
+    if code.co_flags & inspect.CO_OPTIMIZED:
+        # Arguments that are also cell variables are listed twice.
+        names = tuple(dict.fromkeys(code.co_varnames + code.co_cellvars + code.co_freevars))
+    spec = ArgSpec(tuple(args), varargs, varkw, names)
+    if len(_argspecs) >= FRAME_CACHE_SIZE:
+        _argspecs.clear()
+    _argspecs[code] = spec
+    return spec
+
+
+def frame_locals(frame, spec=None, max_locals=None):
+    """
+    Returns a dict of the local variables of `frame`, arguments first, with at most
+    `max_locals` of them if it is not None. `spec` is the ArgSpec of the code of the
+    frame, if known.
+
+    The variables of functions are read one by one, by name, so that only the ones
+    returned are read from a Python 3.13+ frame.
+    """
+    if spec is None:
+        spec = argspec(frame.f_code)
+    f_locals = frame.f_locals
+
+    if spec.names is None:
+        if max_locals is None:
+            return dict(f_locals)
+        return dict(itertools.islice(f_locals.items(), max_locals))
+
+    result = {}
+    for name in spec.names:
+        if max_locals is not None and len(result) >= max_locals:
+            break
+        try:
+            result[name] = f_locals[name]
+        except KeyError:
+            # Not bound yet, or any more.
+            pass
+    return result
+
+
+def clear():
+    """
+    Forgets all the frames seen so far.
+    """
+    _frame_infos.clear()
+    _argspecs.clear()
+
+
+__all__ = ['FrameInfo', 'ArgSpec', 'locations', 'frame_infos', 'extract', 'argspec', 'frame_locals',
+           'clear']
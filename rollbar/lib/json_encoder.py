@@ -0,0 +1,111 @@
+"""
+JSON encoders used to serialize payloads.
+
+'orjson' and 'ujson' are used when installed and selected (or picked by 'auto', in
+that order); 'json' is the standard library encoder. orjson produces UTF-8 encoded
+bytes, which the transports send as is; the other encoders produce an ASCII str.
+
+Objects that an encoder cannot serialize natively are passed to
+`rollbar.lib.defaultJSONEncode`, whatever the encoder. If a fast encoder fails on a
+payload (e.g. integers over 64 bits or lone surrogates), the payload is encoded with
+the standard library encoder instead.
+"""
+import json
+import logging
+
+from rollbar.lib import defaultJSONEncode
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+log = logging.getLogger(__name__)
+
+AUTO = 'auto'
+ORJSON = 'orjson'
+UJSON = 'ujson'
+JSON = 'json'
+
+_encoders = {}
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, default=defaultJSONEncode)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def _orjson_dumps(obj):
+        try:
+            return orjson.dumps(obj, default=defaultJSONEncode, option=_ORJSON_OPTIONS)
+        except (TypeError, ValueError):
+            return _json_dumps(obj)
+
+
+if ujson is not None:
+    def _ujson_dumps(obj):
+        try:
+            return ujson.dumps(obj, default=defaultJSONEncode)
+        except (TypeError, ValueError, OverflowError):
+            return _json_dumps(obj)
+
+
+def available():
+    """
+    Returns the names of the encoders that can be used.
+    """
+    names = []
+    if orjson is not None:
+        names.append(ORJSON)
+    if ujson is not None:
+        names.append(UJSON)
+    names.append(JSON)
+    return names
+
+
+def get_encoder(name=AUTO):
+    """
+    Returns a function serializing an object to JSON, as str or bytes.
+
+    name: 'auto' (default), 'orjson', 'ujson' or 'json'. A fast encoder that is not
+          installed falls back to 'json'.
+    """
+    name = name or AUTO
+    encoder = _encoders.get(name)
+    if encoder is not None:
+        return encoder
+
+    if name == AUTO:
+        resolved = available()[0]
+    elif name in (ORJSON, UJSON, JSON):
+        resolved = name if name in available() else JSON
+        if resolved != name:
+            log.warning('pyrollbar: JSON encoder %r is not installed, '
+                        'using the standard library.', name)
+    else:
+        log.warning('pyrollbar: Unknown JSON encoder %r, using the standard library.', name)
+        resolved = JSON
+
+    if resolved == ORJSON:
+        encoder = _orjson_dumps
+    elif resolved == UJSON:
+        encoder = _ujson_dumps
+    else:
+        encoder = _json_dumps
+
+    _encoders[name] = encoder
+    return encoder
+
+
+def dumps(obj, name=AUTO):
+    return get_encoder(name)(obj)
+
+
+__all__ = ['available', 'dumps', 'get_encoder', 'AUTO', 'ORJSON', 'UJSON', 'JSON']
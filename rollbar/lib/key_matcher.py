@@ -0,0 +1,176 @@
+"""
+Compiled matchers for key paths, the tuples of keys leading to a node of a payload.
+
+The patterns are indexed up front in a trie, so that matching a key path only looks
+at the keys it is made of, whatever the number of patterns: `PrefixMatcher` backs
+`build_key_matcher()` (scrub fields) and `PatternMatcher` the wildcard keys of
+ShortenerTransform, with the same results as `prefix_match()` and
+`key_in()`/`key_depth()`.
+"""
+from rollbar.lib import force_lower, key_match, prefix_match
+
+WILDCARD = '*'
+
+# Maximum number of key paths whose match is remembered by a PatternMatcher.
+DECISION_CACHE_SIZE = 4096
+
+# Marks the end of a pattern in a trie node. Never equal to a key.
+_END = object()
+
+
+class PrefixMatcher(object):
+    """
+    Matches key paths starting (or ending, if `suffix` is true) with one of `prefixes`.
+    """
+
+    def __init__(self, prefixes, suffix=False, case_sensitive=False):
+        self.suffix = suffix
+        self.case_sensitive = case_sensitive
+
+        self._prefixes = []
+        for prefix in prefixes or []:
+            self._prefixes.append([self._normalize(part) for part in self._parts(prefix)])
+
+        try:
+            self._root = _build_trie(self._prefixes, lambda index, prefix: True)
+        except TypeError:
+            # Unhashable keys in the prefixes, match them one by one.
+            self._root = None
+
+    def _parts(self, key):
+        return reversed(key) if self.suffix else iter(key)
+
+    def _normalize(self, part):
+        return part if self.case_sensitive else force_lower(part)
+
+    def __call__(self, key):
+        if not key:
+            return False
+
+        if self._root is not None:
+            try:
+                return self._match(key)
+            except TypeError:
+                pass
+
+        return prefix_match([self._normalize(part) for part in self._parts(key)], self._prefixes)
+
+    def _match(self, key):
+        node = self._root
+        if _END in node:
+            return True
+
+        for part in self._parts(key):
+            node = node.get(self._normalize(part))
+            if node is None:
+                return False
+            if _END in node:
+                return True
+
+        return False
+
+
+class PatternMatcher(object):
+    """
+    Matches key paths against patterns in which `'*'` stands for any key.
+
+    A pattern matches the key paths starting with keys matching its own. As with
+    `key_depth()`, the first matching pattern, in the given order, is the one that
+    decides the depth of a match.
+    """
+
+    def __init__(self, patterns, cache_size=DECISION_CACHE_SIZE):
+        self.patterns = patterns
+        self.cache_size = cache_size
+
+        self._patterns = [tuple(pattern) for pattern in patterns or []]
+        self._cache = {}
+        try:
+            self._root = _build_trie(self._patterns, lambda index, pattern: (index, len(pattern)))
+        except TypeError:
+            self._root = None
+
+    def match(self, key):
+        """
+        Returns True if one of the patterns matches `key`, like `key_in()`.
+        """
+        if not key:
+            return False
+        return self._find(key) is not None
+
+    def depth(self, key):
+        """
+        Returns the length of the first pattern matching `key`, or 0, like `key_depth()`.
+        """
+        if not key:
+            return 0
+        found = self._find(key)
+        return found[1] if found is not None else 0
+
+    def _find(self, key):
+        # Returns the (index, length) of the first pattern matching `key`, or None.
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            return self._find_slow(key)
+
+        if self._root is None:
+            return self._find_slow(key)
+
+        try:
+            found = self._search(self._root, key)
+        except TypeError:
+            return self._find_slow(key)
+
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[key] = found
+        return found
+
+    def _search(self, node, key, i=0, found=None):
+        # Walks down the trie along `key`, following both the edge of the key and
+        # the wildcard edge where a node has the two.
+        size = len(key)
+        while True:
+            end = node.get(_END)
+            if end is not None and (found is None or end < found):
+                found = end
+
+            if i == size:
+                return found
+
+            part = key[i]
+            i += 1
+            child = node.get(part)
+            if part != WILDCARD:
+                wildcard = node.get(WILDCARD)
+                if wildcard is not None:
+                    if child is not None:
+                        found = self._search(child, key, i, found)
+                    child = wildcard
+
+            if child is None:
+                return found
+            node = child
+
+    def _find_slow(self, key):
+        for index, pattern in enumerate(self._patterns):
+            if key_match(key, pattern):
+                return index, len(pattern)
+        return None
+
+
+def _build_trie(patterns, value):
+    root = {}
+    for index, pattern in enumerate(patterns):
+        node = root
+        for part in pattern:
+            node = node.setdefault(part, {})
+        # Only the first of identical patterns counts.
+        node.setdefault(_END, value(index, pattern))
+    return root
+
+
+__all__ = ['PrefixMatcher', 'PatternMatcher', 'WILDCARD']
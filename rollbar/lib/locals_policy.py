@@ -0,0 +1,71 @@
+"""
+Decides which frames of a traceback have their locals captured.
+
+The innermost frame always does, and so do the frames of the files under `root`, if
+they match one of the `include` globs (when there are any) and none of the `exclude`
+globs, which also apply to the innermost frame. Of these, at most `max_frames` frames
+have their locals captured, the nearest to the error being the first to be captured.
+
+The part of a decision depending on the file of a frame is made once per code object.
+"""
+import fnmatch
+import re
+
+# Maximum number of code objects whose decision is remembered.
+DECISION_CACHE_SIZE = 4096
+
+
+def _compile_globs(globs):
+    if not globs:
+        return None
+    return re.compile('|'.join(fnmatch.translate(glob) for glob in globs))
+
+
+class LocalsPolicy(object):
+    def __init__(self, root=None, include=None, exclude=None, max_frames=None):
+        self.config = (root, list(include or []), list(exclude or []), max_frames)
+
+        # coerce to string, in case root is a Path object
+        self._root = str(root).lower() if root else ''
+        self._include = _compile_globs(include)
+        self._exclude = _compile_globs(exclude)
+        self.max_frames = max_frames
+        self._decisions = {}
+
+    def _decide(self, filename):
+        # Returns (captured if not the innermost frame, captured if the innermost frame).
+        filename = filename or ''
+        if self._exclude is not None and self._exclude.match(filename):
+            return False, False
+        if not filename.lower().startswith(self._root):
+            return False, True
+        return self._include is None or bool(self._include.match(filename)), True
+
+    def _decision(self, code):
+        # Code objects of different files can be equal, they are told apart by identity
+        # and kept alive for their id not to be reused.
+        cached = self._decisions.get(id(code))
+        if cached is not None and cached[0] is code:
+            return cached[1]
+
+        decision = self._decide(code.co_filename)
+        if len(self._decisions) >= DECISION_CACHE_SIZE:
+            self._decisions.clear()
+        self._decisions[id(code)] = (code, decision)
+        return decision
+
+    def allows(self, code, innermost=False):
+        """
+        Returns True if the locals of a frame running `code` can be captured, as the
+        innermost frame of its traceback if `innermost` is true.
+        """
+        return self._decision(code)[bool(innermost)]
+
+    def limit_reached(self, captured):
+        """
+        Returns True if no more frames can have their locals captured once `captured` did.
+        """
+        return self.max_frames is not None and captured >= self.max_frames
+
+
+__all__ = ['LocalsPolicy']
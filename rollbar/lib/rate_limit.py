@@ -0,0 +1,219 @@
+"""
+Client-side rate limiting.
+
+Items are let through by a token bucket refilled at `rate` items per second, holding
+at most `burst` tokens. Independently of the bucket, a 429 response from the API
+pauses every send until the time given by its rate limit headers, so that items
+that would be rejected anyway are dropped before they are serialized or sent.
+"""
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Used when a 429 response does not say when the limit resets.
+DEFAULT_PAUSE = 1.0
+# Upper bound on a pause requested by the server, in case of a bogus header.
+MAX_PAUSE = 3600.0
+
+_limiter = None  # type: RateLimiter|None
+
+
+class RateLimited(Exception):
+    """
+    Raised by senders that must not drop an item while sends are paused.
+    `retry_after` is the number of seconds until sends resume.
+    """
+
+    def __init__(self, retry_after):
+        super(RateLimited, self).__init__(
+            'Rollbar rate limit reached, retry in %.1fs' % retry_after)
+        self.retry_after = retry_after
+
+
+class RateLimiter(object):
+    """
+    A token bucket allowing `rate` items per second on average and bursts of up to
+    `burst` items. A `rate` of None or 0 disables the bucket, leaving only the pauses
+    requested by the server.
+    """
+
+    def __init__(self, rate=None, burst=None, clock=time.monotonic):
+        self.rate = float(rate) if rate else 0.0
+        self.burst = float(burst or max(1.0, self.rate))
+        self.dropped = 0
+
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._warned = False
+
+    def _refill(self, now):
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause_remaining(self):
+        """
+        Returns the number of seconds left before sends resume, 0 if not paused.
+        """
+        return max(0.0, self._paused_until - self._clock())
+
+    def _take(self):
+        # Returns 0 if a token was taken, otherwise the number of seconds to wait for one.
+        now = self._clock()
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        if self.rate:
+            self._refill(now)
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+
+        return 0.0
+
+    def acquire(self):
+        """
+        Takes a token for one item. Returns False if the item must be dropped, either
+        because sends are paused or because the bucket is empty.
+        """
+        with self._lock:
+            if self._take():
+                self.dropped += 1
+                if not self._warned:
+                    self._warned = True
+                    if self._clock() < self._paused_until:
+                        log.warning('pyrollbar: Paused after a 429 response from Rollbar, '
+                                    'dropping items.')
+                    else:
+                        log.warning('pyrollbar: Over the client-side rate limit of %g items/s, '
+                                    'dropping items.', self.rate)
+                return False
+
+            self._warned = False
+            return True
+
+    def reserve(self):
+        """
+        Takes a token for one item if one is available. Returns 0 on success, otherwise
+        the number of seconds to wait before trying again. Nothing is counted as dropped.
+        """
+        with self._lock:
+            return self._take()
+
+    def pause(self, seconds):
+        """
+        Pauses sends for `seconds` seconds. A pause never shortens a longer one.
+        """
+        seconds = min(MAX_PAUSE, max(0.0, seconds))
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+def _header(headers, name):
+    if headers is None:
+        return None
+
+    value = headers.get(name)
+    if value is None:
+        # Twisted responses carry raw byte headers.
+        value = headers.get(name.encode('ascii'))
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    if isinstance(value, bytes):
+        value = value.decode('ascii', 'replace')
+    return value
+
+
+def retry_after(headers, now=None):
+    """
+    Returns the number of seconds to wait before sending again, according to the
+    headers of a 429 response.
+
+    The Rollbar API sends X-Rate-Limit-Remaining-Seconds and X-Rate-Limit-Reset (a UTC
+    timestamp). Retry-After is honored too.
+    """
+    remaining = _header(headers, 'X-Rate-Limit-Remaining-Seconds')
+    if remaining is None:
+        remaining = _header(headers, 'Retry-After')
+    if remaining is not None:
+        try:
+            return float(remaining)
+        except ValueError:
+            pass
+
+    reset = _header(headers, 'X-Rate-Limit-Reset')
+    if reset is not None:
+        try:
+            return float(reset) - (time.time() if now is None else now)
+        except ValueError:
+            pass
+
+    return DEFAULT_PAUSE
+
+
+def init_rate_limiter(rate=None, burst=None):
+    """
+    Creates the process-wide rate limiter used in front of every handler.
+
+    :type rate: float|None
+    :param rate: Average number of items per second let through. None or 0 means unlimited.
+    :type burst: int|None
+    :param burst: Number of items that can be sent at once. Defaults to `rate`.
+    """
+    global _limiter
+    _limiter = RateLimiter(rate, burst)
+
+
+def acquire():
+    """
+    Returns False if an item must be dropped because of the rate limit.
+    """
+    if _limiter is None:
+        return True
+    return _limiter.acquire()
+
+
+def pause_remaining():
+    """
+    Returns the number of seconds left before sends resume, 0 if not paused.
+    """
+    if _limiter is None:
+        return 0.0
+    return _limiter.pause_remaining()
+
+
+def reserve():
+    """
+    Takes a token for one item if one is available. Returns 0 on success, otherwise
+    the number of seconds to wait before trying again.
+    """
+    if _limiter is None:
+        return 0.0
+    return _limiter.reserve()
+
+
+def on_rate_limited(headers):
+    """
+    Pauses sends after a 429 response, until the reset time given by its headers.
+    """
+    if _limiter is None:
+        return
+    _limiter.pause(retry_after(headers))
+
+
+def dropped():
+    """
+    Returns the number of items dropped by the rate limiter.
+    """
+    if _limiter is None:
+        return 0
+    return _limiter.dropped
+
+
+__all__ = ['RateLimited', 'RateLimiter', 'init_rate_limiter', 'acquire', 'reserve',
+           'pause_remaining', 'on_rate_limited', 'retry_after', 'dropped']
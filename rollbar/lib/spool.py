@@ -0,0 +1,456 @@
+"""
+A durable on-disk spool for store-and-forward delivery.
+
+Serialized payloads are appended to segment files in a directory. A background
+forwarder reads them back from a checkpointed position and sends them, so items
+reported while the Rollbar API is slow or unreachable are delivered once it is
+reachable again, including after a process restart.
+
+Layout of the spool directory:
+
+    00000000000000000001.seg   segment files, oldest first
+    00000000000000000002.seg
+    checkpoint                 "<segment number> <offset>" of the next record to send
+
+Each record is a fixed-size header followed by the access token and the payload:
+
+    crc32 (4 bytes) | payload length (4 bytes) | token length (2 bytes) | token | payload
+
+A record is written with a single write() on a file opened in append mode. A record
+that is truncated or fails its checksum (e.g. after a crash in the middle of a write)
+ends its segment; the reader moves on to the next one.
+
+A spool directory must only be used by one process at a time.
+"""
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+
+log = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('>IIH')
+_SEGMENT_SUFFIX = '.seg'
+_CHECKPOINT = 'checkpoint'
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_SEGMENT_BYTES = 4 * 1024 * 1024
+
+_spool = None  # type: Spool|None
+_forwarder = None  # type: Forwarder|None
+_spool_args = None  # arguments of init_spool(), to start again in a forked child
+_pid = None
+_lock = threading.Lock()
+
+
+def _segment_name(number):
+    return '%020d%s' % (number, _SEGMENT_SUFFIX)
+
+
+class Spool(object):
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, segment_bytes=DEFAULT_SEGMENT_BYTES,
+                 fsync=False):
+        self.directory = directory
+        self.max_bytes = max_bytes or 0
+        self.segment_bytes = max(1, segment_bytes or DEFAULT_SEGMENT_BYTES)
+        self.fsync = fsync
+        self.evicted_bytes = 0
+
+        self._lock = threading.Lock()
+        self._fd = None
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._segments = {}
+        for name in os.listdir(directory):
+            if name.endswith(_SEGMENT_SUFFIX):
+                try:
+                    number = int(name[:-len(_SEGMENT_SUFFIX)])
+                except ValueError:
+                    continue
+                self._segments[number] = os.path.getsize(os.path.join(directory, name))
+
+        # Segments left by a previous process are only read from, since their last
+        # record may have been cut short by a crash.
+        self._write_segment = 1
+        if self._segments:
+            self._write_segment = max(self._segments)
+            if self._segments[self._write_segment]:
+                self._write_segment += 1
+        self._segments.setdefault(self._write_segment, 0)
+        self._read_segment, self._read_offset = self._load_checkpoint()
+
+    def _path(self, number):
+        return os.path.join(self.directory, _segment_name(number))
+
+    def _load_checkpoint(self):
+        oldest = min(self._segments)
+        try:
+            with open(os.path.join(self.directory, _CHECKPOINT)) as f:
+                segment, offset = (int(x) for x in f.read().split())
+        except (OSError, ValueError):
+            return oldest, 0
+
+        if segment < oldest:
+            return oldest, 0
+        return segment, offset
+
+    def _save_checkpoint(self):
+        path = os.path.join(self.directory, _CHECKPOINT)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('%d %d' % (self._read_segment, self._read_offset))
+        os.replace(tmp_path, path)
+
+    def _open_write_segment(self):
+        if self._fd is None:
+            self._fd = os.open(self._path(self._write_segment),
+                               os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        return self._fd
+
+    def size(self):
+        """
+        Returns the number of bytes currently held in the spool.
+        """
+        with self._lock:
+            return sum(self._segments.values())
+
+    def append(self, payload, access_token):
+        """
+        Appends a serialized payload to the spool.
+        """
+        if isinstance(payload, str):
+            payload = payload.encode('utf8')
+        token = (access_token or '').encode('utf8')
+
+        header = _HEADER.pack(zlib.crc32(token + payload), len(payload), len(token))
+        record = header + token + payload
+
+        with self._lock:
+            if self._segments[self._write_segment] >= self.segment_bytes:
+                self._roll()
+
+            fd = self._open_write_segment()
+            os.write(fd, record)
+            if self.fsync:
+                os.fsync(fd)
+            self._segments[self._write_segment] += len(record)
+
+            self._evict()
+
+    def _roll(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._write_segment += 1
+        self._segments[self._write_segment] = 0
+
+    def _evict(self):
+        # Drop whole segments, oldest first, but never the one being written to.
+        if not self.max_bytes:
+            return
+
+        total = sum(self._segments.values())
+        while total > self.max_bytes and len(self._segments) > 1:
+            oldest = min(self._segments)
+            size = self._segments.pop(oldest)
+            total -= size
+            self.evicted_bytes += size
+            self._remove_segment(oldest)
+            log.warning('pyrollbar: Spool is over its size limit, '
+                        'dropped %d bytes of the oldest items.', size)
+
+            if self._read_segment <= oldest:
+                self._read_segment, self._read_offset = min(self._segments), 0
+                self._save_checkpoint()
+
+    def _remove_segment(self, number):
+        try:
+            os.remove(self._path(number))
+        except OSError:
+            pass
+
+    def read(self, max_records=100):
+        """
+        Returns up to `max_records` unsent records as a list of
+        (payload, access_token, position) tuples, oldest first.
+
+        Pass the position of the last record that was handled to commit().
+        """
+        records = []
+        with self._lock:
+            segment, offset = self._read_segment, self._read_offset
+            write_segment = self._write_segment
+
+        while len(records) < max_records and segment <= write_segment:
+            try:
+                with open(self._path(segment), 'rb') as f:
+                    f.seek(offset)
+                    while len(records) < max_records:
+                        header = f.read(_HEADER.size)
+                        if len(header) < _HEADER.size:
+                            break
+                        crc, payload_len, token_len = _HEADER.unpack(header)
+                        data = f.read(token_len + payload_len)
+                        if len(data) < token_len + payload_len or zlib.crc32(data) != crc:
+                            if segment == write_segment:
+                                # Possibly a write in progress; try again later.
+                                return records
+                            log.warning('pyrollbar: Skipping corrupted record in spool segment %d.',
+                                        segment)
+                            # The rest of a sealed segment is skipped once the records
+                            # before it are committed, or right away if there are none.
+                            if records:
+                                payload, token, _ = records[-1]
+                                records[-1] = (payload, token, (segment + 1, 0))
+                            else:
+                                self.commit((segment + 1, 0))
+                            break
+                        offset = f.tell()
+                        token = data[:token_len].decode('utf8')
+                        records.append((data[token_len:], token, (segment, offset)))
+            except FileNotFoundError:
+                pass
+
+            if len(records) >= max_records or segment == write_segment:
+                break
+            segment, offset = segment + 1, 0
+
+        return records
+
+    def commit(self, position):
+        """
+        Marks every record up to `position` as sent.
+        """
+        segment, offset = position
+        with self._lock:
+            if (segment, offset) <= (self._read_segment, self._read_offset):
+                return
+
+            for number in [n for n in self._segments if n < segment]:
+                self._segments.pop(number)
+                self._remove_segment(number)
+
+            self._read_segment, self._read_offset = segment, offset
+            self._save_checkpoint()
+
+    def pending(self):
+        """
+        Returns True if there are records that have not been committed yet.
+        """
+        with self._lock:
+            unread = sum(size for number, size in self._segments.items()
+                         if number >= self._read_segment)
+            return unread > self._read_offset
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+class Forwarder(object):
+    """
+    Drains a Spool on a background thread by calling `sender(payload, access_token)`
+    for each record.
+
+    If `sender` raises, the record is kept and retried with an exponential backoff,
+    up to `max_backoff` seconds between attempts. An exception with a `retry_after`
+    attribute sets the delay before the next attempt instead.
+    """
+
+    def __init__(self, spool, sender, batch_size=100, max_backoff=30.0,
+                 name='rollbar-spool-forwarder'):
+        self.spool = spool
+        self.sender = sender
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.name = name
+
+        self._wakeup = threading.Event()
+        self._idle = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _run(self):
+        backoff = 0
+        while not self._stopped:
+            records = self.spool.read(self.batch_size)
+            if not records:
+                self._idle.set()
+                self._wakeup.wait(1.0)
+                self._wakeup.clear()
+                continue
+
+            self._idle.clear()
+            for payload, access_token, position in records:
+                try:
+                    self.sender(payload, access_token)
+                except Exception as e:
+                    retry_after = getattr(e, 'retry_after', None)
+                    if retry_after is not None:
+                        delay = retry_after
+                        log.debug('pyrollbar: Spool forwarder rate limited, retrying in %.1fs.',
+                                  delay)
+                    else:
+                        backoff = delay = min(self.max_backoff, (backoff * 2) or 0.5)
+                        log.warning('pyrollbar: Unable to forward spooled item, '
+                                    'retrying in %.1fs: %r', delay, e)
+                    self._wakeup.wait(delay)
+                    self._wakeup.clear()
+                    break
+
+                backoff = 0
+                self.spool.commit(position)
+
+    def join(self, timeout=None):
+        """
+        Blocks until the spool has been drained. Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.spool.pending():
+            self._idle.clear()
+            self.notify()
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            self._idle.wait(0.05 if remaining is None else min(0.05, remaining))
+        return True
+
+    def stop(self):
+        self._stopped = True
+        self.notify()
+
+
+def replay(spool, sender, rate=None, stop_on_error=True):
+    """
+    Sends every record of `spool` synchronously, at most `rate` records per second.
+
+    Returns the number of records that were sent.
+    """
+    interval = 1.0 / rate if rate else 0
+    sent = 0
+    while True:
+        records = spool.read(100)
+        if not records:
+            return sent
+
+        for payload, access_token, position in records:
+            started = time.monotonic()
+            try:
+                sender(payload, access_token)
+            except Exception:
+                if stop_on_error:
+                    raise
+                log.exception('pyrollbar: Unable to replay spooled item.')
+            spool.commit(position)
+            sent += 1
+
+            elapsed = time.monotonic() - started
+            if interval > elapsed:
+                time.sleep(interval - elapsed)
+
+
+def init_spool(directory, sender, max_bytes=None, segment_bytes=None, fsync=False):
+    """
+    Creates the spool used by the 'spool' handler and starts its forwarder.
+
+    :type directory: str
+    :param directory: Directory holding the spool files. '{pid}' is replaced by the current
+        process id.
+    :type sender: function
+    :param sender: Called with (payload, access_token) for each spooled record.
+    """
+    global _spool_args
+
+    with _lock:
+        if _pid == os.getpid():
+            if _forwarder is not None:
+                _forwarder.stop()
+            if _spool is not None:
+                _spool.close()
+        else:
+            _close_inherited()
+
+        _spool_args = (directory, sender, max_bytes, segment_bytes, fsync)
+        _start()
+
+
+def _start():
+    # Called with the lock held.
+    global _spool, _forwarder, _pid
+
+    directory, sender, max_bytes, segment_bytes, fsync = _spool_args
+    _spool = Spool(directory.format(pid=os.getpid()),
+                   max_bytes=DEFAULT_MAX_BYTES if max_bytes is None else max_bytes,
+                   segment_bytes=segment_bytes or DEFAULT_SEGMENT_BYTES,
+                   fsync=fsync)
+    _forwarder = Forwarder(_spool, sender)
+    _forwarder.start()
+    _pid = os.getpid()
+
+
+def _ensure_started():
+    # The forwarder thread does not survive os.fork(), and the spool of the parent
+    # is still written to and evicted from by the parent, so a forked child starts
+    # a spool of its own.
+    pid = os.getpid()
+    if _spool_args is None or _pid == pid:
+        return
+
+    with _lock:
+        if _pid == pid:
+            return
+
+        if '{pid}' not in _spool_args[0]:
+            log.warning("pyrollbar: spool_dir has no '{pid}', "
+                        "process %d shares the spool of its parent.", pid)
+        _close_inherited()
+        _start()
+
+
+def _close_inherited():
+    # Closes the descriptor of the spool inherited from the parent process, without
+    # its lock, which may have been held by a thread at fork time.
+    if _spool is not None and _spool._fd is not None:
+        os.close(_spool._fd)
+        _spool._fd = None
+
+
+def submit(payload_str, access_token):
+    """
+    Append an item to the spool.
+
+    :type payload_str: str
+    :type access_token: str
+    """
+    if _spool is None:
+        log.warning('pyrollbar: Spool not initialized. '
+                    'Please ensure init_spool() is called prior to submit().')
+        return False
+
+    _ensure_started()
+    _spool.append(payload_str, access_token)
+    _forwarder.notify()
+    return True
+
+
+def join(timeout=None):
+    """
+    Blocks until the spool has been drained. Returns False on timeout.
+    """
+    if _forwarder is None:
+        return True
+    _ensure_started()
+    return _forwarder.join(timeout)
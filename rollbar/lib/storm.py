@@ -0,0 +1,166 @@
+"""
+Circuit breaker for exception storms.
+
+Every exception gets a cheap signature: its class and the (filename, function, line)
+of each frame of its traceback, without its message or any formatting. Each signature
+has a token bucket allowing `rate` occurrences per second on average and bursts of
+up to `burst` occurrences. Occurrences over the limit are suppressed before any of
+their payload is built, and every `interval` seconds a Suppressed object counting
+them is handed to `emit`, for each signature that had some.
+"""
+import time
+
+from rollbar.lib.summaries import Slot, Summarizer, trace_locations
+
+_breaker = Slot()
+
+
+def signature(cls, trace):
+    """
+    Returns the signature of an exception: its class and the code locations of its traceback.
+    """
+    return cls, trace_locations(trace)
+
+
+class Suppressed(object):
+    """
+    Occurrences of one signature suppressed since the last summary.
+    """
+
+    def __init__(self, cls, location, level, timestamp):
+        self.exception_class = getattr(cls, '__name__', repr(cls))
+        self.location = location
+        self.level = level
+        self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+        self.count = 0
+
+
+class _Bucket(object):
+    __slots__ = ('tokens', 'updated', 'suppressed')
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+        self.suppressed = None
+
+
+class StormBreaker(Summarizer):
+    """
+    Tracks the token buckets of the signatures seen recently.
+
+    `emit` is called with a Suppressed object, on a background thread started with the
+    first suppressed occurrence, every `interval` seconds for each signature that had
+    suppressed occurrences. At most `max_signatures` buckets are kept; when full, the
+    one used least recently is dropped.
+    """
+
+    emit_error = 'pyrollbar: Exception while reporting suppressed occurrences.'
+
+    def __init__(self, emit, rate, burst=None, interval=60.0, max_signatures=1000,
+                 name='rollbar-storm', clock=time.monotonic):
+        super(StormBreaker, self).__init__(emit, name, clock=clock)
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, self.rate))
+        self.interval = interval or 60.0
+        self.max_signatures = max(1, max_signatures or 1)
+
+        self._buckets = {}
+
+    def _reset(self):
+        # Occurrences suppressed by the parent process are reported by the parent.
+        for bucket in self._buckets.values():
+            bucket.suppressed = None
+
+    def _wait_time(self):
+        return self.interval
+
+    def _take(self, now, force):
+        suppressed = []
+        for bucket in self._buckets.values():
+            if bucket.suppressed is not None:
+                suppressed.append(bucket.suppressed)
+                bucket.suppressed = None
+        return suppressed
+
+    def allow(self, cls, trace, level=None):
+        """
+        Takes a token for an occurrence of the exception. Returns False if it must be
+        suppressed.
+        """
+        key = signature(cls, trace)
+        now = self._clock()
+        evicted = None
+        with self._cond:
+            self._check_pid()
+
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_signatures:
+                    oldest = min(self._buckets, key=lambda k: self._buckets[k].updated)
+                    evicted = self._buckets.pop(oldest).suppressed
+                bucket = self._buckets[key] = _Bucket(self.burst, now)
+            else:
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+
+            allowed = bucket.tokens >= 1
+            if allowed:
+                bucket.tokens -= 1
+            else:
+                if bucket.suppressed is None:
+                    location = key[1][-1] if key[1] else None
+                    if location is not None:
+                        location = '%s:%d' % (location[0], location[2])
+                    bucket.suppressed = Suppressed(cls, location, level, time.time())
+                bucket.suppressed.count += 1
+                bucket.suppressed.last_timestamp = time.time()
+                self._start()
+
+        if evicted is not None:
+            self._emit([evicted])
+        return allowed
+
+
+def init_breaker(emit, rate, burst=None, interval=None, max_signatures=None):
+    """
+    Creates the circuit breaker used when the 'storm_rate' setting is set.
+
+    :type emit: function
+    :param emit: Called with a Suppressed object for each signature with suppressed occurrences.
+    :type rate: float
+    :param rate: Average number of occurrences of the same exception let through per second.
+    :type burst: int|None
+    :param burst: Number of occurrences of the same exception let through at once.
+    :type interval: float|None
+    :param interval: Number of seconds between two calls to `emit` for the same signature.
+    :type max_signatures: int|None
+    :param max_signatures: Maximum number of signatures tracked at once.
+    """
+    _breaker.set(StormBreaker(emit, rate, burst=burst, interval=interval,
+                              max_signatures=max_signatures))
+
+
+def disable():
+    """
+    Stops suppressing exception storms, after emitting the counts of suppressed occurrences.
+    """
+    _breaker.clear()
+
+
+def allow(cls, trace, level=None):
+    """
+    Returns False if an occurrence of the exception must be suppressed, True otherwise,
+    including when the circuit breaker is disabled.
+    """
+    breaker = _breaker.summarizer
+    if breaker is None:
+        return True
+    return breaker.allow(cls, trace, level)
+
+
+def flush():
+    """
+    Emits the counts of the occurrences suppressed so far right away.
+    """
+    _breaker.flush()
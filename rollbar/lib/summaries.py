@@ -0,0 +1,144 @@
+"""
+Common parts of the storm breaker and of the aggregator: both count occurrences of
+exceptions, without building their payloads, and hand summaries of them to `emit`
+from a background thread.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+def trace_locations(trace):
+    """
+    Returns the (filename, function, line) of each frame of a traceback.
+    """
+    locations = []
+    while trace is not None:
+        code = trace.tb_frame.f_code
+        locations.append((code.co_filename, code.co_name, trace.tb_lineno))
+        trace = trace.tb_next
+    return tuple(locations)
+
+
+class Summarizer(object):
+    """
+    Base class of the objects handing summaries of exception occurrences to `emit`.
+
+    Subclasses implement the following methods, called with `self._cond` held:
+
+    - `_reset()`, which forgets what was counted by the parent process after a fork;
+    - `_wait_time()`, which returns the number of seconds the background thread waits
+      before taking the summaries due, or None to wait until notified;
+    - `_take(now, force)`, which removes and returns the summaries due at `now`, or
+      all of them if `force`.
+
+    They call `_check_pid()` before counting an occurrence, and `_start()` once there
+    is something to summarize.
+    """
+
+    emit_error = 'pyrollbar: Exception while reporting occurrences.'
+
+    def __init__(self, emit, name, clock=time.monotonic):
+        self.emit = emit
+        self.name = name
+
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+        self._pid = None
+
+    def _reset(self):
+        raise NotImplementedError()
+
+    def _wait_time(self):
+        raise NotImplementedError()
+
+    def _take(self, now, force):
+        raise NotImplementedError()
+
+    def _check_pid(self):
+        # Called with the lock held. Threads do not survive os.fork(): the child
+        # starts its own, and the parent reports what it counted.
+        pid = os.getpid()
+        if self._pid != pid:
+            self._reset()
+            self._stopped = False
+            self._thread = None
+            self._pid = pid
+
+    def _start(self):
+        # Called with the lock held.
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _emit(self, summaries):
+        for summary in summaries:
+            try:
+                self.emit(summary)
+            except Exception:
+                log.exception(self.emit_error)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                timeout = self._wait_time()
+                if timeout is None or timeout > 0:
+                    self._cond.wait(timeout)
+                if self._stopped:
+                    return
+                summaries = self._take(self._clock(), False)
+
+            self._emit(summaries)
+
+    def flush(self):
+        """
+        Emits every summary right away.
+        """
+        if self._pid != os.getpid():
+            return
+
+        with self._cond:
+            summaries = self._take(self._clock(), True)
+        self._emit(summaries)
+
+    def shutdown(self):
+        self.flush()
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+
+class Slot(object):
+    """
+    Holds the summarizer used by the functions of a module, which is flushed at
+    interpreter exit.
+    """
+
+    def __init__(self):
+        self.summarizer = None  # type: Summarizer|None
+
+    def set(self, summarizer):
+        self.clear()
+        self.summarizer = summarizer
+        atexit.register(summarizer.shutdown)
+
+    def clear(self):
+        summarizer = self.summarizer
+        if summarizer is not None:
+            atexit.unregister(summarizer.shutdown)
+            summarizer.shutdown()
+        self.summarizer = None
+
+    def flush(self):
+        summarizer = self.summarizer
+        if summarizer is not None:
+            summarizer.flush()
@@ -1,9 +1,12 @@
 import logging
 import os
 import sys
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 
 _pool = None  # type: ThreadPoolExecutor|None
+_futures = set()
+_futures_lock = threading.Lock()
 
 log = logging.getLogger(__name__)
 
@@ -35,4 +38,33 @@ def submit(worker, payload_str, access_token):
     if _pool is None:
         log.warning('pyrollbar: Thead pool not initialized. Please ensure init_pool() is called prior to submit().')
         return
-    _pool.submit(worker, payload_str, access_token)
+    future = _pool.submit(worker, payload_str, access_token)
+    with _futures_lock:
+        _futures.add(future)
+    future.add_done_callback(_discard)
+
+
+def _discard(future):
+    with _futures_lock:
+        _futures.discard(future)
+
+
+def pending():
+    """
+    Returns the number of submitted tasks that have not completed yet.
+    """
+    with _futures_lock:
+        return len(_futures)
+
+
+def join(timeout=None):
+    """
+    Blocks until every submitted task has completed. Returns False on timeout.
+    """
+    with _futures_lock:
+        futures = list(_futures)
+    if not futures:
+        return True
+
+    _, not_done = wait(futures, timeout=timeout)
+    return not not_done
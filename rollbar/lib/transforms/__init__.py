@@ -10,6 +10,8 @@ from rollbar.lib import (
 # The `Transform` class was moved out of this file to prevent a cyclical dependency issue.
 from rollbar.lib.transform import Transform
 from rollbar.lib.transforms.batched import BatchedTransform
+from rollbar.lib.transforms.fused import compile_groups
+from rollbar.lib.type_info import classify, DEFAULT
 
 _ALLOWED_CIRCULAR_REFERENCE_TYPES = [binary_type, bool, type(None)]
 
@@ -26,12 +28,19 @@ else:
 _ALLOWED_CIRCULAR_REFERENCE_TYPES = tuple(_ALLOWED_CIRCULAR_REFERENCE_TYPES)
 
 
-def transform(obj, transforms, key=None, batch_transforms=False):
+def transform(obj, transforms, key=None, batch_transforms=False, fuse_transforms=False):
     if isinstance(transforms, Transform):
         transforms = [transforms]
 
     if batch_transforms:
         transforms = [BatchedTransform(transforms)]
+    elif fuse_transforms:
+        for group in _fused_groups(transforms):
+            if len(group.transforms) == 1:
+                obj = _transform(obj, group.transforms[0], key=key)
+            else:
+                obj = group.apply(obj, key or (), _transform)
+        return obj
 
     for transform in transforms:
         if not isinstance(transform, Transform):
@@ -41,11 +50,35 @@ def transform(obj, transforms, key=None, batch_transforms=False):
     return obj
 
 
+# Compiled groups of the most recently used transform lists, keyed by the ids of
+# their transforms.
+_fused_cache = {}
+_FUSED_CACHE_SIZE = 16
+
+
+def _fused_groups(transforms):
+    cache_key = tuple(id(t) for t in transforms)
+    cached = _fused_cache.get(cache_key)
+    # The transforms are kept with the groups so that their ids are not reused.
+    if cached is not None and all(a is b for a, b in zip(cached[0], transforms)):
+        return cached[1]
+
+    groups = compile_groups(transforms, _ALLOWED_CIRCULAR_REFERENCE_TYPES)
+    if len(_fused_cache) >= _FUSED_CACHE_SIZE:
+        _fused_cache.clear()
+    _fused_cache[cache_key] = (tuple(transforms), groups)
+    return groups
+
+
 def _transform(obj, transform, key=None):
     key = key or ()
+    methods = {}
 
     def do_transform(type_name, val, key=None, **kw):
-        fn = getattr(transform, "transform_%s" % type_name, transform.transform_custom)
+        fn = methods.get(type_name)
+        if fn is None:
+            fn = getattr(transform, "transform_%s" % type_name, transform.transform_custom)
+            methods[type_name] = fn
         val = fn(val, key=key, **kw)
 
         return val
@@ -57,20 +90,12 @@ def _transform(obj, transform, key=None):
             return do_transform("unicode", s, key=key)
 
     def default_handler(o, key=None):
-        if isinstance(o, bool):
-            return do_transform("boolean", o, key=key)
-
-        # There is a quirk in the current version (1.1.6) of the enum
-        # backport enum34 which causes it to not have the same
-        # behavior as Python 3.4+. One way to identify IntEnums is that
-        # they are instances of numbers but not number types.
-        if isinstance(o, number_types):
-            if type(o) not in number_types:
-                return do_transform("custom", o, key=key)
-            else:
-                return do_transform("number", o, key=key)
-
-        return do_transform("custom", o, key=key)
+        # Also called for any object a type-specific handler failed on, which is
+        # then treated as a custom object.
+        obj_type, method = classify(o)
+        if obj_type is not DEFAULT:
+            method = "custom"
+        return do_transform(method, o, key=key)
 
     handlers = {
         "string_handler": string_handler,
@@ -67,9 +67,11 @@ class BatchedTransform(Transform):
 
     def default(self, o, key=None):
         for transform in self._transforms:
-            node_type = type_info.get_type(o)
-            handler = handlers.get(node_type, handlers.get(type_info.DEFAULT))
-            o = handler(transform, o, key=key)
+            node_type, method = type_info.classify(o)
+            if node_type is type_info.PATH:
+                # Paths have no handler of their own here.
+                method = "custom"
+            o = do_transform(transform, method, o, key=key)
 
         return o
 
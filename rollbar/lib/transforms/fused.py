@@ -0,0 +1,265 @@
+"""
+Applies a list of transforms in a single walk of the object.
+
+`transform()` applies each transform with its own traversal, walking and rebuilding
+the whole object once per transform. `FusedTransform` compiles the ordered list into
+groups, each made of at most one breadth-first transform (e.g. ShortenerTransform)
+followed by depth-first transforms, and applies a group in one walk: at every node
+the breadth-first transform runs on the way down and the depth-first ones on the way
+back up, in order.
+
+The result is the same as applying the transforms one after the other. To guarantee
+it, the walk keeps, for every node, its value after each transform, so that every
+transform is called with exactly the value it would have seen in its own traversal.
+A transform that changes the shape of a container (drops or renames keys, returns a
+leaf...) has the rest of the transforms applied to its result, as a new object.
+Where the single walk cannot tell what the separate traversals would have done (an
+object referenced more than once, or an exception raised by a transform), the group
+is applied again the usual way, one transform at a time; transforms should therefore
+be free of side effects. So is an object nested too deeply for the recursive walk.
+"""
+from rollbar.lib.transform import Transform
+from rollbar.lib.type_info import (
+    classify,
+    get_type,
+    MAPPING,
+    TUPLE,
+    NAMEDTUPLE,
+    LIST,
+    SET,
+)
+
+_CONTAINER_TYPES = (MAPPING, TUPLE, NAMEDTUPLE, LIST, SET)
+
+_CONTAINER_METHODS = {
+    MAPPING: 'dict',
+    TUPLE: 'tuple',
+    NAMEDTUPLE: 'namedtuple',
+    LIST: 'list',
+    SET: 'set',
+}
+
+_LEAF_METHODS = ('unicode', 'bytes', 'number', 'boolean', 'path', 'custom')
+
+# Exact types that are never tracked as circular references.
+_UNTRACKED_TYPES = frozenset([str, bytes, int, float, bool, type(None)])
+
+
+class _Fallback(Exception):
+    pass
+
+
+def _children(obj, obj_type):
+    # The (key, child) pairs traverse() would descend into.
+    if obj_type is MAPPING:
+        return list(obj.items())
+    if obj_type is NAMEDTUPLE:
+        return list(obj._asdict().items())
+    return list(enumerate(obj))
+
+
+def _rebuild(obj, obj_type, values, keys):
+    # The container traverse() builds from the transformed children.
+    if obj_type is MAPPING:
+        return dict(zip(keys, values))
+    if obj_type is TUPLE:
+        return tuple(values)
+    if obj_type is NAMEDTUPLE:
+        return obj._make(values)
+    if obj_type is LIST:
+        return list(values)
+    return set(values)
+
+
+def _same_key(a, b):
+    return a is b or (type(a) is type(b) and a == b)
+
+
+def _has_children(obj, obj_type, keys, values):
+    """
+    Returns True if a traversal of `obj` would descend into `values`, at `keys`.
+    """
+    if get_type(obj) is not obj_type:
+        return False
+
+    children = _children(obj, obj_type)
+    if len(children) != len(values):
+        return False
+
+    for (k, v), key, value in zip(children, keys, values):
+        if v is not value or not _same_key(k, key):
+            return False
+    return True
+
+
+class _Stage(object):
+    def __init__(self, transform):
+        self.transform = transform
+        self.pre_order = not transform.depth_first
+        self.methods = {}
+        for name in _LEAF_METHODS + tuple(_CONTAINER_METHODS.values()):
+            self.methods[name] = getattr(transform, 'transform_%s' % name,
+                                         transform.transform_custom)
+
+
+class FusedTransform(object):
+    """
+    A group of transforms applied in a single walk: an optional breadth-first
+    transform followed by depth-first transforms.
+    """
+
+    def __init__(self, transforms, allowed_circular_reference_types):
+        self.transforms = list(transforms)
+        self._stages = [_Stage(t) for t in self.transforms]
+        self._allowed = allowed_circular_reference_types
+
+        if any(stage.pre_order for stage in self._stages[1:]):
+            raise ValueError('Only the first transform of a group can be breadth-first.')
+
+    def apply(self, obj, key, fallback):
+        """
+        Applies the transforms to `obj`. `fallback(obj, transform, key)` applies a single
+        transform with its own traversal and is used if the single walk gives up.
+        """
+        self._memos = [{} for _ in self._stages]
+        self._visits = []
+        self._keep_alive = []
+        try:
+            return self._walk(obj, key, 0)[-1]
+        except (_Fallback, RecursionError):
+            # Deeply nested objects are left to the traversal, which has no limit.
+            pass
+        finally:
+            self._memos = None
+            self._visits = None
+            self._keep_alive = None
+
+        for transform in self.transforms:
+            obj = fallback(obj, transform, key=key)
+        return obj
+
+    def _visit(self, obj, key, index):
+        # Records that the traversal of transform `index` visits `obj` at `key`, like
+        # traverse() does with its memo. A second visit would be reported as a circular
+        # reference, which the single walk does not reproduce.
+        if isinstance(obj, self._allowed):
+            return
+
+        memo = self._memos[index]
+        obj_id = id(obj)
+        if memo.get(obj_id):
+            raise _Fallback()
+        memo[obj_id] = key
+        self._visits.append((index, obj_id))
+        # Ids must not be reused by other objects during the walk.
+        self._keep_alive.append(obj)
+
+    def _forget(self, since, index):
+        # Forgets the visits of transforms `index` and up recorded since `since`: the
+        # traversals of these transforms do not visit the values they were made for.
+        kept = []
+        for visit in self._visits[since:]:
+            if visit[0] >= index:
+                del self._memos[visit[0]][visit[1]]
+            else:
+                kept.append(visit)
+        self._visits[since:] = kept
+
+    def _walk(self, obj, key, start):
+        """
+        Returns the values of `obj` after each of the transforms from `start` on, given
+        that `obj` is what the traversal of transform `start` visits at `key`.
+        """
+        stages = self._stages
+        results = []
+        value = obj
+        for index in range(start, len(stages)):
+            if type(value) not in _UNTRACKED_TYPES:
+                self._visit(value, key, index)
+            value_type, method = classify(value)
+            if value_type in _CONTAINER_TYPES:
+                # e.g. a transform that turned a leaf into a container.
+                results.extend(self._walk_container(value, value_type, key, index))
+                return results
+
+            try:
+                value = stages[index].methods[method](value, key=key)
+            except Exception:
+                raise _Fallback()
+            results.append(value)
+
+        return results
+
+    def _walk_container(self, obj, obj_type, key, start):
+        stages = self._stages
+        first = stages[start]
+        method = _CONTAINER_METHODS[obj_type]
+
+        try:
+            if first.pre_order:
+                # The breadth-first transform sees the container before its children
+                # and the traversal descends into its result.
+                shortened = first.methods[method](obj, key=key)
+                children = _children(shortened, obj_type)
+            else:
+                children = _children(obj, obj_type)
+        except Exception:
+            raise _Fallback()
+
+        keys = [k for k, _ in children]
+        since = len(self._visits)
+        child_results = [self._walk(child, key + (k,), start) for k, child in children]
+
+        results = []
+        visited = obj
+        for offset, index in enumerate(range(start, len(stages))):
+            values = [r[offset] for r in child_results]
+
+            if index > start:
+                # The traversal of this transform descends into what the previous
+                # transform returned; the children computed so far are only valid if
+                # it is the same container.
+                previous = results[-1]
+                if not _has_children(previous, obj_type, keys, values_before):
+                    self._forget(since, index)
+                    results.extend(self._walk(previous, key, index))
+                    return results
+                visited = previous
+                self._visit(visited, key, index)
+
+            try:
+                rebuilt = _rebuild(visited, obj_type, values, keys)
+                if stages[index].pre_order:
+                    value = rebuilt
+                else:
+                    value = stages[index].methods[method](rebuilt, key=key)
+            except Exception:
+                raise _Fallback()
+
+            results.append(value)
+            values_before = values
+
+        return results
+
+
+def compile_groups(transforms, allowed_circular_reference_types):
+    """
+    Splits an ordered list of transforms into groups that can each be applied in a
+    single walk.
+    """
+    groups = []
+    current = []
+    for transform in transforms:
+        if not isinstance(transform, Transform):
+            continue
+        if current and not transform.depth_first:
+            groups.append(current)
+            current = []
+        current.append(transform)
+    if current:
+        groups.append(current)
+
+    return [FusedTransform(group, allowed_circular_reference_types) for group in groups]
+
+
+__all__ = ['FusedTransform', 'compile_groups']
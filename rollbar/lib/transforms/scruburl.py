@@ -1,4 +1,6 @@
+import collections
 import re
+import threading
 from urllib.parse import urlsplit, urlencode, urlunsplit, parse_qs
 
 from rollbar.lib import string_types, binary_type
@@ -7,6 +9,16 @@ from rollbar.lib.transforms.scrub import ScrubTransform
 
 _starts_with_auth_re = re.compile(r'^[a-zA-Z0-9-_]*(:[^@/]+)?@')
 
+# Maximum number of strings whose scrubbed value is remembered by a ScrubUrlTransform.
+URL_CACHE_SIZE = 256
+
+
+def _may_have_netloc(s):
+    # A string without '//' or '@' never has a netloc, the part holding the credentials.
+    if isinstance(s, binary_type):
+        return b'//' in s or b'@' in s
+    return '//' in s or '@' in s
+
 
 class ScrubUrlTransform(ScrubTransform):
     priority = 50
@@ -24,6 +36,8 @@ class ScrubUrlTransform(ScrubTransform):
         self.scrub_username = scrub_username
         self.scrub_password = scrub_password
         self.params_to_scrub = {x.lower() for x in params_to_scrub or []}
+        self._cache = collections.OrderedDict()
+        self._cache_lock = threading.Lock()
 
     def in_scrub_fields(self, key):
         # Returning True here because we want to scrub URLs out of
@@ -31,7 +45,30 @@ class ScrubUrlTransform(ScrubTransform):
         return True
 
     def redact(self, url_string):
+        # Most strings are not URLs, and the same URLs show up all over a payload.
+        if not _may_have_netloc(url_string):
+            return url_string
+
+        with self._cache_lock:
+            try:
+                scrubbed = self._cache[url_string]
+            except KeyError:
+                pass
+            else:
+                self._cache.move_to_end(url_string)
+                return scrubbed
+
+        scrubbed = self._redact_url(url_string)
+
+        with self._cache_lock:
+            self._cache[url_string] = scrubbed
+            if len(self._cache) > URL_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return scrubbed
+
+    def _redact_url(self, url_string):
         _redact = super(ScrubUrlTransform, self).redact
+        original = url_string
 
         missing_colon_double_slash = False
 
@@ -45,13 +82,19 @@ class ScrubUrlTransform(ScrubTransform):
         except:
             # This isn't a URL, return url_string which is a no-op
             # for this transform
-            return url_string
+            return original
 
         netloc = url_parts.netloc
 
         # If there's no netloc, give up
         if not netloc:
-            return url_string
+            return original
+
+        # Nothing to scrub, leave the URL as it is rather than rebuilding it.
+        if not (any(param.lower() in self.params_to_scrub for param in qs_params)
+                or (self.scrub_username and url_parts.username)
+                or (self.scrub_password and url_parts.password)):
+            return original
 
         for qs_param, vals in qs_params.items():
             if qs_param.lower() in self.params_to_scrub:
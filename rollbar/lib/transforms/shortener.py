@@ -2,14 +2,17 @@ from array import array
 import collections
 import itertools
 import reprlib
+import threading
 
 from collections.abc import Mapping
 from typing import Union, Tuple
 
 from rollbar.lib import (
-    integer_types, key_in, key_depth, sequence_types,
-    string_types)
+    circular_reference_label, integer_types, sequence_types, string_types)
+from rollbar.lib.key_matcher import PatternMatcher
 from rollbar.lib.transform import Transform
+from rollbar.lib.type_info import (
+    cache_by_type, get_type, MAPPING, TUPLE, NAMEDTUPLE, LIST, SET, STRING)
 
 
 _type_name_mapping = {
@@ -57,7 +60,7 @@ def shorten_frozenset(obj: frozenset, max_len: int) -> frozenset:
     if len(obj) <= max_len:
         return obj
 
-    return frozenset([elem for i, elem in enumerate(obj) if i < max_len] + ['...'])
+    return frozenset(list(itertools.islice(obj, max_len)) + ['...'])
 
 
 def shorten_int(obj: int, max_len: int) -> Union[int, str]:
@@ -87,7 +90,7 @@ def shorten_set(obj: set, max_len: int) -> set:
     if len(obj) <= max_len:
         return obj
 
-    return set([elem for i, elem in enumerate(obj) if i < max_len] + ['...'])
+    return set(list(itertools.islice(obj, max_len)) + ['...'])
 
 
 def shorten_string(obj: str, max_len: int) -> str:
@@ -105,6 +108,56 @@ def shorten_tuple(obj: tuple, max_len: int) -> tuple:
     return obj[:max_len] + ('...',)
 
 
+def _size_name(obj):
+    # The name of the reprlib.Repr attribute holding the max size for `obj`.
+    for name, _type in _type_name_mapping.items():
+        # Special case for dicts since we are using collections.abc.Mapping
+        # to provide better type checking for dict-like objects
+        if name == 'mapping':
+            name = 'dict'
+
+        if _type and isinstance(obj, _type):
+            return 'max%s' % name
+
+    return 'maxother'
+
+
+def _keep(obj, max_len):
+    return obj
+
+
+def _shortener(obj):
+    # The function shortening `obj`, or None for other objects.
+    if isinstance(obj, array):
+        return shorten_array
+    if isinstance(obj, bytes):
+        return shorten_bytes
+    if isinstance(obj, collections.deque):
+        return shorten_deque
+    if isinstance(obj, (dict, Mapping)):
+        return shorten_mapping
+    if isinstance(obj, float):
+        return _keep
+    if isinstance(obj, frozenset):
+        return shorten_frozenset
+    if isinstance(obj, int):
+        return shorten_int
+    if isinstance(obj, list):
+        return shorten_list
+    if isinstance(obj, set):
+        return shorten_set
+    if isinstance(obj, str):
+        return shorten_string
+    if isinstance(obj, tuple):
+        return shorten_tuple
+
+    return None
+
+
+_get_size_name = cache_by_type(_size_name)
+_get_shortener = cache_by_type(_shortener)
+
+
 class ShortenerTransform(Transform):
     depth_first = False
     priority = 10
@@ -113,50 +166,21 @@ class ShortenerTransform(Transform):
         super(ShortenerTransform, self).__init__()
         self.safe_repr = safe_repr
         self.keys = keys
+        self._key_matcher = None
         self._repr = reprlib.Repr()
 
         for name, size in sizes.items():
             setattr(self._repr, name, size)
 
     def _get_max_size(self, obj):
-        for name, _type in _type_name_mapping.items():
-            # Special case for dicts since we are using collections.abc.Mapping
-            # to provide better type checking for dict-like objects
-            if name == 'mapping':
-                name = 'dict'
-
-            if _type and isinstance(obj, _type):
-                return getattr(self._repr, 'max%s' % name)
-
-        return self._repr.maxother
+        return getattr(self._repr, _get_size_name(obj))
 
     def _shorten(self, val):
-        max_size = self._get_max_size(val)
-
-        if isinstance(val, array):
-            return shorten_array(val, max_size)
-        if isinstance(val, bytes):
-            return shorten_bytes(val, max_size)
-        if isinstance(val, collections.deque):
-            return shorten_deque(val, max_size)
-        if isinstance(val, (dict, Mapping)):
-            return shorten_mapping(val, max_size)
-        if isinstance(val, float):
-            return val
-        if isinstance(val, frozenset):
-            return shorten_frozenset(val, max_size)
-        if isinstance(val, int):
-            return shorten_int(val, max_size)
-        if isinstance(val, list):
-            return shorten_list(val, max_size)
-        if isinstance(val, set):
-            return shorten_set(val, max_size)
-        if isinstance(val, str):
-            return shorten_string(val, max_size)
-        if isinstance(val, tuple):
-            return shorten_tuple(val, max_size)
-
-        return self._shorten_other(val)
+        shorten = _get_shortener(val)
+        if shorten is None:
+            return self._shorten_other(val)
+
+        return shorten(val, self._get_max_size(val))
 
     def _shorten_other(self, obj):
         if obj is None:
@@ -172,17 +196,23 @@ class ShortenerTransform(Transform):
 
         return self._repr.repr(obj)
 
+    def _get_key_matcher(self):
+        # Recompiled if `keys` is replaced.
+        if self._key_matcher is None or self._key_matcher.patterns is not self.keys:
+            self._key_matcher = PatternMatcher(self.keys)
+        return self._key_matcher
+
     def _should_shorten(self, val, key):
         if not key:
             return False
 
-        return key_in(key, self.keys)
+        return self._get_key_matcher().match(key)
 
     def _should_drop(self, val, key) -> bool:
         if not key:
             return False
 
-        max_depth = key_depth(key, self.keys)
+        max_depth = self._get_key_matcher().depth(key)
         if max_depth == 0:
             return False
 
@@ -201,4 +231,77 @@ class ShortenerTransform(Transform):
         return super(ShortenerTransform, self).default(o, key=key)
 
 
-__all__ = ['ShortenerTransform']
+class CaptureShortenerTransform(ShortenerTransform):
+    """
+    Applies the limits of ShortenerTransform to an object before the other transforms
+    walk it, so that they only see the part of it that will be kept.
+
+    Only what traverse() descends into is shortened: mappings, tuples, sequences and
+    strings, the containers nested `maxlevel` levels deep being dropped. Anything else
+    is left to the ShortenerTransform applied once the object is serialized, including
+    namedtuples and sets along with everything in them, whose content can end up in a
+    repr: namedtuples are serialized as one, and so is a set that cannot hold its
+    serialized elements. References to a container met earlier are replaced with the
+    label the serializer gives them, since the copies made here would hide them.
+
+    The result is then the same as if the whole object had been serialized, but for
+    the order of sets and for containers referenced more than once: one first met in
+    a part cut off is kept instead of being labelled as a reference to that part,
+    and one first met where it is redacted is labelled instead of kept. Key paths are
+    relative to the object: it is shortened whatever its key.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CaptureShortenerTransform, self).__init__(*args, **kwargs)
+        # The keys of the namedtuples and sets met in the current traversal, per thread.
+        self._local = threading.local()
+
+    def _shorten(self, val):
+        node_type = get_type(val)
+        if node_type is LIST:
+            # Serialized as a list, whatever the type of sequence.
+            max_len = self._repr.maxlist
+            if len(val) <= max_len:
+                return val
+            return list(itertools.islice(val, max_len)) + ['...']
+        if node_type in (MAPPING, TUPLE) or (node_type is STRING and isinstance(val, str)):
+            return super(CaptureShortenerTransform, self)._shorten(val)
+
+        return val
+
+    def _is_kept(self, key):
+        # Containers are handled before their children, so the namedtuples and sets
+        # holding the object at `key` have been met already.
+        if not key:
+            self._local.kept_keys = set()
+            return False
+
+        kept_keys = getattr(self._local, 'kept_keys', None)
+        if not kept_keys:
+            return False
+
+        return any(key[:i] in kept_keys for i in range(len(key)))
+
+    def transform_circular_reference(self, o, key=None, ref_key=None):
+        if get_type(o) in (MAPPING, TUPLE, NAMEDTUPLE, LIST, SET):
+            return circular_reference_label(o, ref_key)
+
+        return o
+
+    def default(self, o, key=None):
+        key = key or ()
+        if self._is_kept(key):
+            return o
+
+        node_type = get_type(o)
+        if node_type in (MAPPING, TUPLE, LIST) and self._repr.maxlevel <= len(key):
+            return {'...': '...'} if node_type is MAPPING else ['...']
+
+        if node_type in (NAMEDTUPLE, SET):
+            self._local.kept_keys.add(key)
+            return o
+
+        return self._shorten(o)
+
+
+__all__ = ['ShortenerTransform', 'CaptureShortenerTransform']
@@ -1,17 +1,48 @@
+import os
 from typing import Optional
 
 import requests
 import threading
 
 
-_local = threading.local()
+# A single session is shared by every sender thread so that connections to the
+# Rollbar API are kept alive and reused across items, regardless of the handler.
+_session_lock = threading.Lock()
+_shared_session = None  # type: requests.Session|None
+_session_pid = None
+_adapter_args = {}
+
+_stats_lock = threading.Lock()
+_stats = {
+    'requests': 0,
+    'errors': 0,
+}
+
+
+def _mount_adapters(session):
+    if not _adapter_args:
+        return
+    session.mount('https://', requests.adapters.HTTPAdapter(**_adapter_args))
+    session.mount('http://', requests.adapters.HTTPAdapter(**_adapter_args))
 
 
 def _session():
-    if hasattr(_local, 'session'):
-        return _local.session
-    _local.session = requests.Session()
-    return _local.session
+    global _shared_session, _session_pid
+
+    # Sockets must not be shared with a forked child, so a new session is
+    # created the first time it is used in a new process.
+    pid = os.getpid()
+    session = _shared_session
+    if session is not None and _session_pid == pid:
+        return session
+
+    with _session_lock:
+        if _shared_session is None or _session_pid != pid:
+            session = requests.Session()
+            _mount_adapters(session)
+            _shared_session = session
+            _session_pid = pid
+        return _shared_session
 
 
 def _get_proxy_cfg(kw: dict) -> Optional[dict]:
@@ -35,20 +66,88 @@ def configure_pool(**kw):
     args = {k: kw[k] for k in keys if kw.get(k, None) is not None}
     if len(args) == 0:
         return
-    https_adapter = requests.adapters.HTTPAdapter(**args)
-    http_adapter = requests.adapters.HTTPAdapter(**args)
-    _session().mount('https://', https_adapter)
-    _session().mount('http://', http_adapter)
 
+    with _session_lock:
+        _adapter_args.clear()
+        _adapter_args.update(args)
+        if _shared_session is not None and _session_pid == os.getpid():
+            _mount_adapters(_shared_session)
 
-def post(*args, **kw):
+
+def _request(method, *args, **kw):
     proxies = _get_proxy_cfg(kw)
-    return _session().post(*args, proxies=proxies, **kw)
+    try:
+        return getattr(_session(), method)(*args, proxies=proxies, **kw)
+    except Exception:
+        with _stats_lock:
+            _stats['errors'] += 1
+        raise
+    finally:
+        with _stats_lock:
+            _stats['requests'] += 1
+
+
+def post(*args, **kw):
+    return _request('post', *args, **kw)
 
 
 def get(*args, **kw):
-    proxies = _get_proxy_cfg(kw)
-    return _session().get(*args, proxies=proxies, **kw)
+    return _request('get', *args, **kw)
+
+
+def stats():
+    """
+    Returns metrics about the shared connection pool.
+
+    - requests: number of requests sent through the transport.
+    - errors: number of requests that raised an exception (timeouts, connection errors...).
+    - connections: number of connections opened by the pool. When this stays well below
+                   'requests', connections are being reused.
+    - idle_connections: number of kept-alive connections currently available for reuse.
+    """
+    with _stats_lock:
+        result = dict(_stats)
+
+    connections = 0
+    idle_connections = 0
+    session = _shared_session
+    if session is not None and _session_pid == os.getpid():
+        for adapter in list(session.adapters.values()):
+            managers = [adapter.poolmanager] + list(getattr(adapter, 'proxy_manager', {}).values())
+            for manager in managers:
+                if manager is None:
+                    continue
+                for pool_key in list(manager.pools.keys()):
+                    pool = manager.pools.get(pool_key)
+                    if pool is None:
+                        continue
+                    connections += getattr(pool, 'num_connections', 0)
+                    # Empty slots of the pool are filled with None placeholders.
+                    idle = getattr(getattr(pool, 'pool', None), 'queue', None) or []
+                    idle_connections += sum(1 for conn in list(idle) if conn is not None)
+
+    result['connections'] = connections
+    result['idle_connections'] = idle_connections
+    return result
+
+
+def reset():
+    """
+    Closes the shared session and its pooled connections, and resets the metrics.
+    """
+    global _shared_session, _session_pid
+
+    with _session_lock:
+        session = _shared_session
+        _shared_session = None
+        _session_pid = None
+
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
+
+    if session is not None:
+        session.close()
 
 
-__all__ = ['post', 'get', 'configure_pool']
+__all__ = ['post', 'get', 'configure_pool', 'stats', 'reset']
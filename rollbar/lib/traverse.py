@@ -84,98 +84,236 @@ def traverse(
     depth_first=True,
     **custom_handlers
 ):
-    memo = memo or {}
-    obj_id = id(obj)
-    obj_type = get_type(obj)
-
-    ref_key = memo.get(obj_id)
-    if ref_key:
-        if not allowed_circular_reference_types or not isinstance(
-            obj, allowed_circular_reference_types
-        ):
-            return circular_reference_handler(obj, key=key, ref_key=ref_key)
-
-    memo[obj_id] = key
-
-    kw = {
-        "string_handler": string_handler,
-        "tuple_handler": tuple_handler,
-        "namedtuple_handler": namedtuple_handler,
-        "list_handler": list_handler,
-        "set_handler": set_handler,
-        "mapping_handler": mapping_handler,
-        "path_handler": path_handler,
-        "default_handler": default_handler,
-        "circular_reference_handler": circular_reference_handler,
-        "allowed_circular_reference_types": allowed_circular_reference_types,
-        "memo": memo,
-        "depth_first": depth_first,
-    }
-    kw.update(custom_handlers)
-
-    try:
-        if obj_type is STRING:
-            return string_handler(obj, key=key)
+    traverser = Traverser(
+        string_handler=string_handler,
+        tuple_handler=tuple_handler,
+        namedtuple_handler=namedtuple_handler,
+        list_handler=list_handler,
+        set_handler=set_handler,
+        mapping_handler=mapping_handler,
+        path_handler=path_handler,
+        default_handler=default_handler,
+        circular_reference_handler=circular_reference_handler,
+        allowed_circular_reference_types=allowed_circular_reference_types,
+        depth_first=depth_first,
+        **custom_handlers
+    )
+    return traverser.traverse(obj, key=key, memo=memo)
+
+
+class Traverser(object):
+    """
+    Walks objects with an explicit stack instead of recursion, calling the same
+    handlers as `traverse()` with the same values, keys and circular references.
+
+    Containers are passed to their handler after their children if `depth_first`,
+    before them otherwise. If a handler raises, the object being handled, or else
+    the nearest container being traversed, is passed to `default_handler` instead.
+    """
+
+    def __init__(
+        self,
+        string_handler=_default_handlers[STRING],
+        tuple_handler=_default_handlers[TUPLE],
+        namedtuple_handler=_default_handlers[NAMEDTUPLE],
+        list_handler=_default_handlers[LIST],
+        set_handler=_default_handlers[SET],
+        mapping_handler=_default_handlers[MAPPING],
+        path_handler=_default_handlers[PATH],
+        default_handler=_default_handlers[DEFAULT],
+        circular_reference_handler=_default_handlers[CIRCULAR],
+        allowed_circular_reference_types=None,
+        depth_first=True,
+        **custom_handlers
+    ):
+        self.string_handler = string_handler
+        self.path_handler = path_handler
+        self.default_handler = default_handler
+        self.circular_reference_handler = circular_reference_handler
+        self.allowed_circular_reference_types = allowed_circular_reference_types
+        self.depth_first = depth_first
+        self.custom_handlers = custom_handlers
+        self.container_handlers = {
+            TUPLE: tuple_handler,
+            NAMEDTUPLE: namedtuple_handler,
+            LIST: list_handler,
+            SET: set_handler,
+            MAPPING: mapping_handler,
+        }
+
+    def traverse(self, obj, key=(), memo=None):
+        memo = memo or {}
+        string_handler = self.string_handler
+        path_handler = self.path_handler
+        default_handler = self.default_handler
+        circular_reference_handler = self.circular_reference_handler
+        allowed = self.allowed_circular_reference_types
+        custom_handlers = self.custom_handlers
+        container_handlers = self.container_handlers
+        depth_first = self.depth_first
+
+        # The containers being traversed, innermost last.
+        stack = []
+
+        while True:
+            # Visit `obj` at `key`: either compute its value, or push a frame to
+            # traverse its children.
+            obj_type = get_type(obj)
+            obj_id = id(obj)
+            value = error = None
+            pushed = use_default = False
+
+            try:
+                ref_key = memo.get(obj_id)
+                circular = ref_key and (not allowed or not isinstance(obj, allowed))
+                if circular:
+                    value = circular_reference_handler(obj, key=key, ref_key=ref_key)
+            except BaseException as e:
+                circular = True
+                error = e
+
+            if not circular:
+                memo[obj_id] = key
+                try:
+                    if obj_type is STRING:
+                        value = string_handler(obj, key=key)
+                    elif obj_type is PATH:
+                        value = path_handler(obj, key=key)
+                    elif obj_type is DEFAULT:
+                        use_default = True
+                        for handler_type, handler in custom_handlers.items():
+                            if isinstance(obj, handler_type):
+                                use_default = False
+                                value = handler(obj, key=key)
+                                break
+                    else:
+                        handler = container_handlers[obj_type]
+                        stack.append(_Frame(obj, key, obj_type, handler, depth_first))
+                        pushed = True
+                except BaseException as e:
+                    _log_fallback(e)
+                    use_default = True
+
+                if use_default:
+                    try:
+                        value = default_handler(obj, key=key)
+                    except BaseException as e:
+                        error = e
+
+            # Hand the value (or the error) of the visited node over to the
+            # enclosing containers, until one has another child to visit.
+            has_result = not pushed
+            while True:
+                if has_result:
+                    if error is not None:
+                        # The nearest container is passed to the default handler.
+                        if not stack:
+                            raise error
+                        value, error = stack.pop().fall_back(error, default_handler)
+                        continue
+
+                    if not stack:
+                        return value
+
+                    try:
+                        stack[-1].add(value)
+                    except BaseException as e:
+                        value, error = stack.pop().fall_back(e, default_handler)
+                        continue
+
+                frame = stack[-1]
+                try:
+                    child_key, obj = next(frame.items)
+                except StopIteration:
+                    stack.pop()
+                    try:
+                        value = frame.build()
+                    except BaseException as e:
+                        value, error = frame.fall_back(e, default_handler)
+                    has_result = True
+                    continue
+                except BaseException as e:
+                    stack.pop()
+                    value, error = frame.fall_back(e, default_handler)
+                    has_result = True
+                    continue
+
+                if frame.keys is not None:
+                    frame.keys.append(child_key)
+                key = frame.key + (child_key,)
+                break
+
+
+def _log_fallback(error):
+    # use the default handler for unknown object types
+    log.debug(
+        "Exception while traversing object using type-specific "
+        "handler. Switching to default handler.",
+        exc_info=error,
+    )
+
+
+class _Frame(object):
+    """
+    A container being traversed: its children still to visit and the values of those
+    already visited.
+    """
+
+    __slots__ = (
+        "obj", "key", "obj_type", "handler", "depth_first", "items", "keys", "values", "add"
+    )
+
+    def __init__(self, obj, key, obj_type, handler, depth_first):
+        self.obj = obj
+        self.key = key
+        self.obj_type = obj_type
+        self.handler = handler
+        self.depth_first = depth_first
+
+        # Breadth first, the children are those of the handled container.
+        children = obj if depth_first else handler(obj, key=key)
+
+        self.keys = None
+        if obj_type is MAPPING:
+            self.items = iter(children.items())
+            self.keys = []
+        elif obj_type is NAMEDTUPLE:
+            self.items = iter(children._asdict().items())
+        else:
+            self.items = enumerate(children)
+
+        if obj_type is SET:
+            self.values = set()
+            self.add = self.values.add
+        else:
+            self.values = []
+            self.add = self.values.append
+
+    def build(self):
+        obj_type = self.obj_type
+        values = self.values
+        if obj_type is MAPPING:
+            result = dict(zip(self.keys, values))
         elif obj_type is TUPLE:
-            if depth_first:
-                return tuple_handler(
-                    tuple(
-                        traverse(elem, key=key + (i,), **kw) for i, elem in enumerate(obj)
-                    ),
-                    key=key,
-                )
-            # Breadth first
-            return tuple(traverse(elem, key=key + (i,), **kw) for i, elem in enumerate(tuple_handler(obj, key=key)))
+            result = tuple(values)
         elif obj_type is NAMEDTUPLE:
-            if depth_first:
-                return namedtuple_handler(
-                    obj._make(
-                        traverse(v, key=key + (k,), **kw)
-                        for k, v in obj._asdict().items()
-                    ),
-                    key=key,
-                )
-            # Breadth first
-            return obj._make(traverse(v, key=key + (k,), **kw) for k, v in namedtuple_handler(obj, key=key)._asdict().items())
-        elif obj_type is LIST:
-            if depth_first:
-                return list_handler(
-                    [traverse(elem, key=key + (i,), **kw) for i, elem in enumerate(obj)],
-                    key=key,
-                )
-            # Breadth first
-            return [traverse(elem, key=key + (i,), **kw) for i, elem in enumerate(list_handler(obj, key=key))]
-        elif obj_type is SET:
-            if depth_first:
-                return set_handler(
-                    {traverse(elem, key=key + (i,), **kw) for i, elem in enumerate(obj)},
-                    key=key,
-                )
-            # Breadth first
-            return {traverse(elem, key=key + (i,), **kw) for i, elem in enumerate(set_handler(obj, key=key))}
-        elif obj_type is MAPPING:
-            if depth_first:
-                return mapping_handler(
-                    {k: traverse(v, key=key + (k,), **kw) for k, v in obj.items()},
-                    key=key,
-                )
-            # Breadth first
-            return {k: traverse(v, key=key + (k,), **kw) for k, v in mapping_handler(obj, key=key).items()}
-        elif obj_type is PATH:
-            return path_handler(obj, key=key)
-        elif obj_type is DEFAULT:
-            for handler_type, handler in custom_handlers.items():
-                if isinstance(obj, handler_type):
-                    return handler(obj, key=key)
-    except:
-        # use the default handler for unknown object types
-        log.debug(
-            "Exception while traversing object using type-specific "
-            "handler. Switching to default handler.",
-            exc_info=True,
-        )
-
-    return default_handler(obj, key=key)
-
-
-__all__ = ["traverse"]
+            result = self.obj._make(values)
+        else:
+            result = values
+
+        if self.depth_first:
+            return self.handler(result, key=self.key)
+        return result
+
+    def fall_back(self, error, default_handler):
+        """
+        Returns `(value, error)` after passing the container to the default handler.
+        """
+        _log_fallback(error)
+        try:
+            return default_handler(self.obj, key=self.key), None
+        except BaseException as e:
+            return None, e
+
+
+__all__ = ["traverse", "Traverser"]
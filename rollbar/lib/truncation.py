@@ -0,0 +1,173 @@
+"""
+Shrinks payloads that are over a byte budget before they are sent.
+
+Rollbar rejects payloads over its size limit with a 413 response. Instead of posting
+them, `truncate()` degrades a payload step by step, serializing it again after each
+step that changed something, until it fits:
+
+- 'outer_frame_locals': drops the locals and arguments of all frames but the
+  innermost one of each trace,
+- 'frame_locals': drops them from all frames,
+- 'request_body': drops the body, POST, json and files of the request,
+- 'strings_1024', 'strings_256': shortens strings longer than that many characters,
+- 'middle_frames': only keeps the outermost and innermost frames of each trace.
+
+The steps applied are listed in data.notifier.diagnostic.truncation of the payload.
+"""
+from rollbar.lib.transforms.shortener import shorten_string
+from rollbar.lib.traverse import traverse
+
+FRAME_DATA_KEYS = ('locals', 'args', 'kwargs', 'argspec', 'varargspec', 'keywordspec')
+REQUEST_BODY_KEYS = ('body', 'POST', 'json', 'files_keys')
+
+# Number of frames kept at each end of a trace by the 'middle_frames' step.
+KEPT_FRAMES = 10
+
+
+def _traces(data):
+    body = data.get('body')
+    if not isinstance(body, dict):
+        return []
+    if isinstance(body.get('trace'), dict):
+        return [body['trace']]
+    return [t for t in body.get('trace_chain') or [] if isinstance(t, dict)]
+
+
+def _frames(trace):
+    frames = trace.get('frames')
+    return frames if isinstance(frames, list) else []
+
+
+def _drop_frame_data(frames):
+    changed = False
+    for frame in frames:
+        if not isinstance(frame, dict):
+            continue
+        for key in FRAME_DATA_KEYS:
+            if frame.pop(key, None) is not None:
+                changed = True
+    return changed
+
+
+def _drop_outer_frame_locals(data):
+    changed = False
+    for trace in _traces(data):
+        changed = _drop_frame_data(_frames(trace)[:-1]) or changed
+    return changed
+
+
+def _drop_frame_locals(data):
+    changed = False
+    for trace in _traces(data):
+        changed = _drop_frame_data(_frames(trace)) or changed
+    return changed
+
+
+def _drop_request_body(data):
+    request = data.get('request')
+    if not isinstance(request, dict):
+        return False
+
+    changed = False
+    for key in REQUEST_BODY_KEYS:
+        if request.pop(key, None) is not None:
+            changed = True
+    return changed
+
+
+def _shorten_strings(max_len):
+    def shorten(data):
+        changed = []
+
+        def string_handler(s, key=None):
+            if isinstance(s, str) and len(s) > max_len:
+                changed.append(key)
+                return shorten_string(s, max_len)
+            return s
+
+        # The payload was just serialized, so it has no cycles.
+        shortened = traverse(data, string_handler=string_handler,
+                             allowed_circular_reference_types=object)
+        if changed:
+            data.clear()
+            data.update(shortened)
+        return bool(changed)
+
+    return shorten
+
+
+def _drop_middle_frames(data):
+    changed = False
+    for trace in _traces(data):
+        frames = _frames(trace)
+        if len(frames) > 2 * KEPT_FRAMES:
+            trace['frames'] = frames[:KEPT_FRAMES] + frames[-KEPT_FRAMES:]
+            changed = True
+    return changed
+
+
+STEPS = [
+    ('outer_frame_locals', _drop_outer_frame_locals),
+    ('frame_locals', _drop_frame_locals),
+    ('request_body', _drop_request_body),
+    ('strings_1024', _shorten_strings(1024)),
+    ('strings_256', _shorten_strings(256)),
+    ('middle_frames', _drop_middle_frames),
+]
+
+
+def _record(data, original_size, applied):
+    # The notifier of a payload is usually shared with the settings.
+    notifier = dict(data.get('notifier') or {})
+    diagnostic = dict(notifier.get('diagnostic') or {})
+    diagnostic['truncation'] = {'original_size': original_size, 'applied': list(applied)}
+    notifier['diagnostic'] = diagnostic
+    data['notifier'] = notifier
+
+
+class ByteBudget(object):
+    """
+    Counts the size of the values kept out of at most `max_size` bytes. A `max_size`
+    of None or 0 is no limit.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.used = 0
+
+    def fits(self, size):
+        return not self.max_size or self.used + size <= self.max_size
+
+    def spend(self, size):
+        self.used += size
+
+
+def truncate(payload, max_size, dumps, payload_str=None):
+    """
+    Shrinks `payload` in place until its serialization is at most `max_size` long.
+
+    Returns the serialization of the payload by `dumps`, which is still over
+    `max_size` if every step was applied and did not shrink it enough. `payload_str`
+    is the current serialization of the payload, if known.
+    """
+    if payload_str is None:
+        payload_str = dumps(payload)
+    data = payload.get('data')
+    if len(payload_str) <= max_size or not isinstance(data, dict):
+        return payload_str
+
+    original_size = len(payload_str)
+    applied = []
+    for name, step in STEPS:
+        if not step(data):
+            continue
+        applied.append(name)
+        _record(data, original_size, applied)
+        payload_str = dumps(payload)
+        if len(payload_str) <= max_size:
+            break
+
+    return payload_str
+
+
+__all__ = ['truncate', 'ByteBudget', 'STEPS']
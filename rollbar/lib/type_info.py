@@ -1,4 +1,6 @@
-from rollbar.lib import binary_type, string_types
+import abc
+
+from rollbar.lib import binary_type, number_types, string_types
 
 
 from collections.abc import Mapping, Sequence, Set
@@ -15,8 +17,48 @@ SET = 5
 STRING = 6
 PATH = 7
 
+# Maximum number of types remembered by each cache. Classes created at runtime would
+# otherwise be kept alive forever.
+TYPE_CACHE_SIZE = 1024
+
+
+def cache_by_type(classify, per_instance=None):
+    """
+    Returns a function memoizing `classify(obj)` by the type of `obj`.
+
+    The isinstance() checks against ABCs done to classify an object only depend on its
+    class, so their result is computed once per concrete type. The caches are cleared
+    whenever a class is registered with an ABC. Objects lying about their class (e.g.
+    mocks setting `__class__`) are classified every time, and so are instances of the
+    types for which `per_instance(cls)` is true.
+    """
+    cache = {}
+    token = [abc.get_cache_token()]
+
+    def cached(obj):
+        cls = type(obj)
+        try:
+            result = cache[cls]
+        except KeyError:
+            pass
+        else:
+            if token[0] == abc.get_cache_token():
+                return result
+            cache.clear()
+            token[0] = abc.get_cache_token()
+
+        result = classify(obj)
+        if obj.__class__ is cls and not (per_instance and per_instance(cls)):
+            if len(cache) >= TYPE_CACHE_SIZE:
+                cache.clear()
+            cache[cls] = result
+        return result
 
-def get_type(obj):
+    cached.cache = cache
+    return cached
+
+
+def _get_type(obj):
     if isinstance(obj, (string_types, binary_type)):
         return STRING
 
@@ -41,6 +83,59 @@ def get_type(obj):
     return DEFAULT
 
 
+def _fields_per_instance(cls):
+    # Instances of a tuple subclass with a __dict__ can have their own `_fields`.
+    return (
+        cls is not tuple
+        and issubclass(cls, tuple)
+        and not hasattr(cls, "_fields")
+        and cls.__dictoffset__ != 0
+    )
+
+
+get_type = cache_by_type(_get_type, per_instance=_fields_per_instance)
+get_type.__doc__ = "Returns the node type of `obj`, one of the constants of this module."
+
+
+_CONTAINER_METHODS = {
+    MAPPING: "dict",
+    TUPLE: "tuple",
+    NAMEDTUPLE: "namedtuple",
+    LIST: "list",
+    SET: "set",
+    PATH: "path",
+}
+
+
+def _classify(obj):
+    obj_type = _get_type(obj)
+
+    if obj_type is STRING:
+        return obj_type, "bytes" if isinstance(obj, bytes) else "unicode"
+
+    if obj_type is not DEFAULT:
+        return obj_type, _CONTAINER_METHODS[obj_type]
+
+    if isinstance(obj, bool):
+        return obj_type, "boolean"
+
+    # There is a quirk in the current version (1.1.6) of the enum
+    # backport enum34 which causes it to not have the same
+    # behavior as Python 3.4+. One way to identify IntEnums is that
+    # they are instances of numbers but not number types.
+    if isinstance(obj, number_types) and type(obj) in number_types:
+        return obj_type, "number"
+
+    return obj_type, "custom"
+
+
+classify = cache_by_type(_classify, per_instance=_fields_per_instance)
+classify.__doc__ = """
+Returns `(node_type, method)`: the node type of `obj` and the name of the Transform
+method applied to it, e.g. `(MAPPING, 'dict')` or `(DEFAULT, 'number')`.
+"""
+
+
 __all__ = [
     "CIRCULAR",
     "DEFAULT",
@@ -51,5 +146,7 @@ __all__ = [
     "SET",
     "STRING",
     "PATH",
+    "cache_by_type",
+    "classify",
     "get_type",
 ]
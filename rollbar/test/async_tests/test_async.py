@@ -1,5 +1,6 @@
 import copy
 import sys
+import time
 
 from unittest import mock
 
@@ -547,3 +548,221 @@ class AsyncLibTest(BaseTest):
             # make sure the coroutine is closed to avoid RuntimeWarning by calling
             # coroutine without awaiting it later
             coro.close()
+
+
+@unittest.skipUnless(ALLOWED_PYTHON_VERSION, 'Async support requires Python3.6+')
+class AsyncClientTest(BaseTest):
+    default_settings = copy.deepcopy(rollbar.SETTINGS)
+
+    def setUp(self):
+        try:
+            import httpx
+        except ImportError:
+            self.skipTest('Requires HTTPX to be installed')
+
+        self.access_token = 'aaaabbbbccccddddeeeeffff00001111'
+        rollbar.SETTINGS = copy.deepcopy(self.default_settings)
+        rollbar._initialized = False
+        rollbar.init(self.access_token, handler='httpx')
+
+        self.requests = []
+
+        def handler(request):
+            self.requests.append(request)
+            return httpx.Response(200, json={'err': 0, 'result': {}})
+
+        self.clients = []
+
+        def build_client(config):
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            self.clients.append(client)
+            return client
+
+        patcher = mock.patch('rollbar.lib._async._build_client', side_effect=build_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_client_reused_within_loop(self):
+        from rollbar.lib._async import _post_api_httpx, run
+
+        async def send():
+            await _post_api_httpx('item/', '{"foo": 1}', access_token=self.access_token)
+            await _post_api_httpx('item/', '{"foo": 2}', access_token=self.access_token)
+
+        run(send())
+
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(len(self.clients), 1)
+
+    def test_client_per_loop_and_closed_on_loop_shutdown(self):
+        from rollbar.lib._async import _post_api_httpx, run
+
+        async def send():
+            await _post_api_httpx('item/', '{"foo": 1}', access_token=self.access_token)
+
+        run(send())
+        run(send())
+
+        self.assertEqual(len(self.clients), 2)
+        self.assertTrue(all(client.is_closed for client in self.clients))
+
+    def test_client_recreated_when_settings_change(self):
+        from rollbar.lib._async import get_client, run
+
+        async def get_clients():
+            first = await get_client()
+            rollbar.SETTINGS['verify_https'] = False
+            second = await get_client()
+            return first, second
+
+        first, second = run(get_clients())
+
+        self.assertIsNot(first, second)
+        self.assertTrue(first.is_closed)
+
+    def test_close_client(self):
+        from rollbar.lib._async import close_client, get_client, run
+
+        async def get_and_close():
+            client = await get_client()
+            await close_client()
+            return client
+
+        client = run(get_and_close())
+        self.assertTrue(client.is_closed)
+
+    def test_flush_waits_for_fire_and_forget_tasks(self):
+        from rollbar.lib._async import flush, run
+
+        async def report_and_flush():
+            rollbar.report_message('foo')
+            rollbar.report_message('bar')
+            return await flush(5)
+
+        result = run(report_and_flush())
+
+        self.assertEqual(result, rollbar.FlushResult(sent=2, dropped=0))
+        self.assertEqual(len(self.requests), 2)
+
+    def _sent_items(self):
+        import gzip
+        import json
+
+        items = []
+        for request in self.requests:
+            content = request.content
+            if request.headers.get('Content-Encoding') == 'gzip':
+                content = gzip.decompress(content)
+            items.append(json.loads(content))
+        return items
+
+    def test_payload_built_in_executor(self):
+        import threading
+        from rollbar.lib._async import flush, report_exc_info, run, stats
+
+        rollbar.SETTINGS['async_build'] = 'thread'
+        build_threads = []
+
+        def build_payload(data):
+            build_threads.append(threading.current_thread())
+            return build_payload.wrapped(data)
+
+        build_payload.wrapped = rollbar._build_payload
+        encode_threads = []
+
+        def encode_body(payload_str, headers):
+            encode_threads.append(threading.current_thread())
+            return encode_body.wrapped(payload_str, headers)
+
+        encode_body.wrapped = rollbar._encode_body
+        rollbar.SETTINGS['compression'] = 'gzip'
+        rollbar.SETTINGS['compression_threshold'] = 0
+        before = stats()
+
+        async def report():
+            try:
+                foo_local = 'foo'
+                raise ValueError('foo')
+            except ValueError:
+                uuid = await report_exc_info(sys.exc_info())
+            await flush(5)
+            return uuid
+
+        with mock.patch('rollbar._build_payload', side_effect=build_payload), \
+                mock.patch('rollbar._encode_body', side_effect=encode_body):
+            uuid = run(report())
+
+        self.assertEqual(1, len(build_threads))
+        self.assertTrue(build_threads[0].name.startswith('rollbar-async-build'))
+        # The body is compressed in the executor too.
+        self.assertEqual(build_threads, encode_threads)
+        self.assertEqual('gzip', self.requests[0].headers.get('Content-Encoding'))
+
+        data = self._sent_items()[0]['data']
+        self.assertEqual(uuid, data['uuid'])
+        self.assertEqual('foo', data['body']['trace']['frames'][-1]['locals']['foo_local'])
+
+        after = stats()
+        self.assertEqual(before['reports'] + 1, after['reports'])
+        self.assertEqual(before['built_in_executor'] + 1, after['built_in_executor'])
+        self.assertGreater(after['loop_blocked_seconds'], before['loop_blocked_seconds'])
+
+    def test_payload_built_in_given_executor(self):
+        import concurrent.futures
+        from rollbar.lib._async import flush, report_message, run
+
+        async def report():
+            await report_message('foo')
+            await flush(5)
+
+        with concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='app-executor') as executor:
+            rollbar.SETTINGS['async_build'] = executor
+            with mock.patch.object(executor, 'submit', wraps=executor.submit) as submit:
+                run(report())
+
+        submit.assert_called_once()
+        self.assertEqual('foo', self._sent_items()[0]['data']['body']['message']['body'])
+
+    def test_process_pool_executor_rejected(self):
+        import concurrent.futures
+        from rollbar.lib._async import flush, report_message, run
+
+        async def report():
+            await report_message('foo')
+            await flush(5)
+
+        with concurrent.futures.ProcessPoolExecutor(1) as executor:
+            rollbar.SETTINGS['async_build'] = executor
+            with mock.patch.object(executor, 'submit') as submit, \
+                    mock.patch('rollbar.lib._async.log') as log:
+                run(report())
+
+        submit.assert_not_called()
+        log.warning.assert_called_once()
+        self.assertEqual('foo', self._sent_items()[0]['data']['body']['message']['body'])
+
+    def test_report_does_not_wait_for_executor_send(self):
+        import asyncio
+        from rollbar.lib._async import flush, report_message, run
+
+        rollbar.SETTINGS['async_build'] = 'thread'
+        sent = []
+
+        async def post(path, payload_str, **kw):
+            await asyncio.sleep(0.5)
+            sent.append(payload_str)
+
+        async def report_and_flush():
+            started = time.monotonic()
+            uuid = await report_message('foo')
+            elapsed = time.monotonic() - started
+            self.assertEqual([], sent)
+            await flush(5)
+            return uuid, elapsed
+
+        with mock.patch('rollbar.lib._async._post_api_httpx', side_effect=post):
+            uuid, elapsed = run(report_and_flush())
+
+        self.assertIsNotNone(uuid)
+        self.assertLess(elapsed, 0.4)
+        self.assertEqual(1, len(sent))
@@ -0,0 +1,140 @@
+import copy
+import sys
+import threading
+import time
+
+from unittest import mock
+
+import rollbar
+from rollbar.lib import aggregate
+from rollbar.lib.aggregate import Aggregator, normalize_message, signature
+
+from rollbar.test import BaseTest
+from rollbar.test.utils import FakeClock, raised
+
+
+_default_settings = copy.deepcopy(rollbar.SETTINGS)
+
+
+class SignatureTest(BaseTest):
+    def test_normalize_message(self):
+        self.assertEqual(normalize_message("user 42 not found in 'db-3' at 0x7f3a"),
+                         'user <num> not found in <str> at <hex>')
+        self.assertEqual(normalize_message('id 123e4567-e89b-12d3-a456-426614174000'), 'id <uuid>')
+
+    def test_same_error_same_signature(self):
+        first = raised('invalid user 1')
+        second = raised('invalid user 2')
+        self.assertEqual(signature(*first), signature(*second))
+
+    def test_different_errors(self):
+        base = raised('invalid user 1')
+        self.assertNotEqual(signature(*base), signature(*raised('no such table')))
+        self.assertNotEqual(signature(*base), signature(*base, level='warning'))
+
+        try:
+            raise ValueError('invalid user 1')
+        except ValueError:
+            other_line = sys.exc_info()
+        self.assertNotEqual(signature(*base), signature(*other_line))
+
+
+class AggregatorTest(BaseTest):
+    def _wait_emitted(self, emitted, count):
+        deadline = time.monotonic() + 5
+        while len(emitted) < count and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+    def test_window(self):
+        clock = FakeClock()
+        emitted = []
+        threads = []
+
+        def emit(entry):
+            threads.append(threading.current_thread().name)
+            emitted.append(entry)
+
+        aggregator = Aggregator(emit, window=10, clock=clock)
+        exc = ValueError('boom')
+
+        self.assertIsNotNone(aggregator.record('sig', ValueError, exc))
+        self.assertIsNone(aggregator.record('sig', ValueError, exc))
+        self.assertIsNone(aggregator.record('sig', ValueError, exc))
+        self.assertIsNotNone(aggregator.record('other', ValueError, exc))
+
+        # The window of 'sig' is over, its repeats are summarized and a new window starts.
+        clock.now += 10
+        self.assertIsNotNone(aggregator.record('sig', ValueError, exc))
+        self._wait_emitted(emitted, 1)
+        self.assertEqual(len(emitted), 1)
+        # Not by the thread reporting the exception.
+        self.assertEqual(threads, ['rollbar-aggregator'])
+        self.assertEqual(emitted[0].signature, 'sig')
+        self.assertEqual(emitted[0].count, 2)
+        self.assertLessEqual(emitted[0].first_timestamp, emitted[0].last_timestamp)
+
+        aggregator.shutdown()
+        # 'other' had no repeats.
+        self.assertEqual(len(emitted), 1)
+
+    def test_max_signatures(self):
+        clock = FakeClock()
+        emitted = []
+        aggregator = Aggregator(emitted.append, window=10, max_signatures=2, clock=clock)
+        exc = ValueError('boom')
+
+        aggregator.record('a', ValueError, exc)
+        aggregator.record('a', ValueError, exc)
+        clock.now += 1
+        aggregator.record('b', ValueError, exc)
+        aggregator.record('c', ValueError, exc)
+
+        self._wait_emitted(emitted, 1)
+        self.assertEqual([e.signature for e in emitted], ['a'])
+        aggregator.shutdown()
+
+
+class AggregationReportTest(BaseTest):
+    def setUp(self):
+        rollbar._initialized = False
+        rollbar.SETTINGS = copy.deepcopy(_default_settings)
+
+    def tearDown(self):
+        aggregate.disable()
+
+    @mock.patch('rollbar.send_payload')
+    def test_repeats_are_summarized(self, send_payload):
+        rollbar.init('token', handler='blocking', aggregation_window=60)
+
+        uuids = []
+        for i in range(5):
+            try:
+                raise ValueError('invalid user %d' % i)
+            except ValueError:
+                uuids.append(rollbar.report_exc_info())
+
+        self.assertEqual(send_payload.call_count, 1)
+        self.assertIsNotNone(uuids[0])
+        self.assertEqual(uuids[1:], [None] * 4)
+
+        rollbar.wait()
+
+        self.assertEqual(send_payload.call_count, 2)
+        data = send_payload.call_args[0][0]['data']
+        summary = data['custom']['aggregated_occurrences']
+        self.assertEqual(summary['count'], 4)
+        self.assertEqual(summary['first_uuid'], uuids[0])
+        self.assertIn('ValueError', data['body']['message']['body'])
+        self.assertEqual(data['level'], 'error')
+
+    @mock.patch('rollbar.send_payload')
+    def test_disabled_by_default(self, send_payload):
+        rollbar.init('token', handler='blocking')
+
+        for i in range(3):
+            try:
+                raise ValueError('invalid user %d' % i)
+            except ValueError:
+                rollbar.report_exc_info()
+
+        self.assertEqual(send_payload.call_count, 3)
@@ -0,0 +1,115 @@
+import threading
+import time
+
+from rollbar.lib import batcher
+from rollbar.lib.batcher import Batcher
+
+from rollbar.test import BaseTest
+
+
+class BatcherTest(BaseTest):
+    def setUp(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def sender(self, batch):
+        with self.lock:
+            self.batches.append(batch)
+
+    def test_flush_on_size(self):
+        b = Batcher(self.sender, max_items=3, max_wait=60)
+        for i in range(6):
+            b.add('payload%d' % i, 'token')
+
+        deadline = time.monotonic() + 5
+        while b.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(len(self.batches), 2)
+        self.assertEqual([p for p, _ in self.batches[0]], ['payload0', 'payload1', 'payload2'])
+        self.assertEqual([p for p, _ in self.batches[1]], ['payload3', 'payload4', 'payload5'])
+        b.shutdown()
+
+    def test_flush_on_age(self):
+        b = Batcher(self.sender, max_items=100, max_wait=0.01)
+        b.add('payload', 'token')
+
+        deadline = time.monotonic() + 5
+        while not self.batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(self.batches, [[('payload', 'token')]])
+        b.shutdown()
+
+    def test_explicit_flush(self):
+        b = Batcher(self.sender, max_items=100, max_wait=60)
+        b.add('a', 'token')
+        b.add('b', 'token')
+
+        self.assertTrue(b.flush(5))
+        self.assertEqual(self.batches, [[('a', 'token'), ('b', 'token')]])
+        self.assertEqual(b.pending(), 0)
+
+    def test_flush_with_nothing_pending(self):
+        b = Batcher(self.sender, max_items=2, max_wait=60)
+        b.add('a', 'token')
+        self.assertTrue(b.flush(5))
+
+        self.assertTrue(b.flush(5))
+        b.add('b', 'token')
+        time.sleep(0.05)
+        self.assertEqual(len(self.batches), 1)
+
+        b.add('c', 'token')
+        self.assertTrue(b.flush(5))
+        self.assertEqual(self.batches[1], [('b', 'token'), ('c', 'token')])
+        b.shutdown()
+
+    def test_shutdown_flushes(self):
+        b = Batcher(self.sender, max_items=100, max_wait=60)
+        b.add('a', 'token')
+
+        self.assertTrue(b.shutdown(5))
+        self.assertEqual(self.batches, [[('a', 'token')]])
+
+    def test_maxsize(self):
+        release = threading.Event()
+
+        def blocking_sender(batch):
+            release.wait(5)
+            self.sender(batch)
+
+        b = Batcher(blocking_sender, max_items=1, max_wait=60, maxsize=1)
+        b.add('a', 'token')
+        deadline = time.monotonic() + 5
+        while b._items and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertTrue(b.add('b', 'token'))
+        self.assertFalse(b.add('c', 'token'))
+        self.assertEqual(b.dropped, 1)
+
+        release.set()
+        self.assertTrue(b.flush(5))
+        self.assertEqual([p for batch in self.batches for p, _ in batch], ['a', 'b'])
+
+    def test_sender_exception(self):
+        calls = []
+
+        def failing_sender(batch):
+            calls.append(batch)
+            raise Exception('boom')
+
+        b = Batcher(failing_sender, max_items=1, max_wait=60)
+        b.add('a', 'token')
+        b.add('b', 'token')
+
+        self.assertTrue(b.flush(5))
+        self.assertEqual(len(calls), 2)
+
+    def test_module_submit(self):
+        batcher.init_batcher(self.sender, max_items=10, max_wait=60)
+        batcher.submit('foo', 'bar')
+
+        self.assertTrue(batcher.flush(5))
+        self.assertEqual(self.batches, [[('foo', 'bar')]])
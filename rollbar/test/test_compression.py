@@ -0,0 +1,84 @@
+import gzip
+import json
+
+from unittest import mock
+
+import rollbar
+from rollbar.lib import compression
+from rollbar.lib.compression import compress
+
+from rollbar.test import BaseTest
+
+
+class CompressionTest(BaseTest):
+    payload = json.dumps({'data': {'body': {'message': {'body': 'hello ' * 1000}}}})
+
+    def test_disabled(self):
+        body, encoding = compress(self.payload)
+        self.assertIs(body, self.payload)
+        self.assertIsNone(encoding)
+
+    def test_gzip(self):
+        body, encoding = compress(self.payload, method='gzip')
+        self.assertEqual(encoding, 'gzip')
+        self.assertLess(len(body), len(self.payload))
+        self.assertEqual(gzip.decompress(body).decode('utf8'), self.payload)
+
+    def test_gzip_bytes(self):
+        body, encoding = compress(self.payload.encode('utf8'), method='gzip')
+        self.assertEqual(encoding, 'gzip')
+        self.assertEqual(gzip.decompress(body).decode('utf8'), self.payload)
+
+    def test_gzip_is_deterministic(self):
+        self.assertEqual(compress(self.payload, method='gzip')[0], compress(self.payload, method='gzip')[0])
+
+    def test_level(self):
+        fast, _ = compress(self.payload, method='gzip', level=1)
+        best, _ = compress(self.payload, method='gzip', level=9)
+        self.assertEqual(gzip.decompress(fast), gzip.decompress(best))
+
+    def test_below_threshold(self):
+        body, encoding = compress('{}', method='gzip', threshold=1024)
+        self.assertEqual(body, '{}')
+        self.assertIsNone(encoding)
+
+    def test_zstd_falls_back_to_gzip(self):
+        with mock.patch('rollbar.lib.compression.zstd_available', return_value=False):
+            body, encoding = compress(self.payload, method='zstd')
+
+        self.assertEqual(encoding, 'gzip')
+        self.assertEqual(gzip.decompress(body).decode('utf8'), self.payload)
+
+    def test_zstd(self):
+        if not compression.zstd_available():
+            self.skipTest('Requires zstd support')
+
+        body, encoding = compress(self.payload, method='zstd')
+        self.assertEqual(encoding, 'zstd')
+        self.assertLess(len(body), len(self.payload))
+
+    def test_unknown_method(self):
+        body, encoding = compress(self.payload, method='brotli')
+        self.assertIs(body, self.payload)
+        self.assertIsNone(encoding)
+
+    @mock.patch('rollbar.lib.transport.post')
+    def test_post_api_sends_content_encoding(self, post):
+        post.return_value = mock.Mock(status_code=200, content='{"err": 0, "result": {}}')
+
+        with mock.patch.dict(rollbar.SETTINGS, {'compression': 'gzip', 'compression_threshold': 0}):
+            rollbar._post_api('item/', self.payload, access_token='token')
+
+        kw = post.call_args[1]
+        self.assertEqual(kw['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(kw['data']).decode('utf8'), self.payload)
+
+    @mock.patch('rollbar.lib.transport.post')
+    def test_post_api_uncompressed_by_default(self, post):
+        post.return_value = mock.Mock(status_code=200, content='{"err": 0, "result": {}}')
+
+        rollbar._post_api('item/', self.payload, access_token='token')
+
+        kw = post.call_args[1]
+        self.assertNotIn('Content-Encoding', kw['headers'])
+        self.assertEqual(kw['data'], self.payload)
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+
+from unittest import mock
+
+from rollbar.lib import dispatcher
+from rollbar.lib.dispatcher import Dispatcher
+
+from rollbar.test import BaseTest
+
+
+class DispatcherTest(BaseTest):
+    def _blocked_dispatcher(self, **kw):
+        release = threading.Event()
+        started = threading.Event()
+        processed = []
+
+        def worker(item):
+            started.set()
+            release.wait(5)
+            processed.append(item)
+
+        d = Dispatcher(workers=1, **kw)
+        # Occupy the single worker so that further items stay queued.
+        d.submit(worker, 'first')
+        self.assertTrue(started.wait(5))
+        return d, worker, release, processed
+
+    def test_submit_and_join(self):
+        processed = []
+        d = Dispatcher(workers=2, maxsize=10)
+        for i in range(5):
+            self.assertTrue(d.submit(processed.append, i))
+
+        self.assertTrue(d.join(5))
+        self.assertEqual(sorted(processed), [0, 1, 2, 3, 4])
+        self.assertEqual(d.pending(), 0)
+        d.shutdown()
+
+    def test_fixed_number_of_threads(self):
+        d = Dispatcher(workers=3, maxsize=0, name='rollbar-test-fixed')
+        for i in range(100):
+            d.submit(lambda x: None, i)
+        d.join(5)
+
+        threads = [t for t in threading.enumerate() if t.name.startswith('rollbar-test-fixed')]
+        self.assertEqual(len(threads), 3)
+        d.shutdown()
+
+    def test_drop_newest(self):
+        d, worker, release, processed = self._blocked_dispatcher(maxsize=2, overflow='drop_newest')
+        self.assertTrue(d.submit(worker, 'a'))
+        self.assertTrue(d.submit(worker, 'b'))
+        self.assertFalse(d.submit(worker, 'c'))
+
+        release.set()
+        self.assertTrue(d.join(5))
+        self.assertEqual(processed, ['first', 'a', 'b'])
+        self.assertEqual(d.dropped, 1)
+
+    def test_drop_oldest(self):
+        d, worker, release, processed = self._blocked_dispatcher(maxsize=2, overflow='drop_oldest')
+        self.assertTrue(d.submit(worker, 'a'))
+        self.assertTrue(d.submit(worker, 'b'))
+        self.assertTrue(d.submit(worker, 'c'))
+
+        release.set()
+        self.assertTrue(d.join(5))
+        self.assertEqual(processed, ['first', 'b', 'c'])
+        self.assertEqual(d.dropped, 1)
+
+    def test_block_with_timeout(self):
+        d, worker, release, processed = self._blocked_dispatcher(maxsize=1, overflow='block', block_timeout=0.01)
+        self.assertTrue(d.submit(worker, 'a'))
+        self.assertFalse(d.submit(worker, 'b'))
+
+        release.set()
+        self.assertTrue(d.join(5))
+        self.assertEqual(processed, ['first', 'a'])
+
+    def test_dropped_from_several_threads(self):
+        d, worker, release, processed = self._blocked_dispatcher(maxsize=1)
+        d.submit(worker, 'a')
+
+        def submit_many():
+            for i in range(200):
+                d.submit(worker, i)
+
+        threads = [threading.Thread(target=submit_many) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        release.set()
+        self.assertTrue(d.join(5))
+        self.assertEqual(d.dropped, 800)
+
+    def test_join_timeout(self):
+        d, worker, release, processed = self._blocked_dispatcher(maxsize=10)
+        self.assertFalse(d.join(0.01))
+        release.set()
+        self.assertTrue(d.join(5))
+
+    def test_items_of_parent_after_fork(self):
+        d, worker, release, processed = self._blocked_dispatcher(maxsize=10)
+        d.submit(worker, 'a')
+
+        with mock.patch('os.getpid', return_value=os.getpid() + 100000):
+            self.assertEqual(d.pending(), 0)
+            self.assertTrue(d.join(0.01))
+
+        release.set()
+        self.assertTrue(d.join(5))
+
+    def test_worker_exception_does_not_kill_thread(self):
+        processed = []
+
+        def failing(item):
+            raise Exception('boom')
+
+        d = Dispatcher(workers=1, maxsize=10)
+        d.submit(failing, 1)
+        d.submit(processed.append, 2)
+
+        self.assertTrue(d.join(5))
+        self.assertEqual(processed, [2])
+
+    def test_invalid_overflow(self):
+        with self.assertRaises(ValueError):
+            Dispatcher(overflow='nope')
+
+    def test_module_submit(self):
+        processed = []
+        dispatcher.init_dispatcher(workers=1, maxsize=10)
+        dispatcher.submit(lambda payload_str, access_token: processed.append((payload_str, access_token)),
+                          'foo', 'bar')
+
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(processed, [('foo', 'bar')])
+
+    def test_init_dispatcher_drains_previous_queue(self):
+        processed = []
+
+        def worker(payload_str, access_token):
+            time.sleep(0.01)
+            processed.append(payload_str)
+
+        dispatcher.init_dispatcher(workers=1, maxsize=10)
+        for i in range(3):
+            dispatcher.submit(worker, i, 'token')
+        dispatcher.init_dispatcher(workers=1, maxsize=10, shutdown_timeout=5)
+
+        self.assertEqual(processed, [0, 1, 2])
+
+    @mock.patch('rollbar.lib.dispatcher.atexit')
+    def test_queue_drained_at_exit(self, atexit):
+        dispatcher.init_dispatcher(workers=1, maxsize=10, shutdown_timeout=3)
+        first = dispatcher._dispatcher
+        atexit.register.assert_called_once_with(first.shutdown, 3)
+
+        dispatcher.init_dispatcher(workers=1, maxsize=10, shutdown_timeout=3)
+        atexit.unregister.assert_called_with(first.shutdown)
+        atexit.register.assert_called_with(dispatcher._dispatcher.shutdown, 3)
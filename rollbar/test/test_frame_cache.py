@@ -0,0 +1,144 @@
+import inspect
+import os
+import sys
+import tempfile
+import traceback
+
+from unittest import mock
+
+from rollbar.lib import frame_cache
+
+from rollbar.test import BaseTest
+
+
+def _summary(frames):
+    return [(f.filename, f.lineno, f.name, f.line) for f in frames]
+
+
+def _raise(a, b=1, *args, **kwargs):
+    c = a + b
+    raise ValueError(c)
+
+
+def _exc_info():
+    try:
+        _raise(1)
+    except ValueError:
+        return sys.exc_info()
+
+
+class FrameCacheTest(BaseTest):
+    def setUp(self):
+        frame_cache.clear()
+
+    def test_same_as_extract_tb(self):
+        tb = _exc_info()[2]
+
+        self.assertEqual(_summary(traceback.extract_tb(tb)), _summary(frame_cache.extract(tb)))
+        # Cached
+        self.assertEqual(_summary(traceback.extract_tb(tb)), _summary(frame_cache.extract(tb)))
+
+    def test_lines_looked_up_once(self):
+        frame_cache.extract(_exc_info()[2])
+
+        with mock.patch('linecache.getline') as getline:
+            frames = frame_cache.extract(_exc_info()[2])
+
+        getline.assert_not_called()
+        self.assertEqual('raise ValueError(c)', frames[-1].line)
+
+    def test_line_looked_up_again_once_file_changed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'module.py')
+            source = 'def fail():\n    raise ValueError()\n'
+            with open(filename, 'w') as f:
+                f.write(source)
+            namespace = {}
+            exec(compile(source, filename, 'exec'), namespace)
+
+            try:
+                namespace['fail']()
+            except ValueError:
+                tb = sys.exc_info()[2]
+            self.assertEqual('raise ValueError()', frame_cache.extract(tb)[-1].line)
+
+            with open(filename, 'w') as f:
+                f.write('def fail():\n    raise KeyError()\n')
+            mtime = os.stat(filename).st_mtime + 10
+            os.utime(filename, (mtime, mtime))
+
+            self.assertEqual('raise KeyError()', frame_cache.extract(tb)[-1].line)
+
+    def test_not_on_disk_not_cached(self):
+        namespace = {}
+        exec(compile('def fail():\n    raise ValueError()\n', '<generated>', 'exec'), namespace)
+        try:
+            namespace['fail']()
+        except ValueError:
+            tb = sys.exc_info()[2]
+
+        frames = frame_cache.extract(tb)
+
+        self.assertEqual(('<generated>', 2, 'fail', ''), _summary(frames)[-1])
+        self.assertNotIn('<generated>', [info.filename for _, info in frame_cache._frame_infos.values()])
+
+    def test_cache_size(self):
+        tb = _exc_info()[2]
+        with mock.patch.object(frame_cache, 'FRAME_CACHE_SIZE', 1):
+            frame_cache.extract(tb)
+
+        self.assertEqual(1, len(frame_cache._frame_infos))
+
+    def test_argspec(self):
+        spec = frame_cache.argspec(_raise.__code__)
+
+        self.assertEqual(inspect.getargs(_raise.__code__), (list(spec.args), spec.varargs, spec.varkw))
+        self.assertEqual(('a', 'b', 'args', 'kwargs', 'c'), spec.names)
+        self.assertIs(spec, frame_cache.argspec(_raise.__code__))
+
+    def test_argspec_of_module(self):
+        spec = frame_cache.argspec(compile('x = 1', '<module>', 'exec'))
+
+        self.assertIsNone(spec.names)
+
+    def test_frame_locals(self):
+        tb = _exc_info()[2]
+        while tb.tb_next:
+            tb = tb.tb_next
+
+        self.assertEqual(tb.tb_frame.f_locals, frame_cache.frame_locals(tb.tb_frame))
+        self.assertEqual(['a', 'b', 'args', 'kwargs', 'c'], list(frame_cache.frame_locals(tb.tb_frame)))
+        self.assertEqual({'a': 1, 'b': 1}, frame_cache.frame_locals(tb.tb_frame, max_locals=2))
+
+    def test_frame_locals_unbound(self):
+        def _fail():
+            a = 1
+            raise ValueError()
+            b = 2
+
+        try:
+            _fail()
+        except ValueError:
+            tb = sys.exc_info()[2].tb_next
+
+        self.assertEqual({'a': 1}, frame_cache.frame_locals(tb.tb_frame))
+
+    def test_equal_code_objects_of_different_files(self):
+        # Code objects compare equal whatever their file.
+        infos = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ('first.py', 'second.py'):
+                filename = os.path.join(tmp, name)
+                source = 'def fail():\n    raise ValueError(%r)\n' % name
+                with open(filename, 'w') as f:
+                    f.write(source)
+                namespace = {}
+                exec(compile(source.replace(repr(name), "''"), filename, 'exec'), namespace)
+                try:
+                    namespace['fail']()
+                except ValueError:
+                    infos.append(frame_cache.extract(sys.exc_info()[2])[-1])
+
+        self.assertTrue(infos[0].filename.endswith('first.py'))
+        self.assertTrue(infos[1].filename.endswith('second.py'))
+        self.assertEqual("raise ValueError('second.py')", infos[1].line)
@@ -0,0 +1,60 @@
+import json
+import unittest
+
+from rollbar.lib import json_encoder
+
+from rollbar.test import BaseTest
+
+
+class CustomType(object):
+    def __repr__(self):
+        return '<CustomType>'
+
+
+PAYLOAD = {
+    'data': {
+        'level': 'error',
+        'body': {'message': {'body': 'café ☃'}},
+        'custom': {'numbers': [1, 2.5, None, True], 1: 'int key'},
+    }
+}
+
+
+class JSONEncoderTest(BaseTest):
+    def _check_encoder(self, name):
+        encoded = json_encoder.dumps(PAYLOAD, name)
+        self.assertIsInstance(encoded, (str, bytes))
+
+        decoded = json.loads(encoded)
+        self.assertEqual(decoded['data']['body']['message']['body'], 'café ☃')
+        self.assertEqual(decoded['data']['custom']['1'], 'int key')
+
+        # Objects that cannot be serialized fall back to defaultJSONEncode().
+        decoded = json.loads(json_encoder.dumps({'obj': CustomType()}, name))
+        self.assertEqual(decoded['obj'], '<CustomType> is not JSON serializable')
+
+        # So do payloads the fast encoders reject.
+        decoded = json.loads(json_encoder.dumps({'big': 2 ** 70, 'surrogate': '\udc00'}, name))
+        self.assertEqual(decoded['big'], 2 ** 70)
+        self.assertEqual(decoded['surrogate'], '\udc00')
+
+    def test_json(self):
+        self.assertEqual(json_encoder.dumps(PAYLOAD, 'json'), json.dumps(PAYLOAD))
+        self._check_encoder('json')
+
+    @unittest.skipUnless(json_encoder.orjson, 'Requires orjson')
+    def test_orjson(self):
+        self.assertIsInstance(json_encoder.dumps(PAYLOAD, 'orjson'), bytes)
+        self._check_encoder('orjson')
+
+    @unittest.skipUnless(json_encoder.ujson, 'Requires ujson')
+    def test_ujson(self):
+        self._check_encoder('ujson')
+
+    def test_auto(self):
+        self.assertIs(json_encoder.get_encoder('auto'),
+                      json_encoder.get_encoder(json_encoder.available()[0]))
+        self._check_encoder('auto')
+
+    def test_unknown_encoder_falls_back_to_json(self):
+        self.assertEqual(json_encoder.dumps(PAYLOAD, 'simplejson'), json.dumps(PAYLOAD))
@@ -0,0 +1,86 @@
+import random
+
+from rollbar.lib import build_key_matcher, force_lower, key_depth, key_in, prefix_match
+from rollbar.lib.key_matcher import PatternMatcher, PrefixMatcher
+
+from rollbar.test import BaseTest
+
+
+KEYS = ['a', 'b', '*', 1, 'A']
+
+
+class PrefixMatcherTest(BaseTest):
+    def test_suffix(self):
+        matcher = build_key_matcher([('password',), ('request', 'secret')], type='suffix')
+
+        self.assertTrue(matcher(('body', 'Password')))
+        self.assertTrue(matcher(('request', 'secret')))
+        self.assertFalse(matcher(('body', 'secret')))
+        self.assertFalse(matcher(('password', 'body')))
+        self.assertFalse(matcher(()))
+
+    def test_prefix_case_sensitive(self):
+        matcher = build_key_matcher([('body', 'trace')], case_sensitive=True)
+
+        self.assertTrue(matcher(('body', 'trace', 'frames')))
+        self.assertFalse(matcher(('body', 'Trace', 'frames')))
+
+    def test_invalid_type(self):
+        self.assertRaises(ValueError, build_key_matcher, [], type='infix')
+
+    def test_unhashable_keys(self):
+        matcher = PrefixMatcher([(['unhashable'],)], case_sensitive=True)
+
+        self.assertTrue(matcher((['unhashable'], 'x')))
+        self.assertFalse(matcher((['other'],)))
+
+    def test_same_as_prefix_match(self):
+        rand = random.Random(0)
+        for _ in range(200):
+            prefixes = [[rand.choice(KEYS) for _ in range(rand.randint(0, 3))] for _ in range(rand.randint(0, 5))]
+            matcher = PrefixMatcher(prefixes, suffix=True)
+            reversed_prefixes = [[force_lower(x) for x in reversed(p)] for p in prefixes]
+            for _ in range(20):
+                key = tuple(rand.choice(KEYS) for _ in range(rand.randint(0, 5)))
+                expected = prefix_match([force_lower(x) for x in reversed(key)], reversed_prefixes)
+                self.assertEqual(matcher(key), expected)
+
+
+class PatternMatcherTest(BaseTest):
+    def test_wildcards(self):
+        matcher = PatternMatcher([('body', 'trace', 'frames', '*', 'locals', '*')])
+
+        self.assertTrue(matcher.match(('body', 'trace', 'frames', 0, 'locals', 'x')))
+        self.assertTrue(matcher.match(('body', 'trace', 'frames', 0, 'locals', 'x', 'y')))
+        self.assertFalse(matcher.match(('body', 'trace', 'frames', 0, 'args', 'x')))
+        self.assertEqual(matcher.depth(('body', 'trace', 'frames', 0, 'locals', 'x', 'y')), 6)
+
+    def test_first_pattern_decides_depth(self):
+        matcher = PatternMatcher([('a', '*', 'c'), ('a',), ('*', 'b')])
+
+        self.assertEqual(matcher.depth(('a', 'b', 'c')), 3)
+        self.assertEqual(matcher.depth(('a', 'b')), 1)
+        self.assertEqual(matcher.depth(('x', 'b')), 2)
+        self.assertEqual(matcher.depth(('x', 'y')), 0)
+
+    def test_no_patterns(self):
+        matcher = PatternMatcher(None)
+
+        self.assertFalse(matcher.match(('a',)))
+        self.assertEqual(matcher.depth(('a',)), 0)
+
+    def test_decision_cache_is_bounded(self):
+        matcher = PatternMatcher([('a', '*')], cache_size=10)
+        for i in range(25):
+            self.assertTrue(matcher.match(('a', i)))
+        self.assertLessEqual(len(matcher._cache), 10)
+
+    def test_same_as_key_in_and_key_depth(self):
+        rand = random.Random(0)
+        for _ in range(200):
+            patterns = [tuple(rand.choice(KEYS) for _ in range(rand.randint(0, 3))) for _ in range(rand.randint(0, 5))]
+            matcher = PatternMatcher(patterns)
+            for _ in range(20):
+                key = tuple(rand.choice(KEYS) for _ in range(rand.randint(1, 5)))
+                self.assertEqual(matcher.match(key), key_in(key, patterns))
+                self.assertEqual(matcher.depth(key), key_depth(key, patterns))
@@ -0,0 +1,73 @@
+from unittest import mock
+
+from rollbar.lib import locals_policy
+from rollbar.lib.locals_policy import LocalsPolicy
+
+from rollbar.test import BaseTest
+
+
+def _code(filename):
+    # Equal code objects, but for their file.
+    return compile('pass', filename, 'exec')
+
+
+APP = _code('/srv/app/views.py')
+APP_MIGRATION = _code('/srv/app/migrations/0001_initial.py')
+LIBRARY = _code('/usr/lib/python3/site-packages/django/core/handlers.py')
+
+
+class LocalsPolicyTest(BaseTest):
+    def test_no_root(self):
+        policy = LocalsPolicy()
+
+        for code in (APP, APP_MIGRATION, LIBRARY):
+            self.assertTrue(policy.allows(code))
+            self.assertTrue(policy.allows(code, innermost=True))
+
+    def test_root(self):
+        policy = LocalsPolicy(root='/SRV/app')
+
+        self.assertTrue(policy.allows(APP))
+        self.assertFalse(policy.allows(LIBRARY))
+        self.assertTrue(policy.allows(LIBRARY, innermost=True))
+
+    def test_include(self):
+        policy = LocalsPolicy(include=['*/app/*'])
+
+        self.assertTrue(policy.allows(APP))
+        self.assertTrue(policy.allows(APP_MIGRATION))
+        self.assertFalse(policy.allows(LIBRARY))
+        self.assertTrue(policy.allows(LIBRARY, innermost=True))
+
+    def test_exclude(self):
+        policy = LocalsPolicy(exclude=['*/migrations/*', '*/site-packages/*'])
+
+        self.assertTrue(policy.allows(APP))
+        self.assertFalse(policy.allows(APP_MIGRATION))
+        self.assertFalse(policy.allows(LIBRARY, innermost=True))
+
+    def test_limit(self):
+        self.assertFalse(LocalsPolicy().limit_reached(100))
+        self.assertFalse(LocalsPolicy(max_frames=2).limit_reached(1))
+        self.assertTrue(LocalsPolicy(max_frames=2).limit_reached(2))
+        self.assertTrue(LocalsPolicy(max_frames=0).limit_reached(0))
+
+    def test_decisions_cached_per_code_object(self):
+        policy = LocalsPolicy(root='/srv/app', exclude=['*/migrations/*'])
+
+        with mock.patch.object(policy, '_decide', wraps=policy._decide) as decide:
+            for _ in range(3):
+                policy.allows(APP)
+                policy.allows(APP, innermost=True)
+                policy.allows(LIBRARY)
+
+        self.assertEqual(2, decide.call_count)
+
+    def test_cache_size(self):
+        policy = LocalsPolicy()
+
+        with mock.patch.object(locals_policy, 'DECISION_CACHE_SIZE', 2):
+            for code in (APP, APP_MIGRATION, LIBRARY):
+                policy.allows(code)
+
+        self.assertEqual(1, len(policy._decisions))
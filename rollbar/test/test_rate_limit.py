@@ -0,0 +1,123 @@
+import copy
+import json
+
+from unittest import mock
+
+import rollbar
+from rollbar.lib import rate_limit
+from rollbar.lib.rate_limit import RateLimiter, retry_after
+
+from rollbar.test import BaseTest
+
+
+_default_settings = copy.deepcopy(rollbar.SETTINGS)
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimiterTest(BaseTest):
+    def test_unlimited_by_default(self):
+        limiter = RateLimiter()
+        self.assertTrue(all(limiter.acquire() for _ in range(1000)))
+        self.assertEqual(limiter.dropped, 0)
+
+    def test_token_bucket(self):
+        clock = FakeClock()
+        limiter = RateLimiter(rate=2, burst=3, clock=clock)
+
+        self.assertEqual([limiter.acquire() for _ in range(4)], [True, True, True, False])
+        self.assertEqual(limiter.dropped, 1)
+
+        clock.now += 0.5
+        self.assertTrue(limiter.acquire())
+        self.assertFalse(limiter.acquire())
+
+        clock.now += 10
+        self.assertEqual([limiter.acquire() for _ in range(4)], [True, True, True, False])
+
+    def test_pause(self):
+        clock = FakeClock()
+        limiter = RateLimiter(clock=clock)
+
+        limiter.pause(5)
+        self.assertFalse(limiter.acquire())
+        self.assertEqual(limiter.reserve(), 5)
+        self.assertEqual(limiter.pause_remaining(), 5)
+
+        # A shorter pause does not cut the current one short.
+        limiter.pause(1)
+        clock.now += 2
+        self.assertFalse(limiter.acquire())
+
+        clock.now += 3
+        self.assertTrue(limiter.acquire())
+        self.assertEqual(limiter.pause_remaining(), 0)
+
+    def test_reserve_does_not_count_drops(self):
+        clock = FakeClock()
+        limiter = RateLimiter(rate=1, clock=clock)
+
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertEqual(limiter.reserve(), 1)
+        self.assertEqual(limiter.dropped, 0)
+
+    def test_retry_after(self):
+        self.assertEqual(retry_after({'X-Rate-Limit-Remaining-Seconds': '12'}), 12)
+        self.assertEqual(retry_after({'X-Rate-Limit-Reset': '1030'}, now=1000), 30)
+        self.assertEqual(retry_after({'Retry-After': '7'}), 7)
+        self.assertEqual(retry_after({b'X-Rate-Limit-Remaining-Seconds': [b'4']}), 4)
+        self.assertEqual(retry_after({'X-Rate-Limit-Reset': 'garbage'}), rate_limit.DEFAULT_PAUSE)
+        self.assertEqual(retry_after(None), rate_limit.DEFAULT_PAUSE)
+
+
+class RateLimitHandlerTest(BaseTest):
+    def setUp(self):
+        rollbar._initialized = False
+        rollbar.SETTINGS = copy.deepcopy(_default_settings)
+
+    def tearDown(self):
+        rate_limit.init_rate_limiter()
+
+    @mock.patch('rollbar.lib.transport.post')
+    def test_429_pauses_sends(self, post):
+        post.return_value = mock.Mock(status_code=429,
+                                      content=json.dumps({'err': 1}),
+                                      headers={'X-Rate-Limit-Remaining-Seconds': '60'})
+        rollbar.init('token', handler='blocking')
+
+        with mock.patch('rollbar._serialize_payload', wraps=rollbar._serialize_payload) as serialize:
+            rollbar.report_message('foo')
+            rollbar.report_message('bar')
+            rollbar.report_message('baz')
+
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(serialize.call_count, 1)
+        self.assertEqual(rate_limit.dropped(), 2)
+        self.assertGreater(rate_limit.pause_remaining(), 50)
+
+    @mock.patch('rollbar._send_payload')
+    def test_rate_limit_setting(self, send_payload):
+        rollbar.init('token', handler='blocking', rate_limit=1, rate_limit_burst=2)
+
+        for _ in range(5):
+            rollbar.report_message('foo')
+
+        self.assertEqual(send_payload.call_count, 2)
+        self.assertEqual(rate_limit.dropped(), 3)
+
+    @mock.patch('rollbar._post_api')
+    def test_spooled_items_are_kept_while_paused(self, post_api):
+        rollbar.init('token', handler='blocking')
+        rate_limit.on_rate_limited({'X-Rate-Limit-Remaining-Seconds': '30'})
+
+        with self.assertRaises(rate_limit.RateLimited) as cm:
+            rollbar._send_spooled_payload('{}', 'token')
+
+        self.assertGreater(cm.exception.retry_after, 20)
+        self.assertFalse(post_api.called)
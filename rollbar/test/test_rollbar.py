@@ -3,6 +3,7 @@ import copy
 import json
 import socket
 import threading
+import time
 import uuid
 
 import sys
@@ -50,7 +51,7 @@ class RollbarTest(BaseTest):
         reset_current_session()
 
     def test_merged_settings(self):
-        expected = {'enabled': True, 'sizes': rollbar.DEFAULT_LOCALS_SIZES, 'safe_repr': True, 'scrub_varargs': True, 'safelisted_types': [], 'whitelisted_types': []}
+        expected = {'enabled': True, 'sizes': rollbar.DEFAULT_LOCALS_SIZES, 'safe_repr': True, 'scrub_varargs': True, 'max_frame_bytes': None, 'max_payload_bytes': None, 'max_frames': None, 'max_locals': None, 'max_chain_links': None, 'skip_shared_frames': False, 'include_paths': [], 'exclude_paths': [], 'safelisted_types': [], 'whitelisted_types': []}
         self.assertDictEqual(rollbar.SETTINGS['locals'], expected)
         self.assertEqual(rollbar.SETTINGS['timeout'], 12345)
         self.assertEqual(rollbar.SETTINGS['dummy_key'], 'asdf')
@@ -91,6 +92,46 @@ class RollbarTest(BaseTest):
         self.assertEqual(server_data['branch'], 'master')
         self.assertEqual(server_data['root'], '/home/test/')
 
+    @mock.patch('rollbar.send_payload')
+    def test_payload_skeleton(self, send_payload):
+        rollbar.SETTINGS['host'] = None
+        with mock.patch('socket.gethostname', return_value='skeleton-host') as gethostname:
+            rollbar.report_message('foo')
+            rollbar.report_message('bar')
+
+        self.assertEqual(1, gethostname.call_count)
+        first, second = [c[0][0]['data'] for c in send_payload.call_args_list]
+        self.assertEqual('skeleton-host', second['server']['host'])
+        self.assertEqual(first['server'], second['server'])
+        self.assertIsNot(first['server'], second['server'])
+        self.assertIsNot(first['notifier'], second['notifier'])
+        self.assertNotEqual(first['uuid'], second['uuid'])
+
+    @mock.patch('rollbar.send_payload')
+    def test_payload_skeleton_rebuilt(self, send_payload):
+        rollbar.report_message('foo')
+
+        rollbar.SETTINGS['environment'] = 'staging'
+        rollbar.report_message('foo')
+        self.assertEqual('staging', send_payload.call_args[0][0]['data']['environment'])
+
+        rollbar.SETTINGS['notifier']['name'] = 'pyrollbar-test'
+        rollbar.report_message('foo')
+        self.assertEqual('pyrollbar-test', send_payload.call_args[0][0]['data']['notifier']['name'])
+
+        with mock.patch('os.getpid', return_value=-1):
+            rollbar.report_message('foo')
+        self.assertEqual(-1, send_payload.call_args[0][0]['data']['server']['pid'])
+
+    @mock.patch('rollbar.send_payload')
+    def test_payload_skeleton_merged_with_payload_data(self, send_payload):
+        rollbar.report_message('foo', payload_data={'server': {'password': 'secret'}})
+        rollbar.report_message('bar')
+
+        first, second = [c[0][0]['data'] for c in send_payload.call_args_list]
+        self.assertRegex(first['server']['password'], r'^\*+$')
+        self.assertNotIn('password', second['server'])
+
     def test_wsgi_request_data(self):
         rollbar.SETTINGS['include_request_body'] = True
         request = {
@@ -946,6 +987,65 @@ class RollbarTest(BaseTest):
         self.assertEqual(payload['data']['body']['trace_chain'][1]['exception']['class'], 'CauseException')
         self.assertEqual(payload['data']['body']['trace_chain'][1]['frames'][-1]['locals']['bar_local'], 'bar')
 
+    def _report_chain(self):
+        def _raise_root():
+            root_local = 'root'
+            raise CauseException('root')
+
+        def _raise_cause():
+            try:
+                _raise_root()
+            except CauseException as root:
+                cause_local = 'cause'
+                raise CauseException('cause') from root
+
+        try:
+            _raise_cause()
+        except CauseException as cause:
+            try:
+                foo_local = 'foo'
+                raise Exception('foo') from cause
+            except:
+                rollbar.report_exc_info()
+
+    @mock.patch('rollbar.send_payload')
+    def test_max_chain_length(self, send_payload):
+        rollbar.SETTINGS['max_chain_length'] = 2
+
+        self._report_chain()
+
+        trace_chain = send_payload.call_args[0][0]['data']['body']['trace_chain']
+        self.assertEqual(['foo', 'cause'], [t['exception']['message'] for t in trace_chain])
+
+    @mock.patch('rollbar.send_payload')
+    def test_max_chain_links(self, send_payload):
+        rollbar.SETTINGS['locals']['max_chain_links'] = 1
+
+        self._report_chain()
+
+        trace_chain = send_payload.call_args[0][0]['data']['body']['trace_chain']
+        self.assertEqual(3, len(trace_chain))
+        self.assertEqual('foo', trace_chain[0]['frames'][-1]['locals']['foo_local'])
+        for trace in trace_chain[1:]:
+            self.assertEqual([], [f for f in trace['frames'] if 'locals' in f])
+
+    @mock.patch('rollbar.send_payload')
+    def test_skip_shared_frames(self, send_payload):
+        rollbar.SETTINGS['locals']['skip_shared_frames'] = True
+
+        self._report_chain()
+
+        trace_chain = send_payload.call_args[0][0]['data']['body']['trace_chain']
+        outer, cause, root = [t['frames'] for t in trace_chain]
+        self.assertEqual('foo', outer[-1]['locals']['foo_local'])
+        # The frame of _raise_cause is in both the cause and the root exceptions.
+        self.assertEqual('_raise_cause', cause[-1]['method'])
+        self.assertEqual('cause', cause[-1]['locals']['cause_local'])
+        self.assertEqual('_raise_cause', root[0]['method'])
+        self.assertNotEqual(cause[-1]['lineno'], root[0]['lineno'])
+        self.assertNotIn('locals', root[0])
+        self.assertEqual('root', root[-1]['locals']['root_local'])
+
     @mock.patch('rollbar.send_payload')
     def test_exception_filters(self, send_payload):
 
@@ -1057,6 +1157,47 @@ class RollbarTest(BaseTest):
             rollbar.report_exc_info()
             self.assertEqual(_send_failsafe.call_count, 2)
 
+    @mock.patch('rollbar._send_failsafe')
+    @mock.patch('rollbar.lib.transport.post',
+                side_effect=lambda *args, **kw: MockResponse({'err': 0, 'result': {}}, 200))
+    def test_oversized_payload_truncated_before_sending(self, post, _send_failsafe):
+        def fail(depth, big):
+            if depth:
+                fail(depth - 1, big)
+            raise Exception('too big')
+
+        def report():
+            try:
+                fail(5, 'x' * 10000)
+            except:
+                rollbar.report_exc_info()
+            return post.call_args[1]['data']
+
+        rollbar.SETTINGS['max_payload_size'] = None
+        full_size = len(report())
+        rollbar.SETTINGS['max_payload_size'] = full_size - 200
+        payload_str = report()
+
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(_send_failsafe.call_count, 0)
+        self.assertLessEqual(len(payload_str), full_size - 200)
+        payload = json.loads(payload_str)
+        truncation = payload['data']['notifier']['diagnostic']['truncation']
+        self.assertGreater(truncation['original_size'], full_size - 200)
+        self.assertEqual(truncation['applied'], ['outer_frame_locals'])
+        self.assertIn('locals', payload['data']['body']['trace']['frames'][-1])
+        self.assertNotIn('diagnostic', rollbar.SETTINGS['notifier'])
+
+    @mock.patch('rollbar._send_failsafe')
+    @mock.patch('rollbar.lib.transport.post')
+    def test_payload_too_large_once_truncated_not_sent(self, post, _send_failsafe):
+        rollbar.SETTINGS['max_payload_size'] = 10
+
+        rollbar.report_message('derp')
+
+        self.assertEqual(post.call_count, 0)
+        self.assertEqual(_send_failsafe.call_count, 1)
+
     @mock.patch('rollbar._send_failsafe')
     @mock.patch('rollbar.lib.transport.post',
                 side_effect=lambda *args, **kw: MockRawResponse('<html>\r\n' \
@@ -1154,6 +1295,73 @@ class RollbarTest(BaseTest):
 
         send_payload_thread_pool.assert_called_once()
 
+    @mock.patch('rollbar._send_payload_queue')
+    def test_queue_handler(self, send_payload_queue):
+        def _raise():
+            try:
+                raise Exception('foo')
+            except:
+                rollbar.report_exc_info()
+        rollbar.SETTINGS['handler'] = 'queue'
+        _raise()
+
+        send_payload_queue.assert_called_once()
+
+    @mock.patch('rollbar.lib.transport.post', side_effect=lambda *args, **kw: MockResponse({'status': 'OK'}, 200))
+    def test_queue_handler_wait(self, post):
+        rollbar._initialized = False
+        rollbar.init(_test_access_token, handler='queue', queue_workers=1, queue_maxsize=10)
+
+        rollbar.report_message('foo')
+        rollbar.report_message('bar')
+        rollbar.wait()
+
+        self.assertEqual(post.call_count, 2)
+
+    @mock.patch('rollbar.lib.transport.post')
+    def test_queue_handler_block_timeout(self, post):
+        from rollbar.lib import dispatcher
+
+        release = threading.Event()
+        post.side_effect = lambda *args, **kw: release.wait(5) and MockResponse({'status': 'OK'}, 200)
+
+        rollbar._initialized = False
+        rollbar.init(_test_access_token, handler='queue', queue_workers=1, queue_maxsize=1,
+                     queue_overflow='block', queue_block_timeout=0.05)
+        try:
+            rollbar.report_message('sending')
+            while not post.called:
+                time.sleep(0.001)
+            rollbar.report_message('queued')
+
+            started = time.monotonic()
+            rollbar.report_message('dropped')
+            self.assertLess(time.monotonic() - started, 2)
+            self.assertEqual(dispatcher._dispatcher.dropped, 1)
+        finally:
+            release.set()
+            rollbar.wait()
+
+        self.assertEqual(post.call_count, 2)
+
+    @mock.patch('rollbar.lib.transport.post')
+    def test_batched_handler_parses_each_response(self, post):
+        responses = [MockResponse({'status': 'OK'}, 200), MockResponse({'err': 1}, 429)]
+        post.side_effect = lambda *args, **kw: responses.pop(0)
+
+        rollbar._initialized = False
+        rollbar.init(_test_access_token, handler='batched', batch_max_items=10, batch_max_wait_ms=60000)
+
+        with mock.patch('rollbar._parse_response', wraps=rollbar._parse_response) as parse_response:
+            rollbar.report_message('foo')
+            rollbar.report_message('bar')
+            rollbar.wait()
+
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(parse_response.call_count, 2)
+        self.assertIn(b'foo', _as_bytes(parse_response.call_args_list[0][0][2]))
+        self.assertIn(b'bar', _as_bytes(parse_response.call_args_list[1][0][2]))
+
     @unittest.skipUnless(sys.version_info >= (3, 2), 'concurrent.futures support requires Python3.2+')
     def test_thread_pool_submit(self):
         from rollbar.lib.thread_pool import init_pool, submit
@@ -1166,6 +1374,51 @@ class RollbarTest(BaseTest):
         submit(run, 'foo', 'bar')
         self.assertFalse(ran['nope'])
 
+    @mock.patch('rollbar._post_api')
+    def test_flush_thread_handler(self, post_api):
+        post_api.side_effect = lambda *args, **kw: time.sleep(0.05)
+        rollbar.SETTINGS['handler'] = 'thread'
+
+        for _ in range(3):
+            rollbar.report_message('foo')
+
+        self.assertEqual(rollbar.flush(5), rollbar.FlushResult(sent=3, dropped=0))
+        self.assertEqual(post_api.call_count, 3)
+
+    @mock.patch('rollbar._post_api')
+    def test_flush_timeout(self, post_api):
+        release = threading.Event()
+        post_api.side_effect = lambda *args, **kw: release.wait(5)
+        rollbar.SETTINGS['handler'] = 'thread'
+
+        rollbar.report_message('foo')
+        started = time.monotonic()
+        result = rollbar.flush(0.05)
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(result, rollbar.FlushResult(sent=0, dropped=1))
+
+        release.set()
+        self.assertEqual(rollbar.flush(5), rollbar.FlushResult(sent=1, dropped=0))
+
+    @mock.patch('rollbar._post_api')
+    def test_flush_thread_pool_handler(self, post_api):
+        post_api.side_effect = lambda *args, **kw: time.sleep(0.05)
+        rollbar._initialized = False
+        rollbar.init(_test_access_token, handler='thread_pool', thread_pool_workers=1)
+
+        rollbar.report_message('foo')
+        rollbar.report_message('bar')
+
+        self.assertEqual(rollbar.flush(5), rollbar.FlushResult(sent=2, dropped=0))
+
+    @mock.patch('atexit.register')
+    def test_flush_at_exit(self, register):
+        rollbar._initialized = False
+        rollbar.init(_test_access_token, handler='blocking', flush_at_exit=2)
+
+        register.assert_any_call(rollbar.flush, 2)
+
 
     @mock.patch('rollbar.send_payload')
     def test_args_constructor(self, send_payload):
@@ -1207,6 +1460,68 @@ class RollbarTest(BaseTest):
 
         self.assertEqual(send_payload.called, True)
 
+    @mock.patch('rollbar.send_payload')
+    def test_large_locals_shortened_before_serialization(self, send_payload):
+        serialized = [0]
+
+        class Row(object):
+            def __rollbar_repr__(self):
+                serialized[0] += 1
+                return '<Row>'
+
+        def _raise(rows):
+            foo()
+
+        try:
+            _raise([Row() for _ in range(10000)])
+        except:
+            rollbar.report_exc_info()
+
+        payload = send_payload.call_args[0][0]
+        rows = payload['data']['body']['trace']['frames'][-1]['locals']['rows']
+
+        self.assertEqual(['<Row>'] * 10 + ['...'], rows)
+        self.assertEqual(10, serialized[0])
+
+    @mock.patch('rollbar.send_payload')
+    def test_locals_over_frame_budget(self, send_payload):
+        rollbar.SETTINGS['locals']['max_frame_bytes'] = 50
+
+        def _raise(small, large, other):
+            foo()
+
+        try:
+            _raise('a', 'b' * 60, 'c')
+        except:
+            rollbar.report_exc_info()
+
+        payload = send_payload.call_args[0][0]
+        frame_locals = payload['data']['body']['trace']['frames'][-1]['locals']
+
+        self.assertEqual({'small': 'a', 'large': '...', 'other': 'c'}, frame_locals)
+
+    @mock.patch('rollbar.send_payload')
+    def test_locals_over_payload_budget(self, send_payload):
+        rollbar.SETTINGS['locals']['max_payload_bytes'] = 150
+
+        def _inner(inner_value):
+            foo()
+
+        def _outer(outer_value):
+            _inner('i' * 90)
+
+        try:
+            _outer('o' * 90)
+        except:
+            rollbar.report_exc_info()
+
+        payload = send_payload.call_args[0][0]
+        frames = payload['data']['body']['trace']['frames']
+
+        # Each of them fits in the budget, not both: the nearest frame comes first.
+        self.assertEqual('i' * 90, frames[-1]['locals']['inner_value'])
+        self.assertEqual('...', frames[-2]['locals']['outer_value'])
+
     @mock.patch('rollbar.send_payload')
     def test_args_lambda_no_args(self, send_payload):
 
@@ -1821,6 +2136,55 @@ class RollbarTest(BaseTest):
                 self.assertIn('locals', frame)
 
 
+    @mock.patch('rollbar.send_payload')
+    def test_max_frames_with_locals(self, send_payload):
+        rollbar.SETTINGS['locals']['max_frames'] = 2
+
+        try:
+            step1()
+        except:
+            rollbar.report_exc_info()
+
+        payload = send_payload.call_args[0][0]
+        frames = payload['data']['body']['trace']['frames']
+
+        self.assertGreater(len(frames), 2)
+        self.assertEqual(['locals' in frame for frame in frames],
+                         [False] * (len(frames) - 2) + [True, True])
+
+    @mock.patch('rollbar.send_payload')
+    def test_max_locals(self, send_payload):
+        rollbar.SETTINGS['locals']['max_locals'] = 2
+
+        def _raise(arg1, arg2, *args):
+            local1 = 'local1'
+            foo()
+
+        try:
+            _raise('a1', 'a2', 'v1')
+        except:
+            rollbar.report_exc_info()
+
+        payload = send_payload.call_args[0][0]
+        frame = payload['data']['body']['trace']['frames'][-1]
+
+        self.assertEqual({'arg1': 'a1', 'arg2': 'a2'}, frame['locals'])
+        self.assertEqual(['arg1', 'arg2'], frame['argspec'])
+        self.assertEqual('args', frame['varargspec'])
+
+    @mock.patch('rollbar.send_payload')
+    def test_excluded_frames_have_no_locals(self, send_payload):
+        rollbar.SETTINGS['locals']['exclude_paths'] = [__file__]
+
+        try:
+            step1()
+        except:
+            rollbar.report_exc_info()
+
+        payload = send_payload.call_args[0][0]
+        for frame in payload['data']['body']['trace']['frames']:
+            self.assertNotIn('locals', frame)
+
     @mock.patch('rollbar.send_payload')
     def test_modify_arg(self, send_payload):
         # Record locals for all frames
@@ -1856,6 +2220,85 @@ class RollbarTest(BaseTest):
         payload = send_payload.call_args[0][0]
         self.assertEqual(payload['data']['body']['trace']['exception']['message'], message)
 
+    def _init_deferred_build(self, **kw):
+        rollbar._initialized = False
+        rollbar.init(_test_access_token, handler='blocking', deferred_build=True, **kw)
+        self.addCleanup(rollbar.lib.deferred.disable)
+
+    @mock.patch('rollbar.send_payload')
+    def test_deferred_build(self, send_payload):
+        self._init_deferred_build()
+        building = threading.Event()
+        release = threading.Event()
+
+        def build_deferred_payload(data, steps):
+            building.set()
+            release.wait(5)
+            return build(data, steps)
+
+        build = rollbar._build_deferred_payload
+
+        def fail(password, items):
+            raise Exception('deferred')
+
+        with mock.patch('rollbar._build_deferred_payload', side_effect=build_deferred_payload):
+            items = [1, 2]
+            try:
+                fail('hunter2', items)
+            except:
+                uuid = rollbar.report_exc_info()
+
+            # The reporting thread only took a snapshot.
+            self.assertIsNotNone(uuid)
+            self.assertTrue(building.wait(5))
+            self.assertEqual(send_payload.call_count, 0)
+            items.append(3)
+            release.set()
+
+            rollbar.wait()
+
+        self.assertEqual(send_payload.call_count, 1)
+        payload = send_payload.call_args[0][0]
+        self.assertEqual(payload['data']['uuid'], uuid)
+        frame = payload['data']['body']['trace']['frames'][-1]
+        self.assertEqual(frame['code'], "raise Exception('deferred')")
+        self.assertRegex(frame['locals']['password'], r'^\*+$')
+        # The locals are shallow copies.
+        self.assertEqual(frame['locals']['items'], [1, 2, 3])
+
+    @mock.patch('rollbar.send_payload')
+    def test_deferred_build_message(self, send_payload):
+        self._init_deferred_build()
+
+        uuid = rollbar.report_message('deferred', extra_data={'a': 1})
+        result = rollbar.flush(5)
+
+        self.assertEqual(result.dropped, 0)
+        self.assertEqual(send_payload.call_count, 1)
+        payload = send_payload.call_args[0][0]
+        self.assertEqual(payload['data']['uuid'], uuid)
+        self.assertEqual(payload['data']['body']['message']['body'], 'deferred')
+
+    @mock.patch('rollbar.send_payload')
+    def test_deferred_build_queue_full(self, send_payload):
+        self._init_deferred_build(deferred_build_maxsize=1)
+        release = threading.Event()
+
+        with mock.patch('rollbar._build_payload', side_effect=lambda data: release.wait(5) and data):
+            uuids = [rollbar.report_message('deferred %d' % i) for i in range(5)]
+            release.set()
+            rollbar.wait()
+
+        self.assertIsNotNone(uuids[0])
+        self.assertIn(None, uuids)
+
+    def test_deferred_build_not_used_for_loop_handlers(self):
+        self._init_deferred_build()
+
+        self.assertTrue(rollbar._defer_build())
+        rollbar.SETTINGS['handler'] = 'httpx'
+        self.assertFalse(rollbar._defer_build())
+
     @mock.patch('rollbar.lib.transport.post', side_effect=lambda *args, **kw: MockResponse({'status': 'OK'}, 200))
     def test_serialize_and_send_payload(self, post=None):
         invalid_b64 = b'CuX2JKuXuLVtJ6l1s7DeeQ=='
@@ -1881,6 +2324,9 @@ class RollbarTest(BaseTest):
 
         self.assertEqual(post.called, True)
         payload_data = post.call_args[1]['data']
+        if isinstance(payload_data, bytes):
+            # Encoded with orjson.
+            payload_data = payload_data.decode('utf8')
         self.assertIsInstance(payload_data, str)
         self.assertIn('bug bug', payload_data)
 
@@ -2066,6 +2512,12 @@ class CauseException(Exception):
     pass
 
 
+def _as_bytes(payload_str):
+    if isinstance(payload_str, str):
+        return payload_str.encode('utf8')
+    return payload_str
+
+
 class MockResponse:
     def __init__(self, json_data, status_code):
         self.json_data = json_data
@@ -1,10 +1,11 @@
 import sys
 from array import array
-from collections import deque
+from collections import deque, namedtuple
 
 from rollbar import DEFAULT_LOCALS_SIZES, SETTINGS
 from rollbar.lib import transforms
-from rollbar.lib.transforms.shortener import ShortenerTransform
+from rollbar.lib.transforms.serializable import SerializableTransform
+from rollbar.lib.transforms.shortener import CaptureShortenerTransform, ShortenerTransform
 from rollbar.test import BaseTest
 
 
@@ -12,6 +13,9 @@ class TestClassWithAVeryVeryVeryVeryVeryVeryVeryLongName:
     pass
 
 
+Point = namedtuple('Point', 'x y')
+
+
 class KeyMemShortenerTransform(ShortenerTransform):
     """
     A shortener that just stores the keys.
@@ -288,3 +292,86 @@ class ShortenerTransformTest(BaseTest):
                 (("three", "thirteen"), 14),
             ],
         )
+
+
+class CaptureShortenerTransformTest(BaseTest):
+    def setUp(self):
+        self.shortener = CaptureShortenerTransform(**DEFAULT_LOCALS_SIZES)
+
+    def test_shortens_root(self):
+        self.assertEqual(list(range(10)) + ['...'], transforms.transform(list(range(1000)), self.shortener))
+        self.assertEqual('{}...{}'.format('x'*48, 'x'*49), transforms.transform('x' * 1000, self.shortener))
+
+    def test_sequences_shortened_as_lists(self):
+        self.assertEqual(list(range(10)) + ['...'], transforms.transform(deque(range(1000)), self.shortener))
+        self.assertEqual(list(range(10)) + ['...'], transforms.transform(range(1000), self.shortener))
+
+    def test_drops_deep_containers(self):
+        obj = {'a': [{'b': ({'c': {'d': 1}},)}], 'e': 2}
+        expected = {'a': [{'b': ({'c': {'...': '...'}},)}], 'e': 2}
+        self.assertEqual(expected, transforms.transform(obj, self.shortener))
+
+    def test_leaves_other_objects(self):
+        obj = TestClassWithAVeryVeryVeryVeryVeryVeryVeryLongName()
+        long_int = 10 ** 100
+
+        result = transforms.transform([obj, long_int, b'x' * 200], self.shortener)
+
+        self.assertIs(result[0], obj)
+        self.assertEqual(result[1], long_int)
+        self.assertEqual(result[2], b'x' * 200)
+
+    def test_same_result_once_shortened(self):
+        obj = {
+            'rows': [{'id': i, 'name': 'n' * i, 'tags': set(range(i))} for i in range(50)],
+            'nested': {'a': {'b': {'c': {'d': {'e': {'f': 1}}}}}},
+            'text': 'y' * 500,
+        }
+        payload_shortener = ShortenerTransform(keys=[('locals', '*')], **DEFAULT_LOCALS_SIZES)
+
+        expected = transforms.transform({'locals': {'obj': obj}}, payload_shortener)
+        shortened = transforms.transform(obj, self.shortener)
+        got = transforms.transform({'locals': {'obj': shortened}}, payload_shortener)
+
+        self.assertEqual(expected, got)
+
+    def test_leaves_namedtuples(self):
+        point = Point(list(range(100)), {'a': {'b': {'c': {'d': {'e': 1}}}}})
+
+        result = transforms.transform({'a': [point]}, self.shortener)
+
+        self.assertEqual(point, result['a'][0])
+
+    def test_leaves_sets(self):
+        obj = {'a': {tuple(range(100)), ('x' * 500,)}}
+
+        result = transforms.transform(obj, self.shortener)
+
+        self.assertEqual(obj, result)
+
+    def test_labels_references(self):
+        shared = list(range(100))
+
+        result = transforms.transform([shared, {'a': shared}], self.shortener)
+
+        expected = [list(range(10)) + ['...'], {'a': '<CircularReference type:(list) ref:(0)>'}]
+        self.assertEqual(expected, result)
+
+    def test_same_result_once_serialized(self):
+        shared = {'k%d' % i: i for i in range(20)}
+        obj = {
+            'point': Point(list(range(50)), Point({'a': {'b': {'c': {'d': 1}}}}, 'z' * 500)),
+            'points': [Point(i, [shared]) for i in range(20)],
+            'shared': shared,
+            'tags': {(i, 'y' * 200) for i in range(5)},
+        }
+        serializer = SerializableTransform()
+        payload_shortener = ShortenerTransform(keys=[('locals', '*')], **DEFAULT_LOCALS_SIZES)
+
+        expected = transforms.transform(
+            {'locals': {'obj': transforms.transform(obj, serializer)}}, payload_shortener)
+        got = transforms.transform(
+            {'locals': {'obj': transforms.transform(obj, [self.shortener, serializer])}},
+            payload_shortener)
+
+        self.assertEqual(expected, got)
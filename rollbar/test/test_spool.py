@@ -0,0 +1,236 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from unittest import mock
+
+import rollbar
+from rollbar.lib import spool
+from rollbar.lib.spool import Forwarder, Spool, replay
+
+from rollbar.test import BaseTest
+
+
+class SpoolTest(BaseTest):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_append_read_commit(self):
+        s = Spool(self.directory)
+        s.append('{"a": 1}', 'token1')
+        s.append(b'{"b": 2}', 'token2')
+
+        records = s.read()
+        self.assertEqual([(p, t) for p, t, _ in records], [(b'{"a": 1}', 'token1'), (b'{"b": 2}', 'token2')])
+        self.assertTrue(s.pending())
+
+        s.commit(records[0][2])
+        self.assertEqual([p for p, _, _ in s.read()], [b'{"b": 2}'])
+
+        s.commit(records[1][2])
+        self.assertFalse(s.pending())
+        self.assertEqual(s.read(), [])
+
+    def test_checkpoint_survives_restart(self):
+        s = Spool(self.directory)
+        for i in range(3):
+            s.append('{"i": %d}' % i, 'token')
+        s.commit(s.read(1)[0][2])
+        s.close()
+
+        s = Spool(self.directory)
+        self.assertEqual([p for p, _, _ in s.read()], [b'{"i": 1}', b'{"i": 2}'])
+
+        s.append('{"i": 3}', 'token')
+        self.assertEqual([p for p, _, _ in s.read()], [b'{"i": 1}', b'{"i": 2}', b'{"i": 3}'])
+
+    def test_segments_roll_and_are_removed(self):
+        s = Spool(self.directory, segment_bytes=50)
+        for i in range(5):
+            s.append('{"i": %d, "padding": "xxxxxxxxxxxxxxxxxxxxxxxx"}' % i, 'token')
+
+        segments = [n for n in os.listdir(self.directory) if n.endswith('.seg')]
+        self.assertEqual(len(segments), 5)
+
+        records = s.read()
+        self.assertEqual(len(records), 5)
+        s.commit(records[-1][2])
+
+        segments = [n for n in os.listdir(self.directory) if n.endswith('.seg')]
+        self.assertEqual(len(segments), 1)
+
+    def test_evicts_oldest_first(self):
+        s = Spool(self.directory, max_bytes=200, segment_bytes=50)
+        for i in range(10):
+            s.append('{"i": %d, "padding": "xxxxxxxxxxxxxxxxxxxxxxxx"}' % i, 'token')
+
+        self.assertLessEqual(s.size(), 200)
+        self.assertGreater(s.evicted_bytes, 0)
+
+        payloads = [p for p, _, _ in s.read()]
+        self.assertEqual(payloads[-1], b'{"i": 9, "padding": "xxxxxxxxxxxxxxxxxxxxxxxx"}')
+        self.assertNotIn(b'{"i": 0, "padding": "xxxxxxxxxxxxxxxxxxxxxxxx"}', payloads)
+
+    def test_torn_record_is_skipped_after_restart(self):
+        s = Spool(self.directory)
+        s.append('{"a": 1}', 'token')
+        s.close()
+
+        segment = os.path.join(self.directory, [n for n in os.listdir(self.directory) if n.endswith('.seg')][0])
+        with open(segment, 'ab') as f:
+            f.write(b'\x00\x00\x00\x01\x00\x00\x00\xff')
+
+        s = Spool(self.directory)
+        s.append('{"b": 2}', 'token')
+        self.assertEqual([p for p, _, _ in s.read()], [b'{"a": 1}', b'{"b": 2}'])
+
+    def _segments(self):
+        return sorted(os.path.join(self.directory, name)
+                      for name in os.listdir(self.directory) if name.endswith('.seg'))
+
+    def test_corrupt_sealed_segment_is_dropped(self):
+        s = Spool(self.directory)
+        s.append('{"a": 1}', 'token')
+        s.close()
+        segment = self._segments()[0]
+        with open(segment, 'r+b') as f:
+            f.write(b'garbage')
+
+        # Sealed once the spool is opened again.
+        s = Spool(self.directory)
+        self.assertTrue(s.pending())
+        self.assertEqual(s.read(), [])
+        self.assertFalse(s.pending())
+        self.assertNotIn(segment, self._segments())
+
+    def test_corrupt_record_skipped_with_the_rest_of_its_segment(self):
+        s = Spool(self.directory, segment_bytes=10)
+        s.append('{"a": 1}', 'token')
+        s.append('{"b": 2}', 'token')
+        s.append('{"c": 3}', 'token')
+        with open(self._segments()[1], 'r+b') as f:
+            f.write(b'garbage')
+
+        records = s.read()
+        self.assertEqual([p for p, _, _ in records], [b'{"a": 1}', b'{"c": 3}'])
+        s.commit(records[-1][2])
+        self.assertFalse(s.pending())
+        self.assertEqual(1, len(self._segments()))
+
+    def test_forwarder_retries_until_sent(self):
+        s = Spool(self.directory)
+        s.append('{"a": 1}', 'token')
+
+        attempts = []
+
+        def sender(payload, access_token):
+            attempts.append(payload)
+            if len(attempts) < 2:
+                raise Exception('connection refused')
+
+        forwarder = Forwarder(s, sender, max_backoff=0.01)
+        forwarder.start()
+        try:
+            self.assertTrue(forwarder.join(5))
+        finally:
+            forwarder.stop()
+
+        self.assertEqual(attempts, [b'{"a": 1}', b'{"a": 1}'])
+        self.assertFalse(s.pending())
+
+    def test_replay_rate(self):
+        s = Spool(self.directory)
+        for i in range(3):
+            s.append('{"i": %d}' % i, 'token')
+
+        sent = []
+        started = time.monotonic()
+        count = replay(s, lambda payload, access_token: sent.append(payload), rate=50)
+
+        self.assertEqual(count, 3)
+        self.assertEqual(len(sent), 3)
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+        self.assertFalse(s.pending())
+
+    @mock.patch('rollbar._post_api')
+    def test_spool_handler(self, post_api):
+        rollbar._initialized = False
+        rollbar.init('token', handler='spool', spool_dir=os.path.join(self.directory, '{pid}'))
+
+        rollbar.report_message('foo')
+        self.assertTrue(spool.join(5))
+
+        self.assertEqual(post_api.call_count, 1)
+        self.assertIn(b'foo', post_api.call_args[0][1])
+        self.assertTrue(os.path.isdir(os.path.join(self.directory, str(os.getpid()))))
+        spool._forwarder.stop()
+
+    @mock.patch('rollbar._post_api')
+    def test_spool_handler_after_fork(self, post_api):
+        rollbar._initialized = False
+        rollbar.init('token', handler='spool', spool_dir=os.path.join(self.directory, '{pid}'))
+        parent_spool = spool._spool
+        parent_forwarder = spool._forwarder
+        parent_forwarder.stop()
+
+        child_pid = os.getpid() + 100000
+        with mock.patch('os.getpid', return_value=child_pid):
+            rollbar.report_message('foo')
+            self.assertTrue(spool.join(5))
+
+        self.assertIsNot(parent_spool, spool._spool)
+        self.assertIsNot(parent_forwarder, spool._forwarder)
+        self.assertEqual(os.path.join(self.directory, str(child_pid)), spool._spool.directory)
+        self.assertEqual(post_api.call_count, 1)
+        self.assertFalse(parent_spool.pending())
+        spool._forwarder.stop()
+
+    @mock.patch('time.sleep')
+    @mock.patch('rollbar._post_api')
+    def test_cli_replay_keeps_items_not_accepted(self, post_api, sleep):
+        from rollbar import cli
+
+        s = Spool(self.directory)
+        s.append('{"a": 1}', 'token')
+        s.close()
+        post_api.side_effect = [None, {'uuid': 'a'}]
+
+        self.assertTrue(cli._replay(self.directory, rollbar.DEFAULT_ENDPOINT, None))
+
+        self.assertEqual(post_api.call_count, 2)
+        sleep.assert_called_once()
+        self.assertFalse(Spool(self.directory).pending())
+
+    @mock.patch('rollbar._post_api')
+    def test_cli_replay_stops_on_api_error(self, post_api):
+        from rollbar import cli
+
+        post_api.side_effect = rollbar.ApiError('invalid')
+        s = Spool(self.directory)
+        s.append('{"a": 1}', 'token')
+        s.close()
+
+        with mock.patch('sys.stderr'):
+            self.assertFalse(cli._replay(self.directory, rollbar.DEFAULT_ENDPOINT, None))
+
+        self.assertTrue(Spool(self.directory).pending())
+
+    @mock.patch('rollbar._post_api', return_value=None)
+    def test_flush_does_not_wait_for_an_unreachable_api(self, post_api):
+        rollbar._initialized = False
+        rollbar.init('token', handler='spool', spool_dir=self.directory)
+        self.addCleanup(lambda: spool._forwarder.stop())
+
+        rollbar.report_message('foo')
+        started = time.monotonic()
+        with mock.patch('rollbar.SPOOL_FLUSH_TIMEOUT', 0.1):
+            result = rollbar.flush()
+
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(result.dropped, 0)
+        self.assertTrue(spool._spool.pending())
@@ -0,0 +1,148 @@
+import copy
+import sys
+
+from unittest import mock
+
+import rollbar
+from rollbar.lib import storm
+from rollbar.lib.storm import StormBreaker, signature
+
+from rollbar.test import BaseTest
+from rollbar.test.utils import FakeClock, raised
+
+
+_default_settings = copy.deepcopy(rollbar.SETTINGS)
+
+
+class SignatureTest(BaseTest):
+    def test_message_ignored(self):
+        first = raised('invalid user 1')
+        second = raised('no such table')
+        self.assertEqual(signature(first[0], first[2]), signature(second[0], second[2]))
+
+    def test_different_errors(self):
+        base = raised('boom')
+        other_class = raised('boom', KeyError)
+        self.assertNotEqual(signature(base[0], base[2]), signature(other_class[0], other_class[2]))
+
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            other_line = sys.exc_info()
+        self.assertNotEqual(signature(base[0], base[2]), signature(other_line[0], other_line[2]))
+
+
+    def test_equal_code_objects_of_different_files(self):
+        # Code objects compare equal whatever their file.
+        signatures = []
+        for filename in ('first.py', 'second.py'):
+            namespace = {}
+            exec(compile('def fail():\n    raise ValueError()\n', filename, 'exec'), namespace)
+            try:
+                namespace['fail']()
+            except ValueError:
+                cls, _, trace = sys.exc_info()
+                signatures.append(signature(cls, trace.tb_next))
+
+        self.assertNotEqual(signatures[0], signatures[1])
+
+
+class StormBreakerTest(BaseTest):
+    def test_token_bucket(self):
+        clock = FakeClock()
+        emitted = []
+        breaker = StormBreaker(emitted.append, rate=1, burst=2, clock=clock)
+        cls, _, trace = raised('boom')
+
+        self.assertEqual([breaker.allow(cls, trace) for _ in range(5)], [True, True, False, False, False])
+
+        # One token per second.
+        clock.now += 1
+        self.assertEqual([breaker.allow(cls, trace) for _ in range(2)], [True, False])
+
+        # Other exceptions have their own bucket.
+        other_cls, _, other_trace = raised('boom', KeyError)
+        self.assertTrue(breaker.allow(other_cls, other_trace))
+
+        breaker.shutdown()
+        self.assertEqual(len(emitted), 1)
+        self.assertEqual(emitted[0].count, 4)
+        self.assertEqual(emitted[0].exception_class, 'ValueError')
+        self.assertIn('utils.py', emitted[0].location)
+        self.assertLessEqual(emitted[0].first_timestamp, emitted[0].last_timestamp)
+
+    def test_counts_reset_once_emitted(self):
+        emitted = []
+        breaker = StormBreaker(emitted.append, rate=1, burst=1, clock=FakeClock())
+        cls, _, trace = raised('boom')
+
+        breaker.allow(cls, trace)
+        breaker.allow(cls, trace)
+        breaker.flush()
+        breaker.flush()
+        breaker.allow(cls, trace)
+        breaker.shutdown()
+
+        self.assertEqual([e.count for e in emitted], [1, 1])
+
+    def test_max_signatures(self):
+        clock = FakeClock()
+        emitted = []
+        breaker = StormBreaker(emitted.append, rate=1, burst=1, max_signatures=2, clock=clock)
+        first = raised('boom')
+        second = raised('boom', KeyError)
+        third = raised('boom', TypeError)
+
+        breaker.allow(first[0], first[2])
+        breaker.allow(first[0], first[2])
+        clock.now += 0.5
+        breaker.allow(second[0], second[2])
+        breaker.allow(third[0], third[2])
+
+        self.assertEqual([e.exception_class for e in emitted], ['ValueError'])
+        breaker.shutdown()
+
+
+class StormReportTest(BaseTest):
+    def setUp(self):
+        rollbar._initialized = False
+        rollbar.SETTINGS = copy.deepcopy(_default_settings)
+
+    def tearDown(self):
+        storm.disable()
+
+    @mock.patch('rollbar.send_payload')
+    def test_storm_is_suppressed(self, send_payload):
+        rollbar.init('token', handler='blocking', storm_rate=0.001, storm_burst=2)
+
+        with mock.patch('rollbar._build_base_data', wraps=rollbar._build_base_data) as build_base_data:
+            uuids = []
+            for i in range(5):
+                try:
+                    raise ValueError('invalid user %d' % i)
+                except ValueError:
+                    uuids.append(rollbar.report_exc_info())
+
+        self.assertEqual(send_payload.call_count, 2)
+        self.assertEqual(build_base_data.call_count, 2)
+        self.assertEqual(uuids[2:], [None] * 3)
+
+        rollbar.wait()
+
+        self.assertEqual(send_payload.call_count, 3)
+        data = send_payload.call_args[0][0]['data']
+        self.assertEqual(data['custom']['suppressed_occurrences']['count'], 3)
+        self.assertIn('ValueError', data['body']['message']['body'])
+        self.assertEqual(data['level'], 'error')
+
+    @mock.patch('rollbar.send_payload')
+    def test_disabled_by_default(self, send_payload):
+        rollbar.init('token', handler='blocking')
+
+        for i in range(20):
+            try:
+                raise ValueError('invalid user %d' % i)
+            except ValueError:
+                rollbar.report_exc_info()
+
+        self.assertEqual(send_payload.call_count, 20)
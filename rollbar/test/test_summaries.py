@@ -0,0 +1,87 @@
+import os
+
+from unittest import mock
+
+from rollbar.lib.summaries import Slot, Summarizer, trace_locations
+
+from rollbar.test import BaseTest
+from rollbar.test.utils import FakeClock, raised
+
+
+class CountingSummarizer(Summarizer):
+    def __init__(self, emit):
+        super(CountingSummarizer, self).__init__(emit, 'rollbar-test-summaries', clock=FakeClock())
+        self.count = 0
+
+    def _reset(self):
+        self.count = 0
+
+    def _wait_time(self):
+        return None
+
+    def _take(self, now, force):
+        summaries = [self.count] if self.count else []
+        self.count = 0
+        return summaries
+
+    def add(self):
+        with self._cond:
+            self._check_pid()
+            self.count += 1
+            self._start()
+
+
+class SummarizerTest(BaseTest):
+    def test_trace_locations(self):
+        _, _, trace = raised('boom')
+
+        locations = trace_locations(trace)
+
+        self.assertEqual(len(locations), 1)
+        self.assertTrue(locations[0][0].endswith('utils.py'))
+        self.assertEqual(locations[0][1], 'raised')
+
+    def test_flush(self):
+        emitted = []
+        summarizer = CountingSummarizer(emitted.append)
+        summarizer.add()
+        summarizer.add()
+
+        summarizer.flush()
+        summarizer.flush()
+        summarizer.shutdown()
+
+        self.assertEqual(emitted, [2])
+
+    def test_counts_of_parent_after_fork(self):
+        emitted = []
+        summarizer = CountingSummarizer(emitted.append)
+        summarizer.add()
+
+        with mock.patch('os.getpid', return_value=os.getpid() + 100000):
+            # The occurrence counted by the parent is left to the parent.
+            summarizer.flush()
+            self.assertEqual(emitted, [])
+
+            summarizer.add()
+            summarizer.add()
+            summarizer.shutdown()
+
+        self.assertEqual(emitted, [2])
+
+    @mock.patch('rollbar.lib.summaries.atexit')
+    def test_slot(self, atexit):
+        emitted = []
+        slot = Slot()
+        first = CountingSummarizer(emitted.append)
+        slot.set(first)
+        first.add()
+        atexit.register.assert_called_once_with(first.shutdown)
+
+        second = CountingSummarizer(emitted.append)
+        slot.set(second)
+        atexit.unregister.assert_called_once_with(first.shutdown)
+        self.assertEqual(emitted, [1])
+
+        slot.clear()
+        self.assertIsNone(slot.summarizer)
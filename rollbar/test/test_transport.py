@@ -0,0 +1,109 @@
+import http.server
+import threading
+
+from unittest import mock
+
+import requests
+
+from rollbar.lib import transport
+
+from rollbar.test import BaseTest
+
+
+class _KeepAliveHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'{"err": 0, "result": {}}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TransportTest(BaseTest):
+    def setUp(self):
+        transport.reset()
+
+    def tearDown(self):
+        transport.reset()
+        transport._adapter_args.clear()
+
+    def test_session_shared_between_threads(self):
+        sessions = []
+
+        def worker():
+            sessions.append(transport._session())
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(sessions), 5)
+        self.assertTrue(all(s is sessions[0] for s in sessions))
+
+    def test_new_session_after_fork(self):
+        session = transport._session()
+        with mock.patch('rollbar.lib.transport.os.getpid', return_value=-1):
+            forked_session = transport._session()
+
+        self.assertIsNot(session, forked_session)
+
+    def test_configure_pool_applies_to_shared_session(self):
+        session = transport._session()
+        transport.configure_pool(pool_maxsize=42, max_retries=None)
+
+        adapter = session.get_adapter('https://api.rollbar.com')
+        self.assertEqual(adapter._pool_maxsize, 42)
+
+        def worker(result):
+            result.append(transport._session().get_adapter('https://api.rollbar.com'))
+
+        result = []
+        t = threading.Thread(target=worker, args=(result,))
+        t.start()
+        t.join()
+        self.assertEqual(result[0]._pool_maxsize, 42)
+
+    def test_configure_pool_applies_to_new_session(self):
+        transport.configure_pool(pool_connections=3)
+        adapter = transport._session().get_adapter('http://localhost')
+        self.assertEqual(adapter._pool_connections, 3)
+
+    @mock.patch('requests.Session.request', side_effect=requests.ConnectionError())
+    def test_stats_errors(self, request):
+        with self.assertRaises(requests.ConnectionError):
+            transport.post('http://localhost/api/1/item/', data='{}')
+
+        stats = transport.stats()
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['errors'], 1)
+
+    def test_connections_are_reused(self):
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+        server_thread = threading.Thread(target=server.serve_forever)
+        server_thread.daemon = True
+        server_thread.start()
+        url = 'http://127.0.0.1:%d/api/1/item/' % server.server_address[1]
+
+        try:
+            for _ in range(5):
+                t = threading.Thread(target=transport.post, args=(url,), kwargs={'data': '{}', 'timeout': 5})
+                t.start()
+                t.join()
+        finally:
+            stats = transport.stats()
+            transport.reset()
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(stats['requests'], 5)
+        self.assertEqual(stats['connections'], 1)
+        self.assertEqual(stats['idle_connections'], 1)
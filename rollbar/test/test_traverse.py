@@ -1,5 +1,7 @@
+import sys
+
 from rollbar.lib.transform import Transform
-from rollbar.lib.traverse import traverse
+from rollbar.lib.traverse import traverse, Traverser
 
 from rollbar.test import BaseTest
 
@@ -160,3 +162,40 @@ class RollbarTraverseTest(BaseTest):
                 (("three", "thirteen"), 14),
             ],
         )
+
+    def test_deeply_nested(self):
+        obj = []
+        inner = obj
+        for _ in range(sys.getrecursionlimit() * 2):
+            inner.append([])
+            inner = inner[0]
+
+        result = traverse(obj, list_handler=lambda o, key=None: o)
+
+        depth = 0
+        while result:
+            result = result[0]
+            depth += 1
+        self.assertEqual(depth, sys.getrecursionlimit() * 2)
+
+    def test_handler_exception_falls_back_to_enclosing_container(self):
+        def circular_reference_handler(o, key=None, ref_key=None):
+            raise ValueError()
+
+        shared = [1]
+        obj = {'a': shared, 'b': (shared, 2)}
+
+        result = traverse(
+            obj,
+            circular_reference_handler=circular_reference_handler,
+            default_handler=lambda o, key=None: 'default' if isinstance(o, tuple) else o,
+            tuple_handler=lambda o, key=None: o,
+        )
+
+        self.assertEqual(result, {'a': [1], 'b': 'default'})
+
+    def test_traverser_is_reusable(self):
+        traverser = Traverser(string_handler=lambda s, key=None: s.upper())
+
+        self.assertEqual(traverser.traverse({'a': 'b'}), {'a': 'B'})
+        self.assertEqual(traverser.traverse(['c', ('d',)], key=('x',)), ['C', ('D',)])
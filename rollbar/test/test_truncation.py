@@ -0,0 +1,101 @@
+import copy
+import json
+
+from rollbar.lib.truncation import truncate
+
+from rollbar.test import BaseTest
+
+
+def _frame(i, locals_size=100):
+    return {
+        'filename': 'app.py',
+        'lineno': i,
+        'method': 'f%d' % i,
+        'argspec': ['x'],
+        'locals': {'x': 'y' * locals_size},
+    }
+
+
+def _payload(frames=5, locals_size=100, body_size=10, message_size=10):
+    return {
+        'access_token': 'token',
+        'data': {
+            'uuid': 'abc',
+            'notifier': {'name': 'pyrollbar'},
+            'body': {
+                'trace': {
+                    'frames': [_frame(i, locals_size) for i in range(frames)],
+                    'exception': {'class': 'Exception', 'message': 'm' * message_size},
+                },
+            },
+            'request': {'url': 'http://example.com', 'body': 'b' * body_size},
+        },
+    }
+
+
+class TruncationTest(BaseTest):
+    def truncate(self, payload, max_size):
+        payload_str = truncate(payload, max_size, json.dumps)
+        self.assertEqual(payload_str, json.dumps(payload))
+        return payload_str
+
+    def applied(self, payload):
+        return payload['data']['notifier']['diagnostic']['truncation']['applied']
+
+    def test_small_payload_unchanged(self):
+        payload = _payload()
+        expected = copy.deepcopy(payload)
+
+        self.truncate(payload, 10000)
+
+        self.assertEqual(payload, expected)
+
+    def test_outer_frame_locals_dropped_first(self):
+        payload = _payload(locals_size=1000)
+
+        payload_str = self.truncate(payload, 3000)
+
+        self.assertLessEqual(len(payload_str), 3000)
+        self.assertEqual(self.applied(payload), ['outer_frame_locals'])
+        frames = payload['data']['body']['trace']['frames']
+        self.assertNotIn('locals', frames[0])
+        self.assertNotIn('argspec', frames[0])
+        self.assertIn('locals', frames[-1])
+
+    def test_request_body_and_strings(self):
+        payload = _payload(body_size=5000, message_size=5000)
+
+        payload_str = self.truncate(payload, 1200)
+
+        self.assertLessEqual(len(payload_str), 1200)
+        self.assertEqual(self.applied(payload),
+                         ['outer_frame_locals', 'frame_locals', 'request_body', 'strings_1024', 'strings_256'])
+        self.assertNotIn('body', payload['data']['request'])
+        self.assertEqual(len(payload['data']['body']['trace']['exception']['message']), 256)
+
+    def test_middle_frames(self):
+        payload = _payload(frames=200)
+
+        payload_str = self.truncate(payload, 8000)
+
+        self.assertLessEqual(len(payload_str), 8000)
+        self.assertEqual(self.applied(payload)[-1], 'middle_frames')
+        lines = [f['lineno'] for f in payload['data']['body']['trace']['frames']]
+        self.assertEqual(lines, list(range(10)) + list(range(190, 200)))
+
+    def test_does_not_modify_shared_notifier(self):
+        notifier = {'name': 'pyrollbar'}
+        payload = _payload(locals_size=1000)
+        payload['data']['notifier'] = notifier
+
+        self.truncate(payload, 3000)
+
+        self.assertEqual(notifier, {'name': 'pyrollbar'})
+
+    def test_still_too_large(self):
+        payload = _payload(frames=200)
+
+        payload_str = self.truncate(payload, 100)
+
+        self.assertGreater(len(payload_str), 100)
+        self.assertEqual(self.applied(payload)[-1], 'middle_frames')
@@ -0,0 +1,81 @@
+import collections
+
+from collections.abc import Mapping, Sequence
+
+from rollbar.lib import type_info
+from rollbar.lib.type_info import (
+    classify,
+    get_type,
+    DEFAULT,
+    LIST,
+    MAPPING,
+    NAMEDTUPLE,
+    TUPLE,
+)
+from rollbar.test import BaseTest
+
+
+Point = collections.namedtuple('Point', 'x y')
+
+
+class LabeledTuple(tuple):
+    pass
+
+
+class LiesAboutClass(object):
+    __class__ = dict
+
+
+class TypeInfoTest(BaseTest):
+    def test_classify(self):
+        self.assertEqual(classify({}), (MAPPING, 'dict'))
+        self.assertEqual(classify(Point(1, 2)), (NAMEDTUPLE, 'namedtuple'))
+        self.assertEqual(classify(True), (DEFAULT, 'boolean'))
+        self.assertEqual(classify(1.5), (DEFAULT, 'number'))
+        self.assertEqual(classify(object()), (DEFAULT, 'custom'))
+        self.assertEqual(classify(b'x')[1], 'bytes')
+        self.assertEqual(classify(u'x')[1], 'unicode')
+
+    def test_cached_by_type(self):
+        get_type(collections.OrderedDict())
+        self.assertEqual(get_type.cache[collections.OrderedDict], MAPPING)
+
+    def test_subclasses(self):
+        class MyDict(dict):
+            pass
+
+        class MyList(list):
+            pass
+
+        self.assertEqual(get_type(MyDict()), MAPPING)
+        self.assertEqual(get_type(MyList()), LIST)
+
+    def test_registered_later(self):
+        class Registered(object):
+            pass
+
+        self.assertEqual(get_type(Registered()), DEFAULT)
+        self.assertEqual(classify(Registered()), (DEFAULT, 'custom'))
+
+        Mapping.register(Registered)
+
+        self.assertEqual(get_type(Registered()), MAPPING)
+        self.assertEqual(classify(Registered()), (MAPPING, 'dict'))
+
+    def test_instance_fields(self):
+        plain = LabeledTuple((1, 2))
+        labeled = LabeledTuple((1, 2))
+        labeled._fields = ('x', 'y')
+
+        self.assertEqual(get_type(plain), TUPLE)
+        self.assertEqual(get_type(labeled), NAMEDTUPLE)
+        self.assertEqual(get_type(plain), TUPLE)
+
+    def test_objects_lying_about_their_class_are_not_cached(self):
+        self.assertEqual(get_type(LiesAboutClass()), MAPPING)
+        self.assertNotIn(LiesAboutClass, get_type.cache)
+
+    def test_cache_size_is_bounded(self):
+        for i in range(type_info.TYPE_CACHE_SIZE + 10):
+            get_type(type('T%d' % i, (Sequence,), {'__getitem__': None, '__len__': None})())
+        self.assertLessEqual(len(get_type.cache), type_info.TYPE_CACHE_SIZE)
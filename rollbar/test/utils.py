@@ -1,4 +1,25 @@
+import sys
+
 from collections.abc import Mapping
 
+
 def get_public_attrs(obj: Mapping) -> dict:
     return {k: obj[k] for k in obj if not k.startswith('_')}
+
+
+def raised(message, cls=ValueError):
+    """
+    Returns the exc_info of an exception of class `cls` raised with `message`.
+    """
+    try:
+        raise cls(message)
+    except cls:
+        return sys.exc_info()
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now